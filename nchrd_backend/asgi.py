@@ -3,6 +3,10 @@ ASGI config for nchrd_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Real-time notifications (/api/notifications/stream/) are Server-Sent Events
+served by an async view, so run this app under an ASGI server
+(e.g. ``uvicorn nchrd_backend.asgi:application``) rather than WSGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -77,6 +78,15 @@ DATABASES = {
     }
 }
 
+# قاعدة بيانات الاختبارات (python manage.py test) تعمل على SQLite بدون الحاجة لـ PostgreSQL
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        }
+    }
+
 # Auth model
 AUTH_USER_MODEL = 'users.User'
 
@@ -84,7 +94,10 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+    ),
+    # ترقيم القوائم (يمكن تغيير حجم الصفحة لكل طلب عبر ?page_size= أو ?limit=)
+    "DEFAULT_PAGINATION_CLASS": "users.pagination.StandardCursorPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "50")),
 }
 
 SIMPLE_JWT = {
@@ -93,6 +106,39 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Cache (لوحة التحكم وغيرها) - يمكن استبداله بـ Redis في الإنتاج
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+
+# سجلات النظام (SystemLog): كتابة غير متزامنة على دفعات بعد نجاح المعاملة
+AUDIT_LOG_ASYNC = os.getenv("AUDIT_LOG_ASYNC", "True") == "True" and 'test' not in sys.argv
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500"))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1.0"))
+
+# أرشفة سجلات النظام (python manage.py archive_logs)
+SYSTEM_LOG_RETENTION_DAYS = int(os.getenv("SYSTEM_LOG_RETENTION_DAYS", "180"))
+SYSTEM_LOG_ARCHIVE_DIR = os.getenv("SYSTEM_LOG_ARCHIVE_DIR", os.path.join(BASE_DIR, 'log_archive'))
+
+# الإشعارات الفورية (SSE على ASGI): pub/sub داخل العملية، يمكن استبداله بـ backend مشترك
+NOTIFICATION_BUS_BACKEND = os.getenv("NOTIFICATION_BUS_BACKEND", "users.notification_bus.InProcessNotificationBus")
+
+# الإشعارات الجماعية: تُكتب في thread بالخلفية على دفعات
+NOTIFICATION_FANOUT_ASYNC = os.getenv("NOTIFICATION_FANOUT_ASYNC", "True") == "True" and 'test' not in sys.argv
+NOTIFICATION_FANOUT_CHUNK_SIZE = int(os.getenv("NOTIFICATION_FANOUT_CHUNK_SIZE", "1000"))
+
+# ملخص الحضور: الطلاب الذين وصل غيابهم المتتالي لهذا العدد يظهرون في لوحة التحكم
+ATTENDANCE_STREAK_ALERT = int(os.getenv("ATTENDANCE_STREAK_ALERT", "3"))
+
+# تنبيهات الغياب: إشعار المشرفين مرة واحدة لكل حد (N غياب بدون عذر / M متتالي = ATTENDANCE_STREAK_ALERT)
+ABSENCE_ALERT_UNEXCUSED = int(os.getenv("ABSENCE_ALERT_UNEXCUSED", "5"))
+# False = القواعد تُفحص فقط بأمر `check_absence_alerts` الليلي
+ABSENCE_ALERTS_INCREMENTAL = os.getenv("ABSENCE_ALERTS_INCREMENTAL", "True") == "True"
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -113,6 +159,10 @@ STATIC_URL = 'static/'
 # Media Files (لرفع الصور)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# صور الطلاب وملفات الإثبات تُخدم عبر /api/media/ (JWT + ETag + Range)
+PROTECTED_MEDIA_URL = '/api/media/'
+# خلف nginx: مسار internal يرسل منه الملف مباشرة (X-Accel-Redirect)، فارغ = Django يرسل الملف
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")
 
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
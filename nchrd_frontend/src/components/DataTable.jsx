@@ -1,6 +1,6 @@
 import { 
   Table, TableBody, TableCell, TableContainer, 
-  TableHead, TableRow, Paper, IconButton, Typography, Box 
+  TableHead, TableRow, Paper, IconButton, Typography, Box, TablePagination
 } from '@mui/material';
 import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
@@ -8,7 +8,8 @@ import DeleteIcon from '@mui/icons-material/Delete';
 //columns: مصفوفة تعرف شكل الأعمدة
 // rows: البيانات
 // onEdit/onDelete: دوال التحكم
-const DataTable = ({ columns, rows, onEdit, onDelete }) => {
+// pagination (اختياري): { count, page, rowsPerPage, onPageChange, onRowsPerPageChange } للترقيم من السيرفر
+const DataTable = ({ columns, rows, onEdit, onDelete, pagination }) => {
   
   if (!rows || rows.length === 0) {
     return (
@@ -52,6 +53,18 @@ const DataTable = ({ columns, rows, onEdit, onDelete }) => {
           ))}
         </TableBody>
       </Table>
+      {pagination && (
+        <TablePagination
+          component="div"
+          count={pagination.count}
+          page={pagination.page}
+          rowsPerPage={pagination.rowsPerPage}
+          rowsPerPageOptions={[25, 50, 100]}
+          onPageChange={(e, newPage) => pagination.onPageChange(newPage)}
+          onRowsPerPageChange={(e) => pagination.onRowsPerPageChange(parseInt(e.target.value, 10))}
+          labelRowsPerPage="عدد الصفوف:"
+        />
+      )}
     </TableContainer>
   );
 };
@@ -10,9 +10,12 @@ const NotificationsMenu = () => {
 
   const fetchNotifications = async () => {
     try {
-      const res = await api.get('notifications/');
-      setNotifications(res.data);
-      setUnreadCount(res.data.filter(n => !n.is_read).length);
+      const [listRes, countRes] = await Promise.all([
+        api.get('notifications/'),
+        api.get('notifications/unread-count/')
+      ]);
+      setNotifications(listRes.data.results);
+      setUnreadCount(countRes.data.unread);
     } catch (error) {
       console.error("Failed to fetch notifications");
     }
@@ -20,11 +23,70 @@ const NotificationsMenu = () => {
 
   useEffect(() => {
     fetchNotifications();
-    // تحديث كل 30 ثانية
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+
+    // الإشعارات الجديدة تصل لحظياً من السيرفر (SSE على ASGI)، وإلا تحديث كل 30 ثانية
+    let source = null;
+    let interval = null;
+    let retry = null;
+    let lastId = 0;
+    let stopped = false;
+
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchNotifications, 30000);
+    };
+
+    const connect = async () => {
+      try {
+        // تذكرة قصيرة العمر بدلاً من access token في الرابط (الرابط يظهر في سجلات الوصول)
+        const res = await api.post('notifications/stream/ticket/');
+        // 204 = السيرفر بدون ASGI: التحديث الدوري فقط
+        if (stopped || res.status === 204) {
+          if (!stopped) startPolling();
+          return;
+        }
+        source = new EventSource(
+          `${api.defaults.baseURL}notifications/stream/?ticket=${res.data.ticket}&last_id=${lastId}`
+        );
+      } catch (e) {
+        startPolling();
+        return;
+      }
+      source.onopen = () => {
+        if (interval) clearInterval(interval);
+        interval = null;
+      };
+      source.addEventListener('notification', (e) => {
+        const notif = JSON.parse(e.data);
+        lastId = Math.max(lastId, notif.id);
+        setNotifications((prev) => [notif, ...prev.filter((n) => n.id !== notif.id)]);
+        if (!notif.is_read) setUnreadCount((c) => c + 1);
+      });
+      // المتصفح يعيد الاتصال بنفس التذكرة؛ لو انتهت يُغلق البث: تحديث دوري ثم تذكرة جديدة
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !stopped) {
+          startPolling();
+          retry = setTimeout(connect, 30000);
+        }
+      };
+    };
+    connect();
+
+    return () => {
+      stopped = true;
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+      if (retry) clearTimeout(retry);
+    };
   }, []);
 
+  const handleMarkAllRead = async () => {
+    try {
+      await api.post('notifications/read-all/');
+      setNotifications((prev) => prev.map((n) => ({ ...n, is_read: true })));
+      setUnreadCount(0);
+    } catch (e) {}
+  };
+
   const handleMarkRead = async (id) => {
     try {
       await api.post(`notifications/${id}/read/`);
@@ -46,8 +108,13 @@ const NotificationsMenu = () => {
         onClose={() => setAnchorEl(null)}
         PaperProps={{ sx: { width: 320, maxHeight: 400 } }}
       >
-        <Box sx={{ p: 2 }}>
+        <Box sx={{ p: 2, display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
           <Typography variant="h6" fontSize="1rem">الإشعارات</Typography>
+          {unreadCount > 0 && (
+            <Typography variant="caption" color="primary" sx={{ cursor: 'pointer' }} onClick={handleMarkAllRead}>
+              تحديد الكل كمقروء
+            </Typography>
+          )}
         </Box>
         <Divider />
         
@@ -1,12 +1,15 @@
 import { useState, useEffect } from 'react';
 import { Dialog, DialogTitle, DialogContent, DialogActions, TextField, Button, Box } from '@mui/material';
 import { toast } from 'react-toastify';
-import api from '../services/api';
+import api, { fetchPage } from '../services/api';
 import PageHeader from '../components/PageHeader';
 import DataTable from '../components/DataTable';
 
 const Companies = () => {
   const [companies, setCompanies] = useState([]);
+  const [page, setPage] = useState(0);
+  const [rowsPerPage, setRowsPerPage] = useState(25);
+  const [count, setCount] = useState(0);
   const [open, setOpen] = useState(false);
   const [formData, setFormData] = useState({ name: '', address: '', phone: '', supervisor_name: '' });
   const [editMode, setEditMode] = useState(false);
@@ -24,14 +27,15 @@ const Companies = () => {
   // 2. جلب البيانات
   const fetchCompanies = async () => {
     try {
-      const res = await api.get('companies/');
-      setCompanies(res.data);
+      const data = await fetchPage('companies/', page, rowsPerPage);
+      setCompanies(data.results);
+      setCount(data.count);
     } catch (err) {
       toast.error("فشل تحميل بيانات الشركات");
     }
   };
 
-  useEffect(() => { fetchCompanies(); }, []);
+  useEffect(() => { fetchCompanies(); }, [page, rowsPerPage]);
 
   // 3. دوال التحكم (Handlers)
   const handleSave = async () => {
@@ -93,6 +97,7 @@ const Companies = () => {
         rows={companies} 
         onEdit={openEditModal} 
         onDelete={handleDelete} 
+        pagination={{ count, page, rowsPerPage, onPageChange: setPage, onRowsPerPageChange: (n) => { setRowsPerPage(n); setPage(0); } }}
       />
 
       {/* نافذة الإضافة/التعديل (Modal) - يمكن فصلها لمكون FormComponent لاحقاً */}
@@ -4,12 +4,15 @@ import {
   Button, Box, TextField, MenuItem, Rating, Typography, Grid, Chip 
 } from '@mui/material';
 import { toast } from 'react-toastify';
-import api from '../services/api';
+import api, { fetchAll, fetchPage } from '../services/api';
 import PageHeader from '../components/PageHeader';
 import DataTable from '../components/DataTable';
 
 const Evaluations = () => {
   const [evaluations, setEvaluations] = useState([]);
+  const [page, setPage] = useState(0);
+  const [rowsPerPage, setRowsPerPage] = useState(25);
+  const [count, setCount] = useState(0);
   const [students, setStudents] = useState([]);
   const [companies, setCompanies] = useState([]);
   const [open, setOpen] = useState(false);
@@ -55,20 +58,21 @@ const Evaluations = () => {
   // جلب البيانات
   const fetchData = async () => {
     try {
-      const [evalRes, studRes, compRes] = await Promise.all([
-        api.get('evaluations/'),
-        api.get('students/'),
-        api.get('companies/')
+      const [evalData, studList, compList] = await Promise.all([
+        fetchPage('evaluations/', page, rowsPerPage),
+        fetchAll('students/'),
+        fetchAll('companies/')
       ]);
-      setEvaluations(evalRes.data);
-      setStudents(studRes.data);
-      setCompanies(compRes.data);
+      setEvaluations(evalData.results);
+      setCount(evalData.count);
+      setStudents(studList);
+      setCompanies(compList);
     } catch (err) {
       toast.error("فشل تحميل البيانات");
     }
   };
 
-  useEffect(() => { fetchData(); }, []);
+  useEffect(() => { fetchData(); }, [page, rowsPerPage]);
 
   const handleSave = async () => {
     try {
@@ -116,7 +120,10 @@ const Evaluations = () => {
     <Box>
       <PageHeader title="📝 التقييمات" btnLabel="تقييم جديد" onAdd={openAdd} />
       
-      <DataTable columns={columns} rows={evaluations} onDelete={handleDelete} onEdit={() => toast.info("التعديل غير متاح حالياً")} />
+      <DataTable
+        columns={columns} rows={evaluations} onDelete={handleDelete} onEdit={() => toast.info("التعديل غير متاح حالياً")}
+        pagination={{ count, page, rowsPerPage, onPageChange: setPage, onRowsPerPageChange: (n) => { setRowsPerPage(n); setPage(0); } }}
+      />
 
       <Dialog open={open} onClose={() => setOpen(false)} maxWidth="md" fullWidth>
         <DialogTitle>إضافة تقييم جديد</DialogTitle>
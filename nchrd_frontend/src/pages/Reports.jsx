@@ -36,7 +36,7 @@ const Reports = () => {
     setLoading(true);
     try {
       // تجهيز البارامترات حسب النوع
-      const params = { type: filters.type };
+      const params = { type: filters.type, include_records: 'true', page_size: 500 };
       if (filters.type === 'daily') params.date = filters.date;
       if (filters.type === 'weekly') params.week = filters.week;
       if (filters.type === 'monthly') params.month = filters.month;
@@ -51,6 +51,26 @@ const Reports = () => {
     }
   };
 
+  // تنزيل التقرير كملف (CSV / XLSX) يتم توليده على السيرفر
+  const handleExport = async (fileType) => {
+    try {
+      const params = { type: filters.type, file_type: fileType };
+      if (filters.type === 'daily') params.date = filters.date;
+      if (filters.type === 'weekly') params.week = filters.week;
+      if (filters.type === 'monthly') params.month = filters.month;
+
+      const res = await api.get('export/attendance/', { params, responseType: 'blob' });
+      const url = window.URL.createObjectURL(res.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `attendance.${fileType}`;
+      link.click();
+      window.URL.revokeObjectURL(url);
+    } catch (err) {
+      toast.error("فشل تصدير التقرير");
+    }
+  };
+
   // مكون لبطاقة الإحصائيات الصغيرة
   const StatBox = ({ title, value, color }) => (
     <Card sx={{ bgcolor: 'background.paper', borderLeft: `4px solid ${color}` }}>
@@ -104,6 +124,17 @@ const Reports = () => {
               عرض التقرير
             </Button>
           </Grid>
+
+          <Grid item xs={6} md={2}>
+            <Button variant="outlined" size="large" fullWidth onClick={() => handleExport('csv')}>
+              تصدير CSV
+            </Button>
+          </Grid>
+          <Grid item xs={6} md={2}>
+            <Button variant="outlined" size="large" fullWidth onClick={() => handleExport('xlsx')}>
+              تصدير Excel
+            </Button>
+          </Grid>
         </Grid>
       </Paper>
 
@@ -125,7 +156,7 @@ const Reports = () => {
           </Grid>
 
           {/* الجدول التفصيلي */}
-          <DataTable columns={columns} rows={reportData.records} onDelete={() => {}} onEdit={() => {}} />
+          <DataTable columns={columns} rows={reportData.records?.results} onDelete={() => {}} onEdit={() => {}} />
         </Box>
       )}
     </Box>
@@ -8,7 +8,7 @@ import AddIcon from '@mui/icons-material/Add';
 import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
 import { toast } from 'react-toastify';
-import api from '../services/api';
+import api, { fetchAll } from '../services/api';
 
 const Students = () => {
   // --- States ---
@@ -31,12 +31,12 @@ const Students = () => {
   // --- Fetch Data ---
   const fetchData = async () => {
     try {
-      const [studentsRes, companiesRes] = await Promise.all([
-        api.get('students/'),
-        api.get('companies/')
+      const [studentsList, companiesList] = await Promise.all([
+        fetchAll('students/'),
+        fetchAll('companies/')
       ]);
-      setStudents(studentsRes.data);
-      setCompanies(companiesRes.data);
+      setStudents(studentsList);
+      setCompanies(companiesList);
     } catch (error) {
       console.error("Error fetching data", error);
       toast.error("فشل تحميل البيانات");
@@ -163,7 +163,7 @@ const Students = () => {
               return (
                 <TableRow key={student.id} hover>
                   <TableCell>
-                    <Avatar src={student.personal_photo} alt={student.name} />
+                    <Avatar src={student.photo_thumbnail && `${student.photo_thumbnail}&token=${localStorage.getItem('access_token')}`} alt={student.name} />
                   </TableCell>
                   <TableCell>{student.name}</TableCell>
                   <TableCell>{student.national_id}</TableCell>
@@ -4,12 +4,15 @@ import {
   Button, Box, TextField, MenuItem, Chip 
 } from '@mui/material';
 import { toast } from 'react-toastify';
-import api from '../services/api';
+import api, { fetchPage } from '../services/api';
 import PageHeader from '../components/PageHeader';
 import DataTable from '../components/DataTable';
 
 const TrainingDays = () => {
   const [days, setDays] = useState([]);
+  const [page, setPage] = useState(0);
+  const [rowsPerPage, setRowsPerPage] = useState(25);
+  const [count, setCount] = useState(0);
   const [open, setOpen] = useState(false);
   const [formData, setFormData] = useState({ date: '', day_type: 'training' });
   const [editMode, setEditMode] = useState(false);
@@ -39,14 +42,15 @@ const TrainingDays = () => {
   // جلب البيانات
   const fetchData = async () => {
     try {
-      const res = await api.get('training-days/');
-      setDays(res.data);
+      const data = await fetchPage('training-days/', page, rowsPerPage);
+      setDays(data.results);
+      setCount(data.count);
     } catch (err) {
       toast.error("فشل تحميل أيام التدريب");
     }
   };
 
-  useEffect(() => { fetchData(); }, []);
+  useEffect(() => { fetchData(); }, [page, rowsPerPage]);
 
   // دوال التحكم
   const handleSave = async () => {
@@ -103,6 +107,7 @@ const TrainingDays = () => {
         rows={days} 
         onEdit={openEdit} 
         onDelete={handleDelete} 
+        pagination={{ count, page, rowsPerPage, onPageChange: setPage, onRowsPerPageChange: (n) => { setRowsPerPage(n); setPage(0); } }}
       />
 
       {/* نافذة الإضافة / التعديل */}
@@ -1,12 +1,15 @@
 import { useState, useEffect } from 'react';
 import { Dialog, DialogTitle, DialogContent, DialogActions, Button, Box, TextField, MenuItem, Chip } from '@mui/material';
 import { toast } from 'react-toastify';
-import api from '../services/api';
+import api, { fetchPage } from '../services/api';
 import PageHeader from '../components/PageHeader';
 import DataTable from '../components/DataTable';
 
 const Users = () => {
   const [users, setUsers] = useState([]);
+  const [page, setPage] = useState(0);
+  const [rowsPerPage, setRowsPerPage] = useState(25);
+  const [count, setCount] = useState(0);
   const [open, setOpen] = useState(false);
   const [formData, setFormData] = useState({ username: '', email: '', password: '', role: 'employee', phone: '' });
 
@@ -34,14 +37,15 @@ const Users = () => {
 
   const fetchData = async () => {
     try {
-      const res = await api.get('users/');
-      setUsers(res.data);
+      const data = await fetchPage('users/', page, rowsPerPage);
+      setUsers(data.results);
+      setCount(data.count);
     } catch (err) {
       toast.error("فشل تحميل المستخدمين");
     }
   };
 
-  useEffect(() => { fetchData(); }, []);
+  useEffect(() => { fetchData(); }, [page, rowsPerPage]);
 
   const handleSave = async () => {
     try {
@@ -69,7 +73,10 @@ const Users = () => {
   return (
     <Box>
       <PageHeader title="👥 إدارة المستخدمين" btnLabel="مستخدم جديد" onAdd={() => setOpen(true)} />
-      <DataTable columns={columns} rows={users} onDelete={handleDelete} onEdit={() => {}} />
+      <DataTable
+        columns={columns} rows={users} onDelete={handleDelete} onEdit={() => {}}
+        pagination={{ count, page, rowsPerPage, onPageChange: setPage, onRowsPerPageChange: (n) => { setRowsPerPage(n); setPage(0); } }}
+      />
 
       <Dialog open={open} onClose={() => setOpen(false)} maxWidth="sm" fullWidth>
         <DialogTitle>إضافة مستخدم جديد</DialogTitle>
@@ -36,4 +36,25 @@ api.interceptors.response.use(
   }
 );
 
+// 3. القوائم في الباك اند مرقّمة (cursor افتراضياً)
+// جلب كل الصفحات (للقوائم المنسدلة الصغيرة مثل الشركات والطلاب)
+export const fetchAll = async (url, params = {}) => {
+  let results = [];
+  let res = await api.get(url, { params: { page_size: 500, ...params } });
+  results = results.concat(res.data.results);
+  while (res.data.next) {
+    res = await api.get(res.data.next);
+    results = results.concat(res.data.results);
+  }
+  return results;
+};
+
+// جلب صفحة واحدة بالإزاحة (لجدول DataTable) => { results, count }
+export const fetchPage = async (url, page, rowsPerPage, params = {}) => {
+  const res = await api.get(url, {
+    params: { pagination: 'offset', limit: rowsPerPage, offset: page * rowsPerPage, ...params },
+  });
+  return res.data;
+};
+
 export default api;
\ No newline at end of file
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import User, Visit, AssignedEvaluation, StudentAttendanceSummary, AbsenceAlert
+from .notifications import send_notification
+from .workload import OPEN_ASSIGNMENT_STATUSES
+
+
+# ==============================
+# 🚨 ABSENCE ALERTS (قواعد تنبيه الغياب)
+# ==============================
+def alert_thresholds():
+    """N: إجمالي الغياب بدون عذر - M: الغياب المتتالي"""
+    return (
+        getattr(settings, 'ABSENCE_ALERT_UNEXCUSED', 5),
+        getattr(settings, 'ATTENDANCE_STREAK_ALERT', 3),
+    )
+
+
+def triggered_rules(summary, unexcused_limit, streak_limit):
+    """القواعد المنطبقة على ملخص طالب: [(rule, key, value)]"""
+    rules = []
+    if summary.unexcused_count >= unexcused_limit:
+        rules.append(('unexcused_total', str(unexcused_limit), summary.unexcused_count))
+    if summary.absence_streak >= streak_limit:
+        # سلسلة جديدة تبدأ بعد يوم حضور جديد، فتُطلق تنبيهاً جديداً
+        start = summary.last_seen.isoformat() if summary.last_seen else 'never'
+        rules.append(('consecutive', start, summary.absence_streak))
+    return rules
+
+
+def alert_recipients(student_ids):
+    """مشرفو الطلاب (التقييمات المفتوحة + الزيارات) - لو الطالب بدون مشرف يُنبه المديرون"""
+    recipients = {sid: set() for sid in student_ids}
+    pairs = (
+        AssignedEvaluation.objects.filter(student_id__in=student_ids, status__in=OPEN_ASSIGNMENT_STATUSES)
+        .values_list('student_id', 'supervisor_id')
+        .union(Visit.objects.filter(student_id__in=student_ids).values_list('student_id', 'supervisor_id'))
+    )
+    for student_id, supervisor_id in pairs:
+        if supervisor_id:
+            recipients[student_id].add(supervisor_id)
+
+    if any(not users for users in recipients.values()):
+        managers = set(User.objects.filter(role=User.Role.BRANCH_MANAGER, is_active=True).values_list('id', flat=True))
+        for users in recipients.values():
+            if not users:
+                users.update(managers)
+    return recipients
+
+
+def evaluate_absence_alerts(student_ids):
+    """
+    تقييم القواعد للطلاب المتأثرين فقط من جدول الملخص (بدون مسح سجلات الحضور).
+    الحدود التي أُطلقت من قبل تُتخطى (جدول AbsenceAlert)، فكل حد يُرسل مرة واحدة:
+    كل تنبيه يُدخل منفرداً (get_or_create على القيد الفريد) والإشعار فقط للصفوف التي أُنشئت فعلاً،
+    فتقييمان متزامنان (حفظ حضور + الأمر الليلي) لا يرسلان نفس التنبيه مرتين.
+    يرجع عدد التنبيهات الجديدة.
+    """
+    ids = {sid for sid in student_ids if sid}
+    if not ids:
+        return 0
+
+    unexcused_limit, streak_limit = alert_thresholds()
+    summaries = StudentAttendanceSummary.objects.filter(student_id__in=ids).select_related('student')
+    candidates = [
+        (summary, rule, key, value)
+        for summary in summaries
+        for rule, key, value in triggered_rules(summary, unexcused_limit, streak_limit)
+    ]
+    if not candidates:
+        return 0
+
+    fired = set(
+        AbsenceAlert.objects.filter(student_id__in={c[0].student_id for c in candidates})
+        .values_list('student_id', 'rule', 'key')
+    )
+    new_alerts = []
+    for summary, rule, key, value in candidates:
+        if (summary.student_id, rule, key) in fired:
+            continue
+        _, created = AbsenceAlert.objects.get_or_create(
+            student_id=summary.student_id, rule=rule, key=key, defaults={'value': value}
+        )
+        if created:
+            new_alerts.append((summary, rule, key, value))
+    if not new_alerts:
+        return 0
+
+    recipients = alert_recipients({s.student_id for s, *_ in new_alerts})
+    users = User.objects.in_bulk({uid for ids in recipients.values() for uid in ids})
+    for summary, rule, key, value in new_alerts:
+        if rule == 'consecutive':
+            message = f"الطالب {summary.student.name} غائب {value} أيام متتالية"
+        else:
+            message = f"الطالب {summary.student.name} تجاوز {value} أيام غياب بدون عذر"
+        for uid in recipients[summary.student_id]:
+            send_notification(users.get(uid), "تنبيه غياب", message)
+    return len(new_alerts)
+
+
+def evaluate_changed_students(since=None, chunk_size=1000):
+    """الفحص الليلي: الطلاب الذين تغير ملخصهم فقط"""
+    since = since or timezone.now() - timedelta(days=1)
+    ids = list(StudentAttendanceSummary.objects.filter(updated_at__gte=since).values_list('student_id', flat=True))
+    return sum(evaluate_absence_alerts(ids[i:i + chunk_size]) for i in range(0, len(ids), chunk_size))
+
+
+def check_alerts(student_ids):
+    """بعد كل تحديث للملخص؛ ABSENCE_ALERTS_INCREMENTAL=False يترك الفحص للأمر الليلي"""
+    if getattr(settings, 'ABSENCE_ALERTS_INCREMENTAL', True):
+        evaluate_absence_alerts(student_ids)
+
+
+def check_alerts_on_change(sender, instance, **kwargs):
+    check_alerts([instance.student_id])
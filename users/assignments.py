@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .conditional import touch
+from .models import Student, AssignedEvaluation
+from .workload import get_loads, propose_assignments, summarize_plan, refresh_supervisor_loads
+
+
+# ==============================
+# 🤝 EXPAND EVALUATION REQUEST (توليد التوزيعات دفعة واحدة)
+# ==============================
+def request_students(evaluation_request):
+    """طلاب الطلب: المحددون صراحة + الطلاب النشطون في المؤسسات المحددة (استعلام واحد)"""
+    return list(
+        Student.objects.filter(
+            Q(evaluation_requests=evaluation_request)
+            | Q(company__evaluation_requests=evaluation_request, status='active')
+        )
+        .distinct()
+        .order_by('company_id', 'id')
+        .values_list('id', 'company_id')
+    )
+
+
+def expand_evaluation_request(evaluation_request, supervisor_ids=None, dry_run=False):
+    """
+    ينشئ AssignedEvaluation لكل طالب في الطلب ليس له توزيع بالفعل،
+    موزعة على المشرفين حسب فهرس الحمل (طلاب نفس المؤسسة لنفس المشرف).
+    dry_run=True يرجع الخطة المقترحة فقط بدون حفظ.
+    """
+    students = request_students(evaluation_request)
+    existing_rows = list(
+        AssignedEvaluation.objects.filter(evaluation_request=evaluation_request)
+        .values_list('student_id', flat=True)
+    )
+    existing = set(existing_rows)
+    pending = [(sid, cid) for sid, cid in students if sid not in existing]
+
+    loads = get_loads(supervisor_ids)
+    if pending and not loads:
+        raise ValueError("لا يوجد مشرفون متاحون للتوزيع")
+
+    plan = propose_assignments(pending, loads)
+    created = 0
+    if not dry_run and plan:
+        with transaction.atomic():
+            # expand متزامن أو توزيع يدوي سبقنا لبعض الطلاب: القيد الفريد يتخطاهم
+            AssignedEvaluation.objects.bulk_create(
+                (
+                    AssignedEvaluation(
+                        evaluation_request=evaluation_request,
+                        supervisor_id=sup_id, company_id=company_id, student_id=student_id,
+                    )
+                    for student_id, company_id, sup_id in plan
+                ),
+                ignore_conflicts=True,
+            )
+            created = AssignedEvaluation.objects.filter(evaluation_request=evaluation_request).count() - len(existing_rows)
+            # bulk_create لا يطلق signals
+            touch(AssignedEvaluation)
+            refresh_supervisor_loads({sup_id for _, _, sup_id in plan})
+
+    return {
+        "students": len(students),
+        "already_assigned": len(students) - len(pending),
+        "created": created,
+        "dry_run": dry_run,
+        "per_supervisor": summarize_plan(plan),
+    }
@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.db.models import Count, FilteredRelation, Q
+
+from .fanout import deliver
+from .models import User, Student, AttendanceRecord, Visit, AssignedEvaluation, Notification
+from .training_calendar import calendar
+from .workload import OPEN_ASSIGNMENT_STATUSES
+
+
+# ==============================
+# 🕳️ MISSING ATTENDANCE (طلاب بدون سجل حضور في أيام التدريب)
+# ==============================
+def find_attendance_gaps(start, end, company_id=None):
+    """
+    أيام التدريب من التقويم، ثم anti-join بين الطلاب النشطين وسجلات الحضور في تلك الأيام:
+    1) الطلاب الذين عدد سجلاتهم في الفترة أقل من عدد أيام التدريب (JOIN مقيد بالأيام + HAVING)
+    2) سجلاتهم الموجودة فقط لاستنتاج الأيام الناقصة.
+    استعلامان مهما كان عدد الطلاب أو الأيام.
+    """
+    days = calendar.days(start, end)
+    report = {
+        "from": start,
+        "to": end,
+        "training_days": len(days),
+        "missing_records": 0,
+        "students_with_gaps": 0,
+        "by_day": [],
+        "by_company": [],
+    }
+    if not days:
+        return report
+
+    students = Student.objects.filter(status='active')
+    if company_id:
+        students = students.filter(company_id=company_id)
+    short = list(
+        students.annotate(window=FilteredRelation('attendance_records', condition=Q(attendance_records__date__in=days)))
+        .annotate(recorded=Count('window'))
+        .filter(recorded__lt=len(days))
+        .order_by('company_id', 'id')
+        .values_list('id', 'name', 'company_id', 'company__name')
+    )
+    if not short:
+        return report
+
+    recorded = defaultdict(set)
+    for student_id, day in AttendanceRecord.objects.filter(
+        student_id__in=[row[0] for row in short], date__in=days
+    ).values_list('student_id', 'date'):
+        recorded[student_id].add(day)
+
+    by_day = defaultdict(int)
+    companies = {}
+    for student_id, name, company_id, company_name in short:
+        missing = [day for day in days if day not in recorded[student_id]]
+        for day in missing:
+            by_day[day] += 1
+        group = companies.setdefault(company_id, {
+            "company": company_id, "company_name": company_name, "missing": 0, "students": [],
+        })
+        group["missing"] += len(missing)
+        group["students"].append({"id": student_id, "name": name, "missing_days": missing})
+
+    report["missing_records"] = sum(by_day.values())
+    report["students_with_gaps"] = len(short)
+    report["by_day"] = [{"date": day, "missing": by_day[day]} for day in days if by_day[day]]
+    report["by_company"] = sorted(companies.values(), key=lambda c: -c["missing"])
+    return report
+
+
+def company_supervisors(company_ids):
+    """المشرفون المسؤولون عن كل مؤسسة (تقييمات مفتوحة + زيارات معلقة)"""
+    pairs = (
+        AssignedEvaluation.objects.filter(company_id__in=company_ids, status__in=OPEN_ASSIGNMENT_STATUSES)
+        .values_list('company_id', 'supervisor_id')
+        .union(Visit.objects.filter(company_id__in=company_ids, status='pending').values_list('company_id', 'supervisor_id'))
+    )
+    supervisors = defaultdict(set)
+    for company_id, supervisor_id in pairs:
+        if supervisor_id:
+            supervisors[company_id].add(supervisor_id)
+    return supervisors
+
+
+def notify_gaps(report):
+    """
+    إشعار واحد لكل مشرف يلخص مؤسساته الناقصة (bulk_create).
+    المؤسسات بدون مشرف تُجمع في إشعار للمديرين. يرجع عدد الإشعارات.
+    """
+    if not report["by_company"]:
+        return 0
+
+    supervisors = company_supervisors([c["company"] for c in report["by_company"]])
+    lines = defaultdict(list)
+    unassigned = []
+    for company in report["by_company"]:
+        line = f"{company['company_name']}: {len(company['students'])} طالب / {company['missing']} يوم"
+        recipients = supervisors.get(company["company"])
+        if recipients:
+            for uid in recipients:
+                lines[uid].append(line)
+        else:
+            unassigned.append(line)
+
+    if unassigned:
+        for uid in User.objects.filter(role=User.Role.BRANCH_MANAGER, is_active=True).values_list('id', flat=True):
+            lines[uid].extend(unassigned)
+
+    title = f"حضور غير مسجل ({report['from']} → {report['to']})"
+    created, _ = deliver([
+        Notification(user_id=uid, title=title, message="\n".join(company_lines))
+        for uid, company_lines in lines.items()
+    ])
+    return len(created)
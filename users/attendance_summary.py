@@ -0,0 +1,124 @@
+from django.db.models import Count, Max, Q, OuterRef, Subquery, F
+
+from .conditional import touch
+from .models import Student, AttendanceRecord, StudentAttendanceSummary
+
+
+# ==============================
+# 🧮 STUDENT ATTENDANCE SUMMARY (ملخص الحضور لكل طالب)
+# ==============================
+SUMMARY_FIELDS = [
+    'present_count', 'absent_count', 'excused_count', 'unexcused_count',
+    'absence_streak', 'unexcused_streak', 'last_seen', 'last_record_date', 'updated_at',
+]
+
+
+def _streaks(student_ids):
+    """
+    الغياب المتتالي = سجلات الغياب بعد آخر يوم حضور (أو كل الغياب لو لم يحضر أبداً).
+    unexcused_streak = الغياب بدون عذر بعد آخر حضور أو غياب بعذر.
+    استعلامان مجمعان لكل المجموعة.
+    """
+    records = AttendanceRecord.objects.filter(student_id__in=student_ids, status='absent')
+
+    last_present = AttendanceRecord.objects.filter(
+        student=OuterRef('student'), status='present'
+    ).order_by('-date').values('date')[:1]
+    absence = dict(
+        records.annotate(last_present=Subquery(last_present))
+        .filter(Q(last_present__isnull=True) | Q(date__gt=F('last_present')))
+        .values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+    )
+
+    last_break = AttendanceRecord.objects.filter(
+        Q(status='present') | Q(is_excused=True), student=OuterRef('student')
+    ).order_by('-date').values('date')[:1]
+    unexcused = dict(
+        records.filter(is_excused=False)
+        .annotate(last_break=Subquery(last_break))
+        .filter(Q(last_break__isnull=True) | Q(date__gt=F('last_break')))
+        .values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+    )
+    return absence, unexcused
+
+
+def refresh_attendance_summaries(student_ids):
+    """
+    إعادة حساب ملخص الطلاب المتأثرين فقط (بعد أي حفظ / حذف / تسجيل جماعي).
+    ثلاثة استعلامات مجمعة + upsert واحد مهما كان عدد الطلاب.
+    """
+    ids = {sid for sid in student_ids if sid}
+    if not ids:
+        return
+
+    counts = {
+        row['student_id']: row
+        for row in AttendanceRecord.objects.filter(student_id__in=ids)
+        .values('student_id')
+        .annotate(
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+            excused=Count('id', filter=Q(status='absent', is_excused=True)),
+            last_seen=Max('date', filter=Q(status='present')),
+            last_record=Max('date'),
+        )
+    }
+    absence, unexcused = _streaks(ids)
+
+    # الطالب المحذوف يُحذف ملخصه مع الـ CASCADE
+    existing = Student.objects.filter(id__in=ids).values_list('id', flat=True)
+    summaries = []
+    for sid in existing:
+        row = counts.get(sid, {})
+        absent = row.get('absent', 0)
+        excused = row.get('excused', 0)
+        summaries.append(StudentAttendanceSummary(
+            student_id=sid,
+            present_count=row.get('present', 0),
+            absent_count=absent,
+            excused_count=excused,
+            unexcused_count=absent - excused,
+            absence_streak=absence.get(sid, 0),
+            unexcused_streak=unexcused.get(sid, 0),
+            last_seen=row.get('last_seen'),
+            last_record_date=row.get('last_record'),
+        ))
+
+    StudentAttendanceSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=SUMMARY_FIELDS,
+    )
+    touch(StudentAttendanceSummary)
+
+
+def rebuild_attendance_summaries(chunk_size=1000):
+    """إعادة بناء الملخص لكل الطلاب على دفعات (بعد استيراد بيانات أو ترحيل)"""
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Student.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return total
+        refresh_attendance_summaries(ids)
+        total += len(ids)
+        last_id = ids[-1]
+
+
+# ------------------------------
+# SIGNAL HANDLERS
+# ------------------------------
+def remember_previous_student(sender, instance, **kwargs):
+    """لو تم نقل السجل لطالب آخر نحدث ملخص الطالب القديم أيضاً"""
+    instance._previous_student_id = None
+    if instance.pk:
+        instance._previous_student_id = (
+            sender.objects.filter(pk=instance.pk).values_list('student_id', flat=True).first()
+        )
+
+
+def update_summary_on_change(sender, instance, **kwargs):
+    refresh_attendance_summaries([instance.student_id, getattr(instance, '_previous_student_id', None)])
@@ -0,0 +1,129 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .conditional import touch
+from .models import SystemLog
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# 📝 AUDIT LOG WRITER (كتابة السجلات على دفعات في الخلفية)
+# ==============================
+class AuditLogWriter:
+    """
+    طابور في الذاكرة + thread في الخلفية يكتب السجلات بـ bulk_create.
+    - الطابور محدود: لو امتلأ، الطلب ينتظر قليلاً ثم يكتب الدفعة بنفسه (backpressure).
+    - يتم تفريغ الطابور عند إيقاف السيرفر (atexit).
+    - قبل كل دفعة يتخلص الـ thread من الاتصال المنتهي (CONN_MAX_AGE / انقطاع)، والدفعة الفاشلة تُعاد مرة.
+    """
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=1.0, put_timeout=0.5):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, user_id, action, details):
+        self.start()
+        entry = (user_id, action, details)
+        try:
+            self.queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            # الطابور ممتلئ: نكتب دفعة من نفس الطلب بدل فقد السجل
+            self.flush()
+            self._write([entry])
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch, retry=True):
+        if not batch:
+            return
+        try:
+            SystemLog.objects.bulk_create(
+                SystemLog(user_id=user_id, action=action, details=details)
+                for user_id, action, details in batch
+            )
+            touch(SystemLog)
+        except Exception:
+            if not retry:
+                logger.exception("Failed to write %d audit log entries", len(batch))
+                return
+            logger.warning("Audit log batch failed, retrying on a new connection", exc_info=True)
+            if not connection.in_atomic_block:
+                connection.close()  # الاتصال التالي يُفتح من جديد
+            self._write(batch, retry=False)
+
+    def flush(self):
+        """كتابة كل ما في الطابور الآن"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                self._write_next(first)
+        finally:
+            connection.close()
+
+    def _write_next(self, first):
+        # thread طويل العمر لا يمر بـ request_started: نغلق الاتصال المنتهي بأنفسنا
+        close_old_connections()
+        self._write([first] + self._drain(self.batch_size - 1))
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+
+audit_writer = AuditLogWriter(
+    max_size=getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 10000),
+    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 500),
+    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(audit_writer.shutdown)
+
+
+def write_log(user, action, details):
+    """
+    في الوضع غير المتزامن يُضاف السجل للطابور فقط بعد نجاح المعاملة (on_commit)،
+    فلو فشلت المعاملة لا يُكتب سجل لعملية لم تحدث.
+    """
+    if not getattr(settings, 'AUDIT_LOG_ASYNC', False):
+        SystemLog.objects.create(user=user, action=action, details=details)
+        return
+
+    user_id = user.pk
+    transaction.on_commit(lambda: audit_writer.enqueue(user_id, action, details))
@@ -0,0 +1,21 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+# ==============================
+# 🔑 JWT من ?token= (EventSource / <img> / روابط التحميل لا ترسل headers)
+# ==============================
+def authenticate_token(request):
+    """المستخدم من ?token= أو Authorization، أو None"""
+    auth = JWTAuthentication()
+    raw = request.GET.get('token')
+    if not raw:
+        header = auth.get_header(request)
+        raw = auth.get_raw_token(header) if header else None
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from .conditional import touch
+from .models import AttendanceRecord, ChunkedUpload
+from .storage import content_addressed_storage
+
+STREAM_BLOCK_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.heic', '.webp')
+
+
+# ==============================
+# 📎 CHUNKED UPLOADS (رفع على أجزاء + استكمال بعد انقطاع الاتصال)
+# ==============================
+class OffsetMismatch(Exception):
+    """الجزء لا يبدأ من آخر بايت محفوظ (العميل يستكمل من upload.offset)"""
+
+
+def max_upload_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK', 5 * 1024 * 1024)
+
+
+def part_path(upload):
+    directory = getattr(settings, 'CHUNKED_UPLOAD_DIR', os.path.join(settings.MEDIA_ROOT, 'chunked_uploads'))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{upload.pk}.part")
+
+
+def validate_new_upload(filename, size):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"نوع الملف غير مسموح: {ext or filename}")
+    if size <= 0 or size > max_upload_size():
+        raise ValueError(f"حجم الملف يجب أن يكون بين 1 و {max_upload_size()} بايت")
+
+
+def check_chunk(upload, offset, length):
+    if upload.status != 'uploading':
+        raise ValueError("الرفع مكتمل بالفعل")
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    if offset + length > upload.size:
+        raise ValueError("الجزء يتجاوز حجم الملف المعلن")
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    1) قراءة الجزء من stream الطلب إلى ملف مؤقت خاص بالطلب على دفعات 64KB - خارج أي معاملة،
+       فالعميل البطيء لا يمسك اتصال قاعدة البيانات ولا قفل الصف أثناء الشبكة.
+    2) معاملة قصيرة: قفل صف الرفع، إعادة فحص الـ offset (جزء متزامن ربما سبقنا)،
+       إلحاق الملف المؤقت بملف .part (نسخ محلي) وتقديم الـ offset. يرجع الرفع بعد التحديث.
+    """
+    if length <= 0 or length > max_chunk_size():
+        raise ValueError(f"حجم الجزء يجب أن يكون بين 1 و {max_chunk_size()} بايت")
+    check_chunk(upload, offset, length)  # رفض الأجزاء المكررة قبل قراءة الجسم
+
+    path = part_path(upload)
+    fd, chunk_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{upload.pk}.", suffix='.chunk')
+    try:
+        written = 0
+        with os.fdopen(fd, 'wb') as f:
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+        if written != length:
+            raise ValueError("انقطع الاتصال قبل اكتمال الجزء")
+
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            check_chunk(upload, offset, length)
+            with open(path, 'r+b' if offset else 'wb') as part, open(chunk_path, 'rb') as chunk:
+                part.seek(offset)
+                part.truncate()  # بقايا محاولة سابقة لم تكتمل
+                shutil.copyfileobj(chunk, part, STREAM_BLOCK_SIZE)
+            upload.offset += written
+            upload.save(update_fields=['offset', 'updated_at'])
+    finally:
+        os.remove(chunk_path)
+    return upload
+
+
+def finalize_upload(upload, sha256):
+    """
+    التحقق من الحجم والـ checksum ثم نقل الملف للتخزين بالمحتوى (مرجع واحد يملكه الرفع).
+    تحت قفل صف الرفع: طلبا complete متزامنان -> الثاني ينتظر ثم يجد الرفع مكتملاً (بدون مرجع ثانٍ).
+    """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'complete':
+            return upload
+        if upload.offset != upload.size:
+            raise ValueError(f"الملف غير مكتمل ({upload.offset}/{upload.size})")
+
+        path = part_path(upload)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b''):
+                digest.update(block)
+        if digest.hexdigest() != (sha256 or '').lower():
+            raise ValueError("checksum غير مطابق")
+
+        # الاسم النهائي من المحتوى، ونأخذ الامتداد فقط من اسم العميل
+        ext = os.path.splitext(upload.filename)[1].lower()
+        with open(path, 'rb') as f:
+            name = content_addressed_storage().save(f"attendance_proofs/proof{ext}", File(f))
+        upload.file = name
+        upload.status = 'complete'
+        upload.save(update_fields=['file', 'status', 'updated_at'])
+        transaction.on_commit(lambda: remove_part(path))
+    return upload
+
+
+def remove_part(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def attach_upload(upload, record_ids):
+    """
+    ربط الملف بسجلات الحضور بالمرجع (بدون نسخ): مرجع لكل سجل + تحرير ملفات الإثبات القديمة.
+    تحديث واحد لكل السجلات، فالـ signals لا تعمل ونحدّث المراجع يدوياً.
+    """
+    storage = content_addressed_storage()
+    with transaction.atomic():
+        records = list(
+            AttendanceRecord.objects.select_for_update()
+            .filter(id__in=record_ids).exclude(proof_file=upload.file)
+            .values_list('id', 'proof_file')
+        )
+        for _, previous in records:
+            storage.add_reference(upload.file)
+            if previous:
+                storage.delete(previous)
+        AttendanceRecord.objects.filter(id__in=[pk for pk, _ in records]).update(proof_file=upload.file)
+        touch(AttendanceRecord)
+    return len(records)
+
+
+def release_upload(sender, instance, **kwargs):
+    """signal: حذف صف الرفع يحذف الجزء المؤقت ويحرر مرجع الملف النهائي"""
+    if instance.file:
+        content_addressed_storage().delete(instance.file)
+    path = part_path(instance)
+    transaction.on_commit(lambda: remove_part(path))
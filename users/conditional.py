@@ -0,0 +1,109 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import TableVersion
+
+
+# ==============================
+# 🏷️ CONDITIONAL GET (ETag من أرقام نسخ الجداول)
+# ==============================
+def table_versions(models):
+    """
+    رقم نسخة لكل جدول من TableVersion: استعلام واحد بالمفتاح الأساسي، ونفس النتيجة في كل الـ workers
+    (الكاش المحلي LocMem منفصل لكل عملية فلا يصلح هنا).
+    """
+    labels = [m._meta.label_lower for m in models]
+    versions = dict(TableVersion.objects.filter(table__in=labels).values_list('table', 'version'))
+    # جدول لم يُكتب عليه بعد ليس له صف
+    return [versions.get(label, '') for label in labels]
+
+
+class TableBump:
+    """
+    callback واحد لكل معاملة (أو savepoint): الجداول التي كُتبت فيها تُجمع هنا ثم upsert واحد بعد نجاحها
+    (حذف 500 صف = استعلام نسخ واحد بدلاً من 500).
+    """
+    def __init__(self, labels):
+        self.labels = set(labels)
+
+    def __call__(self):
+        TableVersion.objects.bulk_create(
+            [TableVersion(table=label, version=uuid.uuid4().hex) for label in self.labels],
+            update_conflicts=True, unique_fields=['table'], update_fields=['version'],
+        )
+
+
+def touch(*models):
+    """
+    تغيير نسخة الجداول بعد نجاح المعاملة (بدون قفل صف النسخة طوال المعاملة).
+    تُستدعى من الـ signals، ويدوياً بعد bulk_create / update التي لا تطلق signals.
+    """
+    labels = {m._meta.label_lower for m in models}
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        # callback نفس المعاملة / الـ savepoint لو سُجل (يختفي مع تراجع الـ savepoint الذي سجله)
+        savepoints = set(connection.savepoint_ids)
+        for sids, callback, _ in reversed(connection.run_on_commit):
+            if isinstance(callback, TableBump) and sids == savepoints:
+                callback.labels |= labels
+                return
+    transaction.on_commit(TableBump(labels))
+
+
+def touch_on_change(sender, **kwargs):
+    """signal: post_save / post_delete"""
+    touch(sender)
+
+
+def touch_on_m2m_change(sender, instance, action, model, **kwargs):
+    """signal: m2m_changed - الطرفان (مثلاً EvaluationRequest و Company)"""
+    if action.startswith('post_'):
+        touch(type(instance), model)
+
+
+def compute_etag(request, versions, vary=None):
+    """
+    النسخ + المسار الكامل (الفلاتر والترقيم) + المستخدم (القوائم تختلف حسب الدور والمالك).
+    """
+    parts = list(versions)
+    parts += [request.get_full_path(), str(request.user.pk)]
+    if vary:
+        parts.append(str(vary(request)))
+    return '"' + hashlib.sha1('|'.join(parts).encode()).hexdigest() + '"'
+
+
+def conditional_get(*models, vary=None):
+    """
+    ديكوريتور تحت @permission_classes: لو If-None-Match يطابق -> 304 بعد استعلام النسخ فقط
+    (بدون استعلامات الـ view والـ serializer).
+    models: الجداول التي تقرأها الاستجابة (أي كتابة عليها تغير الـ ETag).
+    vary: دالة إضافية لما يغير الاستجابة بدون كتابة (مثل تاريخ اليوم).
+    الـ view يجد النسخ في request.table_versions (لربط أي كاش بنفس نسخ الـ ETag).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            request.table_versions = table_versions(models)
+            etag = compute_etag(request, request.table_versions, vary)
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match and etag in parse_etags(if_none_match):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response['ETag'] = etag
+            # المتصفح يعيد التحقق كل مرة ويرسل If-None-Match تلقائياً
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
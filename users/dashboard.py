@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import Company, Student, Visit, Evaluation, AttendanceRecord
+
+
+# ==============================
+# 📊 DASHBOARD STATS (تجميع + كاش قصير)
+# ==============================
+DASHBOARD_CACHE_PREFIX = 'dashboard_stats'
+
+
+def dashboard_cache_key(day=None):
+    day = day or datetime.now().date()
+    return f"{DASHBOARD_CACHE_PREFIX}:{day.isoformat()}"
+
+
+def compute_dashboard_stats(day):
+    """حساب الإحصائيات بعدد ثابت من الاستعلامات (Count مع filter بدلاً من count() لكل رقم)"""
+    # أرقام الحضور التراكمية من جدول الملخص (LEFT JOIN في نفس الاستعلام) بدلاً من مسح سجلات الحضور
+    streak_alert = getattr(settings, 'ATTENDANCE_STREAK_ALERT', 3)
+    students = Student.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        present=Sum('attendance_summary__present_count'),
+        absent=Sum('attendance_summary__absent_count'),
+        unexcused=Sum('attendance_summary__unexcused_count'),
+        at_risk=Count('id', filter=Q(attendance_summary__absence_streak__gte=streak_alert)),
+    )
+    attendance = AttendanceRecord.objects.filter(date=day).aggregate(
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+    )
+
+    return {
+        "students": {"total": students['total'], "active": students['active']},
+        "companies": {"total": Company.objects.count()},
+        "evaluations": {"total_completed": Evaluation.objects.count()},
+        "visits": {"pending": Visit.objects.filter(status='pending').count()},
+        "attendance_today": {
+            "present": attendance['present'],
+            "absent": attendance['absent'],
+        },
+        "attendance_totals": {
+            "present": students['present'] or 0,
+            "absent": students['absent'] or 0,
+            "unexcused": students['unexcused'] or 0,
+            "students_on_absence_streak": students['at_risk'],
+        },
+    }
+
+
+def get_dashboard_stats(versions=()):
+    """
+    يرجع (stats, cached) - من الكاش لو موجود، وإلا يحسبها ويخزنها.
+    versions: أرقام نسخ الجداول (نفس نسخ الـ ETag). الكاش محلي لكل worker ولا يصله إبطال
+    الكتابات في worker آخر، فالقيمة المخزنة تُستخدم فقط لو حُسبت من نفس النسخ.
+    """
+    today = datetime.now().date()
+    key = dashboard_cache_key(today)
+    versions = list(versions)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1], True
+
+    stats = compute_dashboard_stats(today)
+    cache.set(key, (versions, stats), getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return stats, False
+
+
+def invalidate_dashboard_stats(**kwargs):
+    """تُستدعى من الـ signals عند أي تعديل يؤثر على الأرقام"""
+    cache.delete(dashboard_cache_key())
@@ -0,0 +1,167 @@
+import csv
+import tempfile
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils.http import content_disposition_header
+
+from .models import AttendanceRecord, Evaluation, Student
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # التصدير لـ XLSX اختياري
+    Workbook = None
+
+
+# ==============================
+# 📤 STREAMING EXPORTS (CSV / XLSX)
+# ==============================
+EXPORT_CHUNK_SIZE = 2000
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+class Echo:
+    """ملف وهمي: csv.writer يكتب فيه ويرجع السطر مباشرة بدون تخزين"""
+    def write(self, value):
+        return value
+
+
+def _display(choices):
+    return dict(choices)
+
+
+def attendance_export_spec():
+    status = _display(AttendanceRecord.ATTENDANCE_CHOICES)
+    return {
+        'headers': ['الطالب', 'الرقم القومي', 'المؤسسة', 'التاريخ', 'الحالة', 'سبب الغياب', 'بعذر'],
+        'fields': ['student__name', 'student__national_id', 'company__name', 'date', 'status', 'reason', 'is_excused'],
+        'formatters': {
+            'status': lambda v: status.get(v, v),
+            'is_excused': lambda v: 'نعم' if v else 'لا',
+        },
+        'date_field': 'date',
+        'ordering': ('date', 'id'),
+    }
+
+
+def evaluation_export_spec():
+    result = _display(Evaluation._meta.get_field('result').choices)
+    status = _display(Evaluation._meta.get_field('status').choices)
+    return {
+        'headers': [
+            'الطالب', 'المؤسسة', 'المشرف', 'الالتزام بالمواعيد', 'السلوك', 'المهارات العملية',
+            'مستوى التعلم', 'جودة الأداء', 'العمل ضمن فريق', 'النتيجة', 'التاريخ', 'موعد الإعادة', 'الحالة',
+        ],
+        'fields': [
+            'student__name', 'company__name', 'supervisor__username', 'punctuality', 'behavior',
+            'practical_skills', 'learning_level', 'performance_quality', 'teamwork', 'result',
+            'date', 'repeat_date', 'status',
+        ],
+        'formatters': {
+            'result': lambda v: result.get(v, v),
+            'status': lambda v: status.get(v, v),
+        },
+        'date_field': 'date',
+        'ordering': ('date', 'id'),
+    }
+
+
+def student_export_spec():
+    status = _display(Student.STATUS_CHOICES)
+    return {
+        'headers': ['الاسم', 'الرقم القومي', 'الهاتف', 'المؤسسة', 'الحالة', 'تاريخ الإضافة'],
+        'fields': ['name', 'national_id', 'phone', 'company__name', 'status', 'created_at'],
+        'formatters': {
+            'status': lambda v: status.get(v, v),
+            'created_at': lambda v: v.date() if v else v,
+        },
+        'date_field': 'created_at__date',
+        'ordering': ('id',),
+    }
+
+
+def iter_rows(qs, spec):
+    """صفوف منسقة من قاعدة البيانات على دفعات (values_list + iterator)"""
+    fields = spec['fields']
+    formatters = [spec['formatters'].get(f) for f in fields]
+    rows = qs.order_by(*spec['ordering']).values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield [
+            fmt(value) if fmt else ('' if value is None else value)
+            for fmt, value in zip(formatters, row)
+        ]
+
+
+def _take(iterator, n):
+    return list(islice(iterator, n))
+
+
+async def aiter_chunks(iterator, size=EXPORT_CHUNK_SIZE):
+    """
+    تحت ASGI يستهلك Django الـ iterator المتزامن بـ sync_to_async(list) فيحمّل الملف كله في الذاكرة،
+    فنقرأ دفعة دفعة في sync_to_async (نفس الـ thread ونفس اتصال قاعدة البيانات).
+    """
+    take = sync_to_async(_take)
+    try:
+        while chunk := await take(iterator, size):
+            for part in chunk:
+                yield part
+    finally:
+        # العميل قطع الاتصال: إغلاق الـ generator (والـ cursor) في نفس الـ thread
+        await sync_to_async(iterator.close)()
+
+
+def csv_response(qs, spec, filename, asynchronous=False):
+    """asynchronous=True تحت ASGI (نفس البث بدفعات بدلاً من تجميع الملف في الذاكرة)"""
+    writer = csv.writer(Echo())
+
+    def stream():
+        # BOM عشان Excel يقرأ العربي صح
+        yield '\ufeff' + writer.writerow(spec['headers'])
+        for row in iter_rows(qs, spec):
+            yield writer.writerow(row)
+
+    content = aiter_chunks(stream()) if asynchronous else stream()
+    response = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def _read_blocks(fileobj):
+    try:
+        while block := fileobj.read(FILE_BLOCK_SIZE):
+            yield block
+    finally:
+        fileobj.close()
+
+
+def xlsx_response(qs, spec, filename, asynchronous=False):
+    """
+    openpyxl في وضع write_only يكتب الصفوف مباشرة لملف مؤقت على القرص،
+    ثم يُرسل الملف بـ FileResponse (الذاكرة ثابتة مهما كبر التقرير).
+    تحت ASGI (asynchronous=True) يُقرأ الملف على دفعات بدلاً من FileResponse.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=filename[:31])
+    ws.sheet_view.rightToLeft = True
+    ws.append(spec['headers'])
+    for row in iter_rows(qs, spec):
+        ws.append(row)
+
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    if asynchronous:
+        size = tmp.seek(0, 2)
+        tmp.seek(0)
+        response = StreamingHttpResponse(aiter_chunks(_read_blocks(tmp), 16), content_type=content_type)
+        response['Content-Length'] = size
+        response['Content-Disposition'] = content_disposition_header(True, f'{filename}.xlsx')
+        return response
+
+    tmp.seek(0)
+    return FileResponse(
+        tmp, as_attachment=True, filename=f'{filename}.xlsx',
+        content_type=content_type,
+    )
@@ -0,0 +1,134 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .conditional import touch
+from .models import User, Notification, Visit, AssignedEvaluation, FanoutJob
+from .notification_bus import get_notification_bus
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# 📣 NOTIFICATION FAN-OUT (إشعارات جماعية في الخلفية)
+# ==============================
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='notification-fanout')
+
+
+def resolve_audience(role=None, company_id=None, evaluation_request_id=None):
+    """
+    تحديد المستلمين (ids فقط) بعدد ثابت من الاستعلامات:
+    - role: كل المستخدمين النشطين بهذا الدور
+    - company_id: المشرفون الذين لديهم زيارات أو تقييمات في المؤسسة
+    - evaluation_request_id: مشرفو طلاب طلب التقييم (التوزيعات + الزيارات)
+    """
+    user_ids = set()
+    if role:
+        user_ids |= set(User.objects.filter(role=role, is_active=True).values_list('id', flat=True))
+    if company_id:
+        user_ids |= set(Visit.objects.filter(company_id=company_id).values_list('supervisor_id', flat=True))
+        user_ids |= set(AssignedEvaluation.objects.filter(company_id=company_id).values_list('supervisor_id', flat=True))
+    if evaluation_request_id:
+        user_ids |= set(
+            AssignedEvaluation.objects.filter(evaluation_request_id=evaluation_request_id)
+            .values_list('supervisor_id', flat=True)
+        )
+        user_ids |= set(
+            Visit.objects.filter(student__evaluation_requests=evaluation_request_id)
+            .values_list('supervisor_id', flat=True)
+        )
+    user_ids.discard(None)
+    return sorted(user_ids)
+
+
+def deliver(notifications, chunk_size=None):
+    """
+    كتابة إشعارات جاهزة (رسائل مختلفة لكل مستخدم) بـ bulk_create على دفعات،
+    ثم تحديث العدادات والنشر للمتصلين. يرجع (الإشعارات المنشأة، عدد الدفعات).
+    """
+    chunk_size = chunk_size or getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 1000)
+    created = []
+    chunks = 0
+    for i in range(0, len(notifications), chunk_size):
+        created.extend(Notification.objects.bulk_create(notifications[i:i + chunk_size]))
+        chunks += 1
+
+    # bulk_create لا يطلق post_save: نغير نسخة الجدول وننشر يدوياً
+    touch(Notification)
+    bus = get_notification_bus()
+    for notif in created:
+        if notif.pk:
+            bus.publish(notif.user_id, NotificationSerializer(notif).data)
+    return created, chunks
+
+
+def fan_out(user_ids, title, message, chunk_size=None):
+    """نفس الرسالة لكل المستلمين"""
+    started = time.perf_counter()
+    created, chunks = deliver(
+        [Notification(user_id=uid, title=title, message=message) for uid in user_ids], chunk_size
+    )
+    return {
+        "recipients": len(user_ids),
+        "created": len(created),
+        "chunks": chunks,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def job_stats(job):
+    stats = {"job_id": str(job.id), "status": job.status}
+    if job.status == 'done':
+        stats.update(recipients=job.recipients, created=job.created, chunks=job.chunks, duration_ms=job.duration_ms)
+    elif job.status == 'failed':
+        stats["error"] = job.error
+    return stats
+
+
+def get_fanout_stats(job_id):
+    job = FanoutJob.objects.filter(pk=job_id).first()
+    return job_stats(job) if job else None
+
+
+def run_job(job_id):
+    """
+    تنفيذ مهمة في حالة queued. تحويلها لـ running بـ UPDATE شرطي يضمن أن worker واحد فقط ينفذها
+    (الـ thread العادي أو أمر resume_fanout_jobs بعد إعادة التشغيل).
+    """
+    if not FanoutJob.objects.filter(pk=job_id, status='queued').update(status='running', updated_at=timezone.now()):
+        return
+    job = FanoutJob.objects.get(pk=job_id)
+    try:
+        stats = fan_out(resolve_audience(**job.audience), job.title, job.message)
+        FanoutJob.objects.filter(pk=job_id).update(status='done', updated_at=timezone.now(), **stats)
+    except Exception as e:
+        logger.exception("Notification fan-out %s failed", job_id)
+        FanoutJob.objects.filter(pk=job_id).update(status='failed', error=str(e), updated_at=timezone.now())
+
+
+def _run_job_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+def dispatch_fanout(title, message, **audience):
+    """
+    يسجل المهمة في FanoutJob ويبدأ الإرسال بعد نجاح المعاملة، ويرجع job_id فوراً
+    (زمن ثابت مهما كان عدد المستلمين). NOTIFICATION_FANOUT_ASYNC=False يشغله في نفس الطلب (الاختبارات).
+    مهمة ضاعت مع إعادة تشغيل الـ worker تبقى queued حتى يشغلها resume_fanout_jobs.
+    """
+    job = FanoutJob.objects.create(
+        title=title, message=message, audience={k: v for k, v in audience.items() if v is not None}
+    )
+    if getattr(settings, 'NOTIFICATION_FANOUT_ASYNC', False):
+        transaction.on_commit(lambda: _executor.submit(_run_job_in_thread, job.id))
+    else:
+        transaction.on_commit(lambda: run_job(job.id))
+    return str(job.id)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# ==============================
+# 🖼️ STUDENT PHOTOS (تطبيع الصور + نسخ مصغرة عند الطلب)
+# ==============================
+PHOTO_MAX_SIZE = 1600
+PHOTO_QUALITY = 85
+DEFAULT_PHOTO_VARIANTS = {'thumb': 64, 'small': 160, 'medium': 400}
+
+
+def photo_variants():
+    """{اسم النسخة: طول الضلع بالبكسل} - قابلة للتعديل من STUDENT_PHOTO_VARIANTS"""
+    return getattr(settings, 'STUDENT_PHOTO_VARIANTS', DEFAULT_PHOTO_VARIANTS)
+
+
+def _encode_jpeg(image):
+    buffer = BytesIO()
+    # بدون exif=... فلا تُنسخ بيانات EXIF (الموقع، الجهاز...) للملف الجديد
+    image.save(buffer, format='JPEG', quality=PHOTO_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _load_rgb(fileobj):
+    image = Image.open(fileobj)
+    # تطبيق اتجاه الكاميرا قبل حذف EXIF حتى لا تظهر الصورة مقلوبة
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    return image
+
+
+def normalize_photo(upload):
+    """
+    الصورة المرفوعة -> JPEG بحد أقصى PHOTO_MAX_SIZE بكسل وبدون EXIF.
+    يرفع ValueError لو الملف ليس صورة.
+    """
+    try:
+        upload.seek(0)
+        image = _load_rgb(upload)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError("ملف الصورة غير صالح") from e
+
+    image.thumbnail((PHOTO_MAX_SIZE, PHOTO_MAX_SIZE), Image.LANCZOS)
+    stem = os.path.splitext(os.path.basename(upload.name or 'photo'))[0]
+    return ContentFile(_encode_jpeg(image), name=f"{stem}.jpg")
+
+
+def photo_version(name):
+    """
+    بصمة قصيرة لاسم الصورة (التخزين بالمحتوى: الاسم يتغير مع المحتوى) - تُضاف لرابط النسخة
+    كـ ?v= فيتغير الرابط مع تغيير الصورة ويمكن تخزينه في كاش المتصفح.
+    """
+    return hashlib.sha1(name.encode()).hexdigest()[:12]
+
+
+def variant_name(name, variant):
+    """students_photos/ahmed.jpg -> students_photos/ahmed_thumb.jpg (بجانب الأصل)"""
+    stem, _ = os.path.splitext(name)
+    return f"{stem}_{variant}.jpg"
+
+
+def get_variant(name, variant, storage=default_storage):
+    """
+    اسم ملف النسخة المصغرة؛ تُنشأ أول مرة فقط ثم تُقرأ من القرص.
+    يرجع None لو النسخة غير معرفة.
+    """
+    size = photo_variants().get(variant)
+    if not size:
+        return None
+
+    target = variant_name(name, variant)
+    if storage.exists(target):
+        return target
+
+    with storage.open(name, 'rb') as f:
+        image = ImageOps.fit(_load_rgb(f), (size, size), Image.LANCZOS)
+    # طلبان متزامنان قد يُنشئان نفس النسخة: نحفظ باسم مؤقت ثم نستخدم الأول
+    saved = storage.save(target, ContentFile(_encode_jpeg(image)))
+    if saved != target:
+        storage.delete(saved)
+    return target
+
+
+def delete_variants(name, storage=default_storage):
+    """حذف النسخ المصغرة عند تغيير أو حذف الصورة الأصلية"""
+    for variant in photo_variants():
+        target = variant_name(name, variant)
+        if storage.exists(target):
+            storage.delete(target)
+
+
+# ------------------------------
+# SIGNAL HANDLERS
+# ------------------------------
+def cleanup_photo_variants(sender, instance, **kwargs):
+    """النسخ المصغرة للصورة القديمة لم تعد مستخدمة (الاسم القديم من storage.remember_previous_files)"""
+    previous = getattr(instance, '_previous_files', {}).get('personal_photo')
+    if previous and previous != instance.personal_photo.name:
+        delete_variants(previous)
+
+
+def delete_photo_variants(sender, instance, **kwargs):
+    if instance.personal_photo:
+        delete_variants(instance.personal_photo.name)
@@ -0,0 +1,196 @@
+import gzip
+import heapq
+import json
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SystemLog
+
+
+# ==============================
+# 🗄️ SYSTEM LOG ARCHIVE (أرشيف شهري JSONL + gzip)
+# ==============================
+def archive_dir():
+    return getattr(settings, 'SYSTEM_LOG_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'log_archive'))
+
+
+def retention_cutoff():
+    """السجلات الأقدم من هذا التاريخ تُنقل للأرشيف"""
+    days = getattr(settings, 'SYSTEM_LOG_RETENTION_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def month_path(year, month):
+    return os.path.join(archive_dir(), f"systemlog-{year:04d}-{month:02d}.jsonl.gz")
+
+
+def log_to_dict(log):
+    """نفس شكل SystemLogSerializer حتى لا يفرق العميل بين سجل حي ومؤرشف"""
+    return {
+        "id": log['id'],
+        "username": log['user__username'],
+        "action": log['action'],
+        "details": log['details'],
+        "timestamp": log['timestamp'].isoformat(),
+        "user": log['user_id'],
+    }
+
+
+LOG_FIELDS = ('id', 'user_id', 'user__username', 'action', 'details', 'timestamp')
+
+
+def archive_logs(before=None, batch_size=1000):
+    """
+    ينقل السجلات الأقدم من before إلى ملفات شهرية ويحذفها من الجدول على دفعات.
+    كل دفعة تُكتب للملف وتُثبت على القرص (fsync) قبل حذفها، فلو توقف الأمر في المنتصف لا يضيع شيء.
+    الكتابة والحذف ليسا عملية واحدة: توقف بينهما يترك الدفعة في الجدول والأرشيف معاً،
+    والتشغيل التالي يلحقها مرة أخرى - البحث يتجاهل التكرار بالـ id.
+    يرجع dict بعدد السجلات المؤرشفة لكل شهر.
+    """
+    before = before or retention_cutoff()
+    os.makedirs(archive_dir(), exist_ok=True)
+    stats = {}
+
+    while True:
+        batch = list(
+            SystemLog.objects.filter(timestamp__lt=before)
+            .order_by('timestamp', 'id')
+            .values(*LOG_FIELDS)[:batch_size]
+        )
+        if not batch:
+            return stats
+
+        by_month = {}
+        for log in batch:
+            ts = log['timestamp']
+            by_month.setdefault((ts.year, ts.month), []).append(log_to_dict(log))
+
+        for (year, month), rows in by_month.items():
+            # gzip يدعم الإلحاق (append) كـ member جديد في نفس الملف
+            with open(month_path(year, month), 'ab') as raw:
+                with gzip.open(raw, 'wt', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+            key = f"{year:04d}-{month:02d}"
+            stats[key] = stats.get(key, 0) + len(rows)
+
+        SystemLog.objects.filter(id__in=[log['id'] for log in batch]).delete()
+
+
+def archived_months():
+    """الأشهر المؤرشفة من الأحدث للأقدم"""
+    if not os.path.isdir(archive_dir()):
+        return []
+    months = []
+    for name in os.listdir(archive_dir()):
+        if name.startswith('systemlog-') and name.endswith('.jsonl.gz'):
+            year, month = name[len('systemlog-'):-len('.jsonl.gz')].split('-')
+            months.append((int(year), int(month)))
+    return sorted(months, reverse=True)
+
+
+def _matches(row, start, end, user_id, action, text):
+    ts = parse_datetime(row['timestamp'])
+    if start and ts < start:
+        return False
+    if end and ts > end:
+        return False
+    if user_id and row['user'] != user_id:
+        return False
+    if action and row['action'] != action:
+        return False
+    if text and text not in (row['details'] or ''):
+        return False
+    return True
+
+
+def _month_rows(year, month, end):
+    """قراءة ملف الشهر سطراً سطراً؛ الملف مكتوب بترتيب الوقت فنتوقف بعد end"""
+    with gzip.open(month_path(year, month), 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            if end and parse_datetime(row['timestamp']) > end:
+                return
+            yield row
+
+
+def _newest(rows, n):
+    """
+    أحدث n صف من stream بذاكرة O(n) (heap صغير بدل تحميل الشهر كله وترتيبه).
+    الصف المكرر (نفس الوقت والـ id بعد أرشفة توقفت في المنتصف) يُحسب مرة واحدة.
+    """
+    heap, keys = [], set()
+    for row in rows:
+        key = (row['timestamp'], row['id'])
+        if key in keys:
+            continue
+        if len(heap) < n:
+            heapq.heappush(heap, (key, row))
+            keys.add(key)
+        elif key > heap[0][0]:
+            evicted, _ = heapq.heapreplace(heap, (key, row))
+            keys.discard(evicted)
+            keys.add(key)
+    return [row for _, row in sorted(heap, key=lambda item: item[0], reverse=True)]
+
+
+def _iter_archive(start, end, user_id, action, text, limit):
+    for year, month in archived_months():
+        if limit <= 0:
+            return
+        # تخطي الأشهر خارج الفترة بدون فتح الملف
+        if start and (year, month) < (start.year, start.month):
+            break
+        if end and (year, month) > (end.year, end.month):
+            continue
+        rows = _newest(
+            (row for row in _month_rows(year, month, end) if _matches(row, start, end, user_id, action, text)),
+            limit,
+        )
+        limit -= len(rows)
+        yield from rows
+
+
+def search_logs(limit, start=None, end=None, user_id=None, action=None, text=None):
+    """
+    بحث موحد: السجلات الحية في قاعدة البيانات ثم الأرشيف (الأحدث أولاً)، حتى limit صف.
+    الأرشيف لا يُقرأ إلا لو احتاجت الصفحة المطلوبة سجلات أقدم من الموجود في الجدول،
+    وسجل موجود في الجدول والأرشيف معاً (أرشفة توقفت قبل الحذف) يظهر مرة واحدة.
+    """
+    qs = SystemLog.objects.all()
+    filters = Q()
+    if start:
+        filters &= Q(timestamp__gte=start)
+    if end:
+        filters &= Q(timestamp__lte=end)
+    if user_id:
+        filters &= Q(user_id=user_id)
+    if action:
+        filters &= Q(action=action)
+    if text:
+        filters &= Q(details__contains=text)
+
+    seen = set()
+    db_rows = qs.filter(filters).order_by('-timestamp', '-id').values(*LOG_FIELDS).iterator(chunk_size=500)
+    for log in islice(db_rows, limit):
+        seen.add(log['id'])
+        yield log_to_dict(log)
+    # limit كامل للأرشيف: نسخ صفوف ظهرت من الجدول تُستبعد هنا ولا تنقص الصفحة
+    for row in _iter_archive(start, end, user_id, action, text, limit):
+        if row['id'] not in seen:
+            seen.add(row['id'])
+            yield row
+
+
+def search_logs_page(offset, limit, **filters):
+    """صفحة من نتائج البحث + هل يوجد المزيد"""
+    rows = list(islice(search_logs(offset + limit + 1, **filters), offset, offset + limit + 1))
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.log_archive import archive_logs, archive_dir, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move SystemLog rows older than the retention window into monthly gzip archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Retention window in days (default: SYSTEM_LOG_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        else:
+            cutoff = retention_cutoff()
+
+        stats = archive_logs(before=cutoff, batch_size=options['batch_size'])
+        if not stats:
+            self.stdout.write(self.style.WARNING(f"No logs older than {cutoff:%Y-%m-%d}"))
+            return
+
+        for month, count in sorted(stats.items()):
+            self.stdout.write(f"{month}: {count} logs")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {sum(stats.values())} logs to {archive_dir()}"
+        ))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.absence_alerts import evaluate_changed_students
+
+
+class Command(BaseCommand):
+    help = "Evaluate absence alert rules for students whose attendance summary changed recently"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="Only students whose summary changed in this window")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        fired = evaluate_changed_students(since=since, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"{fired} absence alerts sent"))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.attendance_gaps import find_attendance_gaps, notify_gaps
+
+
+class Command(BaseCommand):
+    help = "Report active students without attendance on training days in a window (and optionally notify supervisors)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Window length ending yesterday")
+        parser.add_argument('--company', type=int)
+        parser.add_argument('--notify', action='store_true', help="Notify the responsible supervisors in bulk")
+
+    def handle(self, *args, **options):
+        end = timezone.localdate() - timedelta(days=1)
+        start = end - timedelta(days=options['days'] - 1)
+        report = find_attendance_gaps(start, end, company_id=options['company'])
+
+        for company in report['by_company']:
+            self.stdout.write(f"{company['company_name']}: {len(company['students'])} students, {company['missing']} missing")
+        message = (
+            f"{report['missing_records']} missing records for {report['students_with_gaps']} students "
+            f"over {report['training_days']} training days ({start} → {end})"
+        )
+        if options['notify']:
+            message += f", {notify_gaps(report)} notifications sent"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.dashboard import invalidate_dashboard_stats
+from users.student_import import import_students, file_type_of
+
+
+class Command(BaseCommand):
+    help = "Import students from a CSV/XLSX file (same columns as the students export)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--create-companies', action='store_true', help="Create companies that do not exist yet")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, do not write")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_students(
+                    f,
+                    file_type=file_type_of(options['path']),
+                    chunk_size=options['chunk_size'],
+                    create_companies=options['create_companies'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(f"row {error['row']}: {error['errors']}")
+        if result['created'] and not result['dry_run']:
+            invalidate_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} created, {result['failed']} failed "
+            f"out of {result['total_rows']} rows in {result['duration_ms']} ms"
+        ))
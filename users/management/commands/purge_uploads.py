@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads untouched for a while (partial files and the upload's own file reference)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        # delete() على الـ queryset يطلق post_delete لكل صف (حذف الأجزاء المؤقتة وتحرير المراجع)
+        count, _ = ChunkedUpload.objects.filter(updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"{count} uploads purged"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.attendance_summary import rebuild_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-student attendance summary table in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_attendance_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Attendance summary rebuilt for {count} students"))
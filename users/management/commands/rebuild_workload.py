@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.workload import rebuild_workload_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the supervisor workload index from visits and assignments"
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_workload_index()
+        self.stdout.write(self.style.SUCCESS(f"Workload index rebuilt for {count} supervisors"))
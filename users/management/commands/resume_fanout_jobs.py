@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.fanout import run_job
+from users.models import FanoutJob
+
+
+class Command(BaseCommand):
+    help = "Run broadcast jobs lost with a worker restart (still queued) and fail the ones interrupted mid-send"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=10)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['minutes'])
+        # running قديم = الـ worker مات أثناء الإرسال؛ إعادة التشغيل قد تكرر إشعارات وصلت بالفعل
+        interrupted = FanoutJob.objects.filter(status='running', updated_at__lt=cutoff).update(
+            status='failed', error='interrupted (worker restart)', updated_at=timezone.now()
+        )
+        queued = list(FanoutJob.objects.filter(status='queued', created_at__lt=cutoff).values_list('id', flat=True))
+        for job_id in queued:
+            run_job(job_id)
+        self.stdout.write(self.style.SUCCESS(f"{len(queued)} jobs resumed, {interrupted} marked failed"))
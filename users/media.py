@@ -0,0 +1,125 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from .authentication import authenticate_token
+from .storage import content_addressed_storage, is_content_addressed
+
+RANGE_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DEFAULT_MEDIA_DIRS = ('students_photos/', 'attendance_proofs/')
+
+
+# ==============================
+# 🗂️ MEDIA SERVING (ETag + 304 + Range)
+# ==============================
+def media_etag(name, stat):
+    """الملفات المخزنة بالمحتوى: الـ hash نفسه (ETag قوي بدون قراءة الملف) - غيرها: الحجم + وقت التعديل"""
+    if is_content_addressed(name):
+        return f'"{os.path.splitext(os.path.basename(name))[0]}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) شاملة لطلب Range واحد، None لتجاهل الهيدر (نرسل الملف كاملاً)،
+    أو ValueError لو المدى خارج الملف (416). أكثر من مدى في نفس الطلب يُرسل الملف كاملاً.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)  # bytes=-500 آخر 500 بايت
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _headers(response, name, etag):
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    # اسم الملف بالمحتوى لا يتغير محتواه أبداً
+    response['Cache-Control'] = (
+        'private, max-age=31536000, immutable' if is_content_addressed(name) else 'private, no-cache'
+    )
+    return response
+
+
+@require_safe
+def serve_media(request, name):
+    """
+    GET /api/media/<name> - يحتاج JWT (header أو ?token=).
+    If-None-Match -> 304 بدون قراءة الملف، Range -> 206، وإلا FileResponse (sendfile عبر wsgi.file_wrapper)
+    أو X-Accel-Redirect لو MEDIA_ACCEL_REDIRECT معرف (nginx يرسل الملف).
+    """
+    if authenticate_token(request) is None:
+        return JsonResponse({"error": "غير مصرح"}, status=401)
+
+    allowed = getattr(settings, 'PROTECTED_MEDIA_DIRS', DEFAULT_MEDIA_DIRS)
+    if not name.startswith(tuple(allowed)):
+        return JsonResponse({"error": "Not found"}, status=404)
+
+    storage = content_addressed_storage()
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        return JsonResponse({"error": "Not found"}, status=404)
+
+    etag = media_etag(name, stat)
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        if '*' in tags or etag in tags or f'W/{etag}' in tags:
+            return _headers(HttpResponse(status=304), name, etag)
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    accel = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel.rstrip('/') + '/' + name
+        return _headers(response, name, etag)
+
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return _headers(response, name, etag)
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_read_range(path, start, length), status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            return _headers(response, name, etag)
+
+    return _headers(FileResponse(open(path, 'rb'), content_type=content_type), name, etag)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_supervisorworkload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='attendance_summary', serialize=False, to='users.student')),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('excused_count', models.PositiveIntegerField(default=0)),
+                ('unexcused_count', models.PositiveIntegerField(default=0)),
+                ('absence_streak', models.PositiveIntegerField(default=0)),
+                ('unexcused_streak', models.PositiveIntegerField(default=0)),
+                ('last_seen', models.DateField(blank=True, null=True, verbose_name='آخر يوم حضور')),
+                ('last_record_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['absence_streak'], name='attendance_summary_streak_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_studentattendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(choices=[('unexcused_total', 'تجاوز عدد أيام الغياب بدون عذر'), ('consecutive', 'غياب متتالي')], max_length=20)),
+                ('key', models.CharField(max_length=32)),
+                ('value', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='absence_alerts', to='users.student')),
+            ],
+            options={
+                'unique_together': {('student', 'rule', 'key')},
+            },
+        ),
+    ]
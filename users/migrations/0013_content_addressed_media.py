@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import users.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_absencealert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='proof_file',
+            field=models.FileField(blank=True, null=True, storage=users.storage.content_addressed_storage, upload_to='attendance_proofs/', verbose_name='ملف إثبات العذر'),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='personal_photo',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.content_addressed_storage, upload_to='students_photos/', verbose_name='صورة الطالب'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def remove_duplicate_assignments(apps, schema_editor):
+    """
+    التوزيعات المكررة لنفس الطالب في نفس الطلب: يبقى ما له تقييم، وإلا الأقدم.
+    أكثر من تقييم لنفس الطالب لا يُحذف تلقائياً (يحتاج مراجعة يدوية قبل إضافة القيد).
+    """
+    AssignedEvaluation = apps.get_model('users', 'AssignedEvaluation')
+    duplicates = (
+        AssignedEvaluation.objects.filter(student__isnull=False)
+        .values('evaluation_request_id', 'student_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        rows = list(
+            AssignedEvaluation.objects.filter(
+                evaluation_request_id=row['evaluation_request_id'], student_id=row['student_id']
+            ).order_by('id').values_list('id', 'evaluation')
+        )
+        evaluated = [pk for pk, evaluation in rows if evaluation]
+        if len(evaluated) > 1:
+            raise RuntimeError(
+                f"طلب {row['evaluation_request_id']}: الطالب {row['student_id']} له أكثر من تقييم {evaluated}"
+            )
+        keep = evaluated[0] if evaluated else rows[0][0]
+        AssignedEvaluation.objects.filter(
+            id__in=[pk for pk, evaluation in rows if pk != keep and not evaluation]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_fanoutjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_assignments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # القيد في migration منفصل: الحذف في 0017 يترك أحداث FK مؤجلة (Evaluation.assigned_evaluation)
+    # و PostgreSQL يرفض ALTER TABLE في نفس المعاملة
+
+    dependencies = [
+        ('users', '0017_remove_duplicate_assignments'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='assignedevaluation',
+            constraint=models.UniqueConstraint(fields=('evaluation_request', 'student'), name='assignment_request_student_uniq'),
+        ),
+    ]
@@ -1,7 +1,11 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
 
+from .storage import content_addressed_storage
+
 # ------------------------------
 # 1. CUSTOM USER MODEL (المستخدمين والأدوار)
 # ------------------------------
@@ -36,8 +40,15 @@ class Company(models.Model):
 
     @property
     def student_count(self):
+        # القيمة تأتي جاهزة من annotate(student_count=...) في القوائم
+        if hasattr(self, '_student_count'):
+            return self._student_count
         return self.students.count()
 
+    @student_count.setter
+    def student_count(self, value):
+        self._student_count = value
+
 
 # ------------------------------
 # 2. STUDENT MODEL (الطلاب + صور)
@@ -55,11 +66,19 @@ class Student(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     
     # حقل صورة الطالب الجديد 📸
-    personal_photo = models.ImageField(upload_to='students_photos/', blank=True, null=True, verbose_name="صورة الطالب")
+    personal_photo = models.ImageField(
+        upload_to='students_photos/', storage=content_addressed_storage,
+        blank=True, null=True, verbose_name="صورة الطالب",
+    )
     
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='students')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='student_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.get_status_display()}"
 
@@ -84,6 +103,11 @@ class Visit(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['supervisor', 'visit_date'], name='visit_supervisor_date_idx'),
+        ]
+
     def __str__(self):
         return f"Visit - {self.company.name} - {self.student.name}"
 
@@ -135,6 +159,12 @@ class AssignedEvaluation(models.Model):
     started_at = models.DateTimeField(blank=True, null=True)
     submitted_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            # توزيع واحد لكل طالب في الطلب (expand متزامن أو expand مع توزيع يدوي)
+            models.UniqueConstraint(fields=['evaluation_request', 'student'], name='assignment_request_student_uniq'),
+        ]
+
     def __str__(self):
         return f"Assigned #{self.id} -> {self.student}"
 
@@ -174,6 +204,11 @@ class Evaluation(models.Model):
         ("delivered", "اتسلّم للمدرسة"),
     ], default="submitted")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['supervisor', 'date'], name='evaluation_supervisor_date_idx'),
+        ]
+
     def __str__(self):
         return f"Evaluation for {self.student}"
 
@@ -215,7 +250,10 @@ class AttendanceRecord(models.Model):
     is_excused = models.BooleanField(default=False, verbose_name="إثبات الغياب (بعذر)")
     
     # حقل ملف إثبات العذر الجديد 📁
-    proof_file = models.FileField(upload_to='attendance_proofs/', blank=True, null=True, verbose_name="ملف إثبات العذر")
+    proof_file = models.FileField(
+        upload_to='attendance_proofs/', storage=content_addressed_storage,
+        blank=True, null=True, verbose_name="ملف إثبات العذر",
+    )
     
     recorded_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name='attendance_created'
@@ -225,6 +263,10 @@ class AttendanceRecord(models.Model):
 
     class Meta:
         unique_together = ('student', 'date')
+        indexes = [
+            # التقارير ولوحة التحكم: فلترة بالتاريخ ثم الحالة
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.date} - {self.get_status_display()}"
@@ -247,6 +289,11 @@ class SystemLog(models.Model):
     details = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='systemlog_timestamp_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
 
@@ -261,5 +308,153 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # قائمة إشعارات المستخدم مرتبة بالأحدث
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # غير المقروءة فقط (عداد الإشعارات) - فهرس جزئي صغير
+            models.Index(
+                fields=['user', 'created_at'], name='notif_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.user.username} - {self.title}"
+
+# ------------------------------
+# NOTIFICATION FAN-OUT JOBS (حالة الإرسال الجماعي - مشتركة بين كل الـ workers)
+# ------------------------------
+class FanoutJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'في الانتظار'),
+        ('running', 'جاري الإرسال'),
+        ('done', 'تم'),
+        ('failed', 'فشل'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    # معاملات resolve_audience (role / company_id / evaluation_request_id)
+    audience = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    recipients = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    duration_ms = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+
+# ------------------------------
+# SUPERVISOR WORKLOAD INDEX (حمل المشرفين - محسوب مسبقاً)
+# ------------------------------
+class SupervisorWorkload(models.Model):
+    supervisor = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    open_assignments = models.PositiveIntegerField(default=0)
+    pending_visits = models.PositiveIntegerField(default=0)
+    companies_covered = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def load(self):
+        return self.open_assignments + self.pending_visits
+
+    def __str__(self):
+        return f"{self.supervisor.username} - {self.load}"
+
+# ------------------------------
+# STUDENT ATTENDANCE SUMMARY (ملخص حضور الطالب - محسوب مسبقاً)
+# ------------------------------
+class StudentAttendanceSummary(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='attendance_summary')
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    excused_count = models.PositiveIntegerField(default=0)
+    unexcused_count = models.PositiveIntegerField(default=0)
+    # عدد أيام الغياب المتتالية منذ آخر حضور (بدون عذر وبعذر)
+    absence_streak = models.PositiveIntegerField(default=0)
+    unexcused_streak = models.PositiveIntegerField(default=0)
+    last_seen = models.DateField(null=True, blank=True, verbose_name="آخر يوم حضور")
+    last_record_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['absence_streak'], name='attendance_summary_streak_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.present_count}/{self.absent_count}"
+
+# ------------------------------
+# ABSENCE ALERTS (تنبيهات الغياب - كل حد يُطلق مرة واحدة)
+# ------------------------------
+class AbsenceAlert(models.Model):
+    RULE_CHOICES = [
+        ('unexcused_total', 'تجاوز عدد أيام الغياب بدون عذر'),
+        ('consecutive', 'غياب متتالي'),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='absence_alerts')
+    rule = models.CharField(max_length=20, choices=RULE_CHOICES)
+    # مفتاح منع التكرار: الحد نفسه للإجمالي، وآخر يوم حضور قبل السلسلة للغياب المتتالي
+    key = models.CharField(max_length=32)
+    value = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('student', 'rule', 'key')
+
+    def __str__(self):
+        return f"{self.student.name} - {self.rule} ({self.value})"
+
+# ------------------------------
+# STORED BLOBS (عدد المراجع لكل ملف في التخزين بالمحتوى)
+# ------------------------------
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+# ------------------------------
+# CHUNKED UPLOADS (رفع ملفات الإثبات على أجزاء قابلة للاستكمال)
+# ------------------------------
+class ChunkedUpload(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'جاري الرفع'),
+        ('complete', 'مكتمل'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    # اسم الملف في التخزين بالمحتوى بعد الاكتمال
+    file = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+# ------------------------------
+# TABLE VERSIONS (أرقام نسخ الجداول - ETag مشترك بين كل الـ workers)
+# ------------------------------
+class TableVersion(models.Model):
+    table = models.CharField(max_length=100, primary_key=True)
+    version = models.CharField(max_length=32)
+
     def __str__(self):
-        return f"Notification for {self.user.username} - {self.title}"
\ No newline at end of file
+        return f"{self.table} ({self.version})"
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# 📡 NOTIFICATION BUS (pub/sub للإشعارات الفورية)
+# ==============================
+class BaseNotificationBus:
+    """
+    الواجهة التي يعتمد عليها الـ stream: أي backend (Redis/Broker) يطبق نفس الدوال
+    ويُختار عبر NOTIFICATION_BUS_BACKEND في settings.
+    """
+
+    def subscribe(self, user_id):
+        """يرجع asyncio.Queue تصلها الإشعارات الجديدة للمستخدم (يُستدعى من داخل event loop)"""
+        raise NotImplementedError
+
+    def unsubscribe(self, user_id, q):
+        raise NotImplementedError
+
+    def publish(self, user_id, payload):
+        """يُستدعى من الكود المتزامن (views / signals)"""
+        raise NotImplementedError
+
+
+class InProcessNotificationBus(BaseNotificationBus):
+    """
+    pub/sub داخل نفس العملية: مناسب لسيرفر ASGI واحد.
+    لو فيه أكثر من worker يُستبدل بـ backend مشترك.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = {}  # user_id -> {queue: loop}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        q = asyncio.Queue(maxsize=self.max_queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(user_id, {})[q] = loop
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(user_id, {})
+            queues.pop(q, None)
+            if not queues:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(user_id, {}))
+
+    @staticmethod
+    def _offer(q, payload):
+        try:
+            q.put_nowait(payload)
+        except asyncio.QueueFull:
+            # العميل بطيء: يكمل من آخر id عند إعادة الاتصال
+            logger.warning("Notification queue full, dropping event %s", payload.get('id'))
+
+    def publish(self, user_id, payload):
+        with self._lock:
+            targets = list(self._subscribers.get(user_id, {}).items())
+        for q, loop in targets:
+            if loop.is_closed():
+                continue
+            loop.call_soon_threadsafe(self._offer, q, payload)
+
+
+_bus = None
+
+
+def get_notification_bus():
+    global _bus
+    if _bus is None:
+        backend = getattr(settings, 'NOTIFICATION_BUS_BACKEND', 'users.notification_bus.InProcessNotificationBus')
+        _bus = import_string(backend)()
+    return _bus
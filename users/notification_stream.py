@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from .models import User, Notification
+from .notification_bus import get_notification_bus
+from .serializers import NotificationSerializer
+
+KEEPALIVE_SECONDS = 15
+BACKLOG_LIMIT = 100
+STREAM_TICKET_SECONDS = 60
+STREAM_TICKET_SALT = 'users.notifications_stream'
+
+
+# ==============================
+# 📡 NOTIFICATIONS STREAM (Server-Sent Events - يحتاج ASGI)
+# ==============================
+def is_asgi(request):
+    """البث المفتوح يحتاج ASGI: تحت WSGI يحجز worker كاملاً لكل تبويب مفتوح بلا نهاية"""
+    return isinstance(request, ASGIRequest)
+
+
+def issue_stream_ticket(user):
+    """
+    تذكرة قصيرة العمر لفتح البث فقط: EventSource لا يرسل headers، والـ access token
+    في ?token= يبقى صالحاً ساعة ويظهر في سجلات الوصول.
+    """
+    return signing.dumps(user.pk, salt=STREAM_TICKET_SALT)
+
+
+def ticket_user(ticket):
+    """المستخدم من تذكرة البث، أو None لو التذكرة ناقصة أو مزورة أو منتهية"""
+    if not ticket:
+        return None
+    try:
+        user_id = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_SECONDS)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+def _backlog(user, last_id):
+    """الإشعارات التي فاتت العميل منذ آخر id استلمه (استكمال بعد إعادة الاتصال)"""
+    qs = Notification.objects.filter(user=user, id__gt=last_id).order_by('id')[:BACKLOG_LIMIT]
+    return NotificationSerializer(qs, many=True).data
+
+
+def _event(payload):
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def notifications_stream(request):
+    # 204 يوقف إعادة اتصال EventSource، فيتحول العميل للتحديث الدوري
+    if not is_asgi(request):
+        return HttpResponse(status=204)
+
+    # التذكرة من notifications/stream/ticket/ (لا يُقبل access token في الرابط)
+    user = await sync_to_async(ticket_user)(request.GET.get('ticket'))
+    if user is None:
+        return JsonResponse({"error": "غير مصرح"}, status=401)
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    bus = get_notification_bus()
+
+    async def events():
+        # الاشتراك قبل قراءة الـ backlog حتى لا يضيع إشعار بينهما
+        q = bus.subscribe(user.id)
+        sent = last_id
+        try:
+            yield "retry: 5000\n\n"
+            if last_id:
+                for payload in await sync_to_async(_backlog)(user, last_id):
+                    sent = max(sent, payload['id'])
+                    yield _event(payload)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(q.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if payload['id'] <= sent:
+                    continue
+                sent = payload['id']
+                yield _event(payload)
+        finally:
+            bus.unsubscribe(user.id, q)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,18 @@
+from .models import Notification
+
+
+# ==============================
+# 🔔 NOTIFICATIONS HELPERS (الإرسال + عداد غير المقروء)
+# ==============================
+def get_unread_count(user_id):
+    """
+    العدد مباشرة من الفهرس الجزئي notif_unread_idx (غير المقروءة فقط، فهو صغير):
+    رقم صحيح في كل الـ workers بدون عداد في الكاش المحلي.
+    """
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def send_notification(user, title, message):
+    """دالة مساعدة لإرسال إشعار لمستخدم معين"""
+    if user:
+        return Notification.objects.create(user=user, title=title, message=message)
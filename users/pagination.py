@@ -0,0 +1,45 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+# ------------------------------
+# CURSOR PAGINATION (الافتراضي لكل القوائم)
+# ------------------------------
+class StandardCursorPagination(CursorPagination):
+    """
+    ترقيم بالمؤشر (keyset): ثابت الأداء مهما كبر الجدول، ويرجع next/previous كمؤشرات مشفرة.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+
+# ------------------------------
+# OFFSET PAGINATION (لجدول الإدارة DataTable)
+# ------------------------------
+class StandardOffsetPagination(LimitOffsetPagination):
+    """
+    ترقيم بالإزاحة (limit/offset) يرجع العدد الكلي count لعرض أرقام الصفحات.
+    """
+    max_limit = 500
+
+
+def paginate(request, queryset, serializer_class, ordering=('-id',)):
+    """
+    يرقّم أي queryset بترتيب ثابت ويرجع Response جاهز.
+    ?pagination=offset&limit=&offset= للترقيم بالإزاحة، وإلا ?cursor=&page_size= (الافتراضي).
+    """
+    if request.query_params.get('pagination') == 'offset':
+        paginator = StandardOffsetPagination()
+        queryset = queryset.order_by(*ordering)
+    else:
+        paginator = StandardCursorPagination()
+        paginator.ordering = ordering
+
+    # تحميل العلاقات التي يحتاجها الـ serializer مسبقاً (select_related/prefetch_related)
+    if hasattr(serializer_class, 'setup_eager_loading'):
+        queryset = serializer_class.setup_eager_loading(queryset)
+
+    page = paginator.paginate_queryset(queryset, request)
+    # request في الـ context لروابط الملفات الكاملة (صور الطلاب، ملفات الإثبات)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_date
+
+from .models import Student
+from .training_calendar import calendar
+
+
+# ==============================
+# 📈 ATTENDANCE REPORT ENGINE (تجميع داخل قاعدة البيانات)
+# ==============================
+def parse_report_range(params):
+    """
+    تحويل فلاتر التقرير (type + date/week/month) إلى (أول يوم، آخر يوم، وصف الفترة).
+    يرفع ValueError برسالة الخطأ عند نقص أو خطأ البيانات.
+    """
+    report_type = params.get('type')
+    if report_type not in ['daily', 'weekly', 'monthly']:
+        raise ValueError("Invalid type")
+
+    if report_type == 'daily':
+        date = params.get('date')
+        if not date:
+            raise ValueError("date required")
+        target_date = parse_date(date)
+        if not target_date:
+            raise ValueError("Invalid date")
+        return target_date, target_date, f"اليوم: {target_date}"
+
+    if report_type == 'weekly':
+        week_code = params.get('week')
+        if not week_code:
+            raise ValueError("week required")
+        year, week_num = week_code.split("-W")
+        first_day = datetime.strptime(f'{year}-W{week_num}-1', "%Y-W%W-%w").date()
+        last_day = first_day + timedelta(days=6)
+        return first_day, last_day, f"الأسبوع: {first_day} → {last_day}"
+
+    month = params.get('month')
+    if not month:
+        raise ValueError("month required")
+    year, month_num = month.split("-")
+    year, month_num = int(year), int(month_num)
+    first_day = datetime(year, month_num, 1).date()
+    if month_num == 12:
+        last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
+    else:
+        last_day = datetime(year, month_num + 1, 1).date() - timedelta(days=1)
+    return first_day, last_day, f"الشهر: {first_day} → {last_day}"
+
+
+def _attendance_counts(training_days=None, active_only=False):
+    counts = {
+        'total': Count('id'),
+        'present': Count('id', filter=Q(status='present')),
+        'absent': Count('id', filter=Q(status='absent')),
+        'excused': Count('id', filter=Q(status='absent', is_excused=True)),
+    }
+    if training_days:
+        # للمقارنة بأيام التدريب المتوقعة من التقويم
+        expected = Q(date__in=training_days)
+        if active_only:
+            # المتوقع من الطلاب النشطين فقط، فالمسجل كذلك
+            expected &= Q(student__status='active')
+        counts['students'] = Count('student', distinct=True)
+        counts['recorded'] = Count('id', filter=expected)
+        counts['present_expected'] = Count('id', filter=expected & Q(status='present'))
+    return counts
+
+
+def _rate(present, total):
+    return round((present / total) * 100, 2) if total else 0
+
+
+def _with_rate(row, expected_days=0, students=None):
+    """
+    لو التقويم يحدد أيام تدريب في الفترة: النسبة = الحضور / (أيام التدريب × عدد الطلاب)
+    والأيام الناقصة (missing) = المتوقع - المسجل. وإلا النسبة من عدد السجلات.
+    students: عدد الطلاب النشطين (يشمل من ليس له أي سجل)، وإلا من لهم سجلات في الفترة.
+    """
+    if not expected_days:
+        row['attendance_rate'] = _rate(row['present'], row['total'])
+        return row
+    row_students = row.pop('students')
+    expected = expected_days * (row_students if students is None else students)
+    row['expected'] = expected
+    row['missing'] = max(expected - row.pop('recorded'), 0)
+    row['attendance_rate'] = _rate(row.pop('present_expected'), expected)
+    return row
+
+
+def breakdown(qs, *group_by, training_days=None):
+    """GROUP BY على الحقول المطلوبة مع عدد الحضور/الغياب/الأعذار ونسبة الحضور لكل مجموعة"""
+    rows = qs.values(*group_by).annotate(**_attendance_counts(training_days)).order_by(*group_by)
+    return [_with_rate(row, len(training_days or ())) for row in rows]
+
+
+def company_breakdown(qs, training_days, active):
+    """
+    حسب المؤسسة: المتوقع = أيام التدريب × الطلاب النشطين في المؤسسة (مثل find_attendance_gaps)،
+    والمؤسسات التي بها طلاب نشطون بدون أي سجل تظهر بكل أيامها ناقصة.
+    """
+    if not training_days:
+        return breakdown(qs, 'company', 'company__name')
+    rows = qs.values('company', 'company__name').annotate(
+        **_attendance_counts(training_days, active_only=True)
+    ).order_by('company')
+    result = [_with_rate(row, len(training_days), active.get(row['company'], (None, 0))[1]) for row in rows]
+    seen = {row['company'] for row in result}
+    for company_id, (name, students) in active.items():
+        if company_id not in seen:
+            result.append(_with_rate(
+                {'company': company_id, 'company__name': name, 'total': 0, 'present': 0, 'absent': 0, 'excused': 0,
+                 'students': 0, 'recorded': 0, 'present_expected': 0},
+                len(training_days), students,
+            ))
+    return sorted(result, key=lambda row: row['company'])
+
+
+def build_attendance_report(qs, first_day=None, last_day=None):
+    """ملخص الفترة + التفصيل حسب اليوم والمؤسسة والطالب (بدون تحميل السجلات نفسها)"""
+    training_days = calendar.days(first_day, last_day) if first_day and last_day else []
+    active = {}
+    if training_days:
+        # الطلاب النشطون لكل مؤسسة (استعلام واحد): الطالب بدون أي سجل ناقص أيضاً
+        active = {
+            row['company']: (row['company__name'], row['students'])
+            for row in Student.objects.filter(status='active')
+            .values('company', 'company__name').annotate(students=Count('id')).order_by('company')
+        }
+    active_total = sum(students for _, students in active.values())
+    summary = _with_rate(
+        qs.aggregate(**_attendance_counts(training_days, active_only=True)), len(training_days), active_total,
+    )
+
+    by_day = breakdown(qs, 'date')
+    training_set = set(training_days)
+    for row in by_day:
+        row['is_training_day'] = row['date'] in training_set
+    by_student = breakdown(qs, 'student', 'student__name', 'student__status', training_days=training_days)
+    by_company = company_breakdown(qs, training_days, active)
+
+    report = {
+        "total_records": summary['total'],
+        "present": summary['present'],
+        "absent": summary['absent'],
+        "excused": summary['excused'],
+        "attendance_rate": summary['attendance_rate'],
+        "rate_basis": "expected_days" if training_days else "records",
+        "expected_days": len(training_days),
+        "by_day": by_day,
+        "by_company": by_company,
+        "by_student": by_student,
+    }
+    if training_days:
+        recorded_days = {row['date'] for row in by_day}
+        report["missing_records"] = summary['missing']
+        report["missing_days"] = [d for d in training_days if d not in recorded_days]
+        # مثل find_attendance_gaps: كل طالب نشط لم يكتمل حضوره (ومنهم من ليس له أي سجل)
+        complete = sum(1 for row in by_student if row['student__status'] == 'active' and not row['missing'])
+        report["students_with_missing"] = active_total - complete
+    return report
@@ -1,5 +1,10 @@
+import os
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.text import get_valid_filename
 from .models import (
     Company,
     Student,
@@ -10,33 +15,112 @@ from .models import (
     TrainingDay,
     AttendanceRecord,
     SystemLog,
-    Notification  # تأكد من وجود هذا الاستيراد
+    Notification,  # تأكد من وجود هذا الاستيراد
+    SupervisorWorkload,
+    StudentAttendanceSummary,
+    ChunkedUpload,
 )
+from .images import normalize_photo, photo_variants, photo_version
+from .chunked_upload import validate_new_upload
+from .storage import content_addressed_storage
+
 
 User = get_user_model()
 
+
+# ------------------------------
+# EAGER LOADING (منع N+1 في القوائم)
+# ------------------------------
+class EagerLoadingMixin:
+    """
+    كل serializer يعلن العلاقات التي يقرأها، و paginate() يطبقها على الـ queryset تلقائياً.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "phone", "role", "is_active"]
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     student_count = serializers.ReadOnlyField()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        # عدد الطلاب في نفس الاستعلام بدلاً من COUNT لكل مؤسسة
+        return queryset.annotate(student_count=Count('students'))
+
     class Meta:
         model = Company
         fields = "__all__"
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentAttendanceSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudentAttendanceSummary
+        exclude = ['student']
+
+class StudentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('attendance_summary',)
+
+    # من جدول الملخص بدلاً من تجميع سجلات الحضور
+    attendance_summary = serializers.SerializerMethodField()
+    # نسخ مصغرة تُنشأ عند أول طلب (القوائم لا تحتاج الصورة الكاملة)
+    photo_thumbnail = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Student
         fields = "__all__"
 
+    def validate_personal_photo(self, value):
+        if value is None:
+            return value
+        try:
+            return normalize_photo(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def _variant_url(self, obj, variant):
+        # ?v= يتغير مع الصورة (الرد يُخزن في كاش المتصفح يوماً)
+        url = f"{reverse('student-photo-variant', args=[obj.pk, variant])}?v={photo_version(obj.personal_photo.name)}"
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_photo_thumbnail(self, obj):
+        if not obj.personal_photo:
+            return None
+        return self._variant_url(obj, 'thumb')
+
+    def get_photo_variants(self, obj):
+        if not obj.personal_photo:
+            return None
+        return {variant: self._variant_url(obj, variant) for variant in photo_variants()}
+
+    def get_attendance_summary(self, obj):
+        try:
+            summary = obj.attendance_summary
+        except StudentAttendanceSummary.DoesNotExist:
+            return None
+        return StudentAttendanceSummarySerializer(summary).data
+
 class VisitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Visit
         fields = "__all__"
 
-class EvaluationRequestSerializer(serializers.ModelSerializer):
+class EvaluationRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('companies', 'students')
+
     class Meta:
         model = EvaluationRequest
         fields = "__all__"
@@ -56,7 +140,9 @@ class TrainingDaySerializer(serializers.ModelSerializer):
         model = TrainingDay
         fields = "__all__"
 
-class AttendanceRecordSerializer(serializers.ModelSerializer):
+class AttendanceRecordSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('student', 'company')
+
     student_name = serializers.CharField(source='student.name', read_only=True)
     company_name = serializers.CharField(source='company.name', read_only=True)
 
@@ -65,7 +151,44 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class SystemLogSerializer(serializers.ModelSerializer):
+# ------------------------------
+# BULK ATTENDANCE (تسجيل حضور يوم كامل لمؤسسة)
+# ------------------------------
+class BulkAttendanceItemSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=AttendanceRecord.ATTENDANCE_CHOICES)
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    is_excused = serializers.BooleanField(required=False, default=False)
+
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    company = serializers.PrimaryKeyRelatedField(queryset=Company.objects.all())
+    date = serializers.DateField()
+    records = BulkAttendanceItemSerializer(many=True, allow_empty=False)
+
+    def validate_records(self, records):
+        ids = [r['student'] for r in records]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("يوجد طالب مكرر في القائمة")
+        return records
+
+    def validate(self, data):
+        day = TrainingDay.objects.filter(date=data['date']).first()
+        if day and day.day_type != 'training':
+            raise serializers.ValidationError({"date": f"هذا اليوم ليس يوم تدريب ({day.get_day_type_display()})"})
+
+        # كل الطلاب لازم يكونوا تابعين للمؤسسة (استعلام واحد)
+        ids = {r['student'] for r in data['records']}
+        valid = set(Student.objects.filter(company=data['company'], id__in=ids).values_list('id', flat=True))
+        invalid = sorted(ids - valid)
+        if invalid:
+            raise serializers.ValidationError({"records": f"طلاب غير تابعين لهذه المؤسسة: {invalid}"})
+        return data
+
+
+class SystemLogSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
+
     username = serializers.CharField(source='user.username', read_only=True)
     class Meta:
         model = SystemLog
@@ -79,6 +202,75 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = ['id', 'title', 'message', 'is_read', 'created_at']
 
+# ------------------------------
+# VISIT PLAN (تخطيط الزيارات)
+# ------------------------------
+class VisitPlanSerializer(serializers.Serializer):
+    supervisor = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(role='supervisor'), required=False)
+    start = serializers.DateField()
+    end = serializers.DateField()
+    max_companies_per_day = serializers.IntegerField(min_value=1, max_value=20, default=4)
+    apply = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError({"end": "تاريخ النهاية قبل البداية"})
+        if (data['end'] - data['start']).days > 92:
+            raise serializers.ValidationError({"end": "الفترة أطول من 3 شهور"})
+        return data
+
+# ------------------------------
+# CHUNKED UPLOADS (ملفات الإثبات)
+# ------------------------------
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'offset', 'status', 'file_url', 'created_at']
+        read_only_fields = ['id', 'offset', 'status', 'created_at']
+
+    def validate_filename(self, value):
+        return get_valid_filename(os.path.basename(value))
+
+    def validate(self, data):
+        try:
+            validate_new_upload(data['filename'], data['size'])
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return data
+
+    def get_file_url(self, obj):
+        return content_addressed_storage().url(obj.file) if obj.file else None
+
+# ------------------------------
+# SUPERVISOR WORKLOAD
+# ------------------------------
+class SupervisorWorkloadSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('supervisor',)
+
+    username = serializers.CharField(source='supervisor.username', read_only=True)
+    load = serializers.ReadOnlyField()
+
+    class Meta:
+        model = SupervisorWorkload
+        fields = ['supervisor', 'username', 'open_assignments', 'pending_visits', 'companies_covered', 'load', 'updated_at']
+
+# ------------------------------
+# BROADCAST NOTIFICATION (إشعار جماعي)
+# ------------------------------
+class BroadcastNotificationSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    role = serializers.ChoiceField(choices=User.Role.choices, required=False)
+    company = serializers.IntegerField(required=False)
+    evaluation_request = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if not any(data.get(k) for k in ('role', 'company', 'evaluation_request')):
+            raise serializers.ValidationError("حدد المستلمين: role أو company أو evaluation_request")
+        return data
+
 # ------------------------------
 # CHANGE PASSWORD SERIALIZER
 # ------------------------------
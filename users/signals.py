@@ -0,0 +1,93 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+
+from .models import (
+    Company, Student, Visit, Evaluation, AttendanceRecord, Notification, AssignedEvaluation, TrainingDay, ChunkedUpload,
+    EvaluationRequest, TableVersion,
+)
+from .dashboard import invalidate_dashboard_stats
+from .notification_bus import get_notification_bus
+from .serializers import NotificationSerializer
+from .workload import remember_previous_supervisor, update_workload_on_change
+from .attendance_summary import remember_previous_student, update_summary_on_change
+from .absence_alerts import check_alerts_on_change
+from .training_calendar import invalidate_calendar
+from .images import cleanup_photo_variants, delete_photo_variants
+from .storage import remember_previous_files, release_replaced_files, release_deleted_files
+from .chunked_upload import release_upload
+from .conditional import touch_on_change, touch_on_m2m_change
+
+
+# ==============================
+# 📊 إبطال كاش لوحة التحكم
+# ==============================
+for model in (Company, Student, Visit, Evaluation, AttendanceRecord):
+    post_save.connect(invalidate_dashboard_stats, sender=model, dispatch_uid=f'dashboard_save_{model.__name__}')
+    post_delete.connect(invalidate_dashboard_stats, sender=model, dispatch_uid=f'dashboard_delete_{model.__name__}')
+
+
+# ==============================
+# 📡 نشر الإشعارات الجديدة للمتصلين (SSE)
+# ==============================
+def publish_notification(sender, instance, created, **kwargs):
+    if not created:
+        return
+    payload = NotificationSerializer(instance).data
+    transaction.on_commit(lambda: get_notification_bus().publish(instance.user_id, payload))
+
+
+post_save.connect(publish_notification, sender=Notification, dispatch_uid='notification_publish')
+
+
+# ==============================
+# ⚖️ تحديث فهرس حمل المشرفين
+# ==============================
+for model in (Visit, AssignedEvaluation):
+    pre_save.connect(remember_previous_supervisor, sender=model, dispatch_uid=f'workload_pre_{model.__name__}')
+    post_save.connect(update_workload_on_change, sender=model, dispatch_uid=f'workload_save_{model.__name__}')
+    post_delete.connect(update_workload_on_change, sender=model, dispatch_uid=f'workload_delete_{model.__name__}')
+
+
+# ==============================
+# 🧮 تحديث ملخص حضور الطالب
+# ==============================
+pre_save.connect(remember_previous_student, sender=AttendanceRecord, dispatch_uid='attendance_summary_pre')
+post_save.connect(update_summary_on_change, sender=AttendanceRecord, dispatch_uid='attendance_summary_save')
+post_delete.connect(update_summary_on_change, sender=AttendanceRecord, dispatch_uid='attendance_summary_delete')
+
+# تنبيهات الغياب بعد تحديث الملخص (نفس الترتيب)
+post_save.connect(check_alerts_on_change, sender=AttendanceRecord, dispatch_uid='absence_alerts_save')
+
+
+# ==============================
+# 📅 إبطال تقويم أيام التدريب
+# ==============================
+post_save.connect(invalidate_calendar, sender=TrainingDay, dispatch_uid='training_calendar_save')
+post_delete.connect(invalidate_calendar, sender=TrainingDay, dispatch_uid='training_calendar_delete')
+
+
+# ==============================
+# 🗃️ مراجع الملفات (التخزين بالمحتوى) + النسخ المصغرة القديمة
+# ==============================
+for model in (Student, AttendanceRecord):
+    pre_save.connect(remember_previous_files, sender=model, dispatch_uid=f'files_pre_{model.__name__}')
+    post_save.connect(release_replaced_files, sender=model, dispatch_uid=f'files_save_{model.__name__}')
+    post_delete.connect(release_deleted_files, sender=model, dispatch_uid=f'files_delete_{model.__name__}')
+
+post_save.connect(cleanup_photo_variants, sender=Student, dispatch_uid='photo_variants_save')
+post_delete.connect(delete_photo_variants, sender=Student, dispatch_uid='photo_variants_delete')
+post_delete.connect(release_upload, sender=ChunkedUpload, dispatch_uid='chunked_upload_delete')
+
+
+# ==============================
+# 🏷️ أرقام نسخ الجداول (ETag للـ GET)
+# ==============================
+for model in apps.get_app_config('users').get_models():
+    if model is TableVersion:
+        continue
+    post_save.connect(touch_on_change, sender=model, dispatch_uid=f'version_save_{model.__name__}')
+    post_delete.connect(touch_on_change, sender=model, dispatch_uid=f'version_delete_{model.__name__}')
+
+for through in (EvaluationRequest.companies.through, EvaluationRequest.students.through):
+    m2m_changed.connect(touch_on_m2m_change, sender=through, dispatch_uid=f'version_m2m_{through.__name__}')
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+# ==============================
+# 🗃️ CONTENT-ADDRESSED STORAGE (ملف واحد لكل محتوى + عدد المراجع)
+# ==============================
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(content):
+    """content: django File (chunks() يبدأ من أول الملف)"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    """students_photos/ab/cd/<sha256>.jpg"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return len(stem) == 64 and all(c in '0123456789abcdef' for c in stem)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    اسم الملف = sha256 للمحتوى داخل مجلد upload_to:
+    attendance_proofs/3f/a2/3fa2...e1.pdf
+    - نفس الملف المرفوع أكثر من مرة يُخزن مرة واحدة (StoredBlob.refcount يعد المراجع)
+    - delete() ينقص العداد ولا يحذف الملف إلا عند آخر مرجع، وبعد نجاح المعاملة
+    - الحفظ والحذف يقفلان صف StoredBlob (select_for_update) فلا يُحذف ملف عُدّ له مرجع جديد
+    - الروابط تشير إلى /api/media/ (ETag + Range + 304)
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('base_url', getattr(settings, 'PROTECTED_MEDIA_URL', '/api/media/'))
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # الاسم النهائي يُحسب من المحتوى في _save، فلا حاجة لإضافة لاحقة عشوائية
+        return name
+
+    def _write(self, name, content):
+        """
+        كتابة في ملف مؤقت بنفس المجلد ثم os.replace (ذري): حفظان متزامنان لنفس المحتوى
+        يكتبان نفس البايتات، والأخير يستبدل الأول بدل FileExistsError في FileSystemStorage._save.
+        """
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    f.write(chunk)
+            # mkstemp ينشئ الملف 0600
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def hashed_name(self, name, sha):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, sha[:2], sha[2:4], f"{sha}{ext}").replace('\\', '/')
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        sha = file_sha256(content)
+        name = self.hashed_name(name, sha)
+        with transaction.atomic():
+            if StoredBlob.objects.select_for_update().filter(name=name).exists():
+                StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+            else:
+                try:
+                    with transaction.atomic():
+                        StoredBlob.objects.create(name=name, sha256=sha, size=content.size, refcount=1)
+                except IntegrityError:
+                    # حفظ متزامن لنفس المحتوى أنشأ الصف قبلنا
+                    StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+            # تحت القفل: صف بعداد صفر ينتظر حذف ملفه لا يحذفه بعد الآن، وملف حُذف يُكتب من جديد
+            if not self.exists(name):
+                self._write(name, content)
+        return name
+
+    def add_reference(self, name):
+        """ربط ملف موجود بسجل إضافي بدون رفعه من جديد"""
+        from .models import StoredBlob
+
+        StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+    def delete(self, name):
+        """
+        إنقاص العداد تحت قفل الصف. عند آخر مرجع يبقى الصف بعداد صفر، والملف يُحذف بعد نجاح المعاملة
+        (rollback لا يترك سجلاً يشير لملف محذوف).
+        """
+        from .models import StoredBlob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None:
+                if blob.refcount > 1:
+                    StoredBlob.objects.filter(name=name).update(refcount=F('refcount') - 1)
+                    return  # ما زال مستخدماً في سجل آخر
+                StoredBlob.objects.filter(name=name).update(refcount=0)
+            transaction.on_commit(lambda: self._purge(name))
+
+    def _purge(self, name):
+        """حذف الملف والصف لو لم يأخذ حفظ متزامن مرجعاً جديداً بعد delete()"""
+        from .models import StoredBlob
+
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None:
+                if blob.refcount > 0:
+                    return
+                blob.delete()
+            super().delete(name)
+
+
+_storage = None
+
+
+def content_addressed_storage():
+    """callable للـ FileField(storage=...) حتى لا يُكتب إعداد التخزين في الـ migrations"""
+    global _storage
+    if _storage is None:
+        _storage = ContentAddressedStorage()
+    return _storage
+
+
+# ------------------------------
+# SIGNAL HANDLERS (تحرير المرجع عند تغيير الملف أو حذف السجل - بعد نجاح المعاملة)
+# ------------------------------
+FILE_FIELDS = {
+    'Student': ('personal_photo',),
+    'AttendanceRecord': ('proof_file',),
+}
+
+
+def remember_previous_files(sender, instance, **kwargs):
+    fields = FILE_FIELDS[sender.__name__]
+    instance._previous_files = {}
+    if instance.pk:
+        row = sender.objects.filter(pk=instance.pk).values(*fields).first()
+        instance._previous_files = row or {}
+
+
+def release_replaced_files(sender, instance, **kwargs):
+    for field, previous in getattr(instance, '_previous_files', {}).items():
+        current = getattr(instance, field)
+        if previous and previous != current.name:
+            transaction.on_commit(lambda storage=current.storage, name=previous: storage.delete(name))
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field in FILE_FIELDS[sender.__name__]:
+        current = getattr(instance, field)
+        if current:
+            transaction.on_commit(lambda storage=current.storage, name=current.name: storage.delete(name))
@@ -0,0 +1,185 @@
+import csv
+import io
+import os
+import time
+
+from django.db import transaction
+
+from .conditional import touch
+from .models import Company, Student
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # الاستيراد من XLSX اختياري
+    load_workbook = None
+
+
+# ==============================
+# 📥 STUDENT IMPORT (CSV / XLSX على دفعات)
+# ==============================
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+# نفس عناوين ملف التصدير (export/students) + أسماء الحقول بالإنجليزية
+HEADER_ALIASES = {
+    'name': 'name', 'الاسم': 'name',
+    'national_id': 'national_id', 'الرقم القومي': 'national_id',
+    'phone': 'phone', 'الهاتف': 'phone',
+    'company': 'company', 'المؤسسة': 'company',
+    'status': 'status', 'الحالة': 'status',
+}
+REQUIRED_COLUMNS = {'name', 'national_id', 'company'}
+# أطوال أعمدة قاعدة البيانات: الصف الأطول خطأ في صفه بدلاً من DataError يلغي الملف كله
+MAX_LENGTHS = {
+    'name': Student._meta.get_field('name').max_length,
+    'phone': Student._meta.get_field('phone').max_length,
+    'company': Company._meta.get_field('name').max_length,
+}
+
+
+def file_type_of(filename):
+    return 'xlsx' if os.path.splitext(filename or '')[1].lower() == '.xlsx' else 'csv'
+
+
+def read_rows(fileobj, file_type='csv'):
+    """قراءة الصفوف واحداً تلو الآخر بدون تحميل الملف كله (أول صف = العناوين)"""
+    if file_type == 'xlsx':
+        if load_workbook is None:
+            raise ValueError("استيراد XLSX يتطلب تثبيت openpyxl")
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise ValueError(f"ملف CSV غير صالح (سطر {reader.line_num}): {e}")
+    finally:
+        text.detach()
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # الأرقام في Excel تُقرأ float (29901011234567.0)
+        value = int(value)
+    return str(value).strip()
+
+
+class StudentImporter:
+    """
+    - الأرقام القومية الموجودة تُحمّل في set (استعلام واحد) بدلاً من فحص كل صف
+    - المؤسسات بالاسم من dict في الذاكرة (استعلام واحد)
+    - الصفوف السليمة تُكتب بـ bulk_create كل chunk_size صف، والصفوف الخاطئة تُرجع مع رقمها
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, create_companies=False, dry_run=False):
+        self.chunk_size = chunk_size
+        self.create_companies = create_companies
+        self.dry_run = dry_run
+        self.national_ids = set(Student.objects.values_list('national_id', flat=True))
+        self.companies = {
+            name.strip().casefold(): pk for pk, name in Company.objects.values_list('id', 'name')
+        }
+        self.statuses = {}
+        for code, label in Student.STATUS_CHOICES:
+            self.statuses[code] = code
+            self.statuses[label] = code
+        self.pending = []
+        self.created = 0
+        self.errors = []
+        self.error_count = 0
+
+    def _company_id(self, name):
+        key = name.casefold()
+        if key not in self.companies and self.create_companies and not self.dry_run:
+            self.companies[key] = Company.objects.create(name=name).pk
+        return self.companies.get(key)
+
+    def validate(self, row):
+        errors = {}
+        for field, max_length in MAX_LENGTHS.items():
+            if len(row.get(field, '')) > max_length:
+                errors[field] = f"أطول من {max_length} حرف"
+        if not row.get('name'):
+            errors['name'] = "مطلوب"
+        national_id = row.get('national_id', '')
+        if not (len(national_id) == 14 and national_id.isdigit()):
+            errors['national_id'] = "الرقم القومي يجب أن يكون 14 رقم"
+        elif national_id in self.national_ids:
+            errors['national_id'] = "الرقم القومي مسجل بالفعل"
+
+        company_id = None
+        if not row.get('company'):
+            errors['company'] = "مطلوب"
+        elif 'company' not in errors:
+            company_id = self._company_id(row['company'])
+            if company_id is None and not (self.create_companies and self.dry_run):
+                errors['company'] = f"مؤسسة غير موجودة: {row['company']}"
+
+        status = self.statuses.get(row.get('status') or 'active')
+        if status is None:
+            errors['status'] = f"حالة غير معروفة: {row['status']}"
+        return errors, company_id, status
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "errors": errors})
+
+    def flush(self):
+        if self.pending and not self.dry_run:
+            Student.objects.bulk_create(self.pending)
+            touch(Student)
+        self.created += len(self.pending)
+        self.pending = []
+
+    def run(self, rows):
+        started = time.perf_counter()
+        rows = iter(rows)
+        header = [HEADER_ALIASES.get(_clean(h)) for h in next(rows, [])]
+        missing = REQUIRED_COLUMNS - set(header)
+        if missing:
+            raise ValueError(f"أعمدة ناقصة: {', '.join(sorted(missing))}")
+
+        total = 0
+        with transaction.atomic():
+            for line, values in enumerate(rows, start=2):
+                row = {field: _clean(v) for field, v in zip(header, values) if field}
+                if not any(row.values()):
+                    continue  # صف فارغ
+                total += 1
+                errors, company_id, status = self.validate(row)
+                if errors:
+                    self.add_error(line, errors)
+                    continue
+                self.national_ids.add(row['national_id'])  # منع التكرار داخل نفس الملف
+                self.pending.append(Student(
+                    name=row['name'],
+                    national_id=row['national_id'],
+                    phone=row.get('phone') or None,
+                    status=status,
+                    company_id=company_id,
+                ))
+                if len(self.pending) >= self.chunk_size:
+                    self.flush()
+            self.flush()
+
+        return {
+            "total_rows": total,
+            "created": self.created,
+            "failed": self.error_count,
+            "errors": self.errors,
+            "dry_run": self.dry_run,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def import_students(fileobj, file_type='csv', **options):
+    return StudentImporter(**options).run(read_rows(fileobj, file_type))
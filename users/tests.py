@@ -1,3 +1,1647 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import urls as user_urls
+from .audit import AuditLogWriter, audit_writer, write_log
+from .notification_bus import get_notification_bus
+from .notifications import send_notification
+from .fanout import fan_out, resolve_audience
+from .absence_alerts import evaluate_absence_alerts
+from .workload import propose_assignments
+from .training_calendar import calendar
+from .attendance_gaps import find_attendance_gaps, notify_gaps
+from .student_import import load_workbook
+from .storage import content_addressed_storage
+from .conditional import touch
+from .chunked_upload import OffsetMismatch, finalize_upload, part_path, write_chunk
+from .models import (
+    User, Company, Student, Visit, EvaluationRequest, AssignedEvaluation,
+    Evaluation, TrainingDay, SystemLog, AttendanceRecord, Notification, SupervisorWorkload,
+    StudentAttendanceSummary, AbsenceAlert, StoredBlob, ChunkedUpload, FanoutJob,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# 🔢 QUERY COUNT (N+1) TESTS
+# ==============================
+class ListQueryCountTests(TestCase):
+    """عدد الاستعلامات في القوائم يجب أن يبقى ثابتاً مهما زاد عدد الصفوف"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin_qc', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.day = date(2025, 1, 1)
+
+    def add_rows(self, n):
+        start = Company.objects.count()
+        for i in range(start, start + n):
+            company = Company.objects.create(name=f'Company {i}')
+            student = Student.objects.create(name=f'Student {i}', national_id=f'{i:014d}', company=company)
+            AttendanceRecord.objects.create(student=student, company=company, date=self.day + timedelta(days=i))
+            Visit.objects.create(company=company, student=student, supervisor=self.admin, visit_date=self.day)
+            SystemLog.objects.create(user=self.admin, action='ADD', details=f'row {i}')
+            req = EvaluationRequest.objects.create(title=f'Request {i}', issued_by=self.admin)
+            req.companies.add(company)
+            req.students.add(student)
+
+    def count_queries(self, url):
+        cache.clear()  # نفس الحالة (كاش بارد) في القياسين
+        calendar.invalidate()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.add_rows(2)
+        few = self.count_queries(url)
+        self.add_rows(10)
+        many = self.count_queries(url)
+        self.assertEqual(few, many, f"{url}: {few} queries for 2 rows vs {many} for 12 rows")
+
+    def test_attendance_list(self):
+        self.assertConstantQueries('/api/attendance/')
+
+    def test_attendance_list_offset(self):
+        self.assertConstantQueries('/api/attendance/?pagination=offset')
+
+    def test_companies_list(self):
+        self.assertConstantQueries('/api/companies/')
+
+    def test_companies_student_count(self):
+        self.add_rows(1)
+        company = Company.objects.first()
+        Student.objects.create(name='extra', national_id='99999999999999', company=company)
+        response = self.client.get('/api/companies/')
+        counts = {row['id']: row['student_count'] for row in response.data['results']}
+        self.assertEqual(counts[company.id], 2)
+
+    def test_system_logs_list(self):
+        self.assertConstantQueries('/api/logs/')
+
+    def test_evaluation_requests_list(self):
+        self.assertConstantQueries('/api/evaluation-requests/')
+
+    def test_students_list(self):
+        self.assertConstantQueries('/api/students/')
+
+    def test_visits_list(self):
+        self.assertConstantQueries('/api/visits/')
+
+    def test_attendance_report_records(self):
+        self.assertConstantQueries('/api/attendance-report/?type=monthly&month=2025-01&include_records=true')
+
+
+class BulkAttendanceTests(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create(username='sup_bulk', role='supervisor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.supervisor)
+        self.company = Company.objects.create(name='Bulk Co')
+        self.students = [
+            Student.objects.create(name=f'S{i}', national_id=f'{i:014d}', company=self.company)
+            for i in range(40)
+        ]
+        self.day = date(2025, 3, 2)
+
+    def payload(self, status='present'):
+        return {
+            'company': self.company.id,
+            'date': self.day.isoformat(),
+            'records': [{'student': s.id, 'status': status} for s in self.students],
+        }
+
+    def test_bulk_insert_then_upsert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/attendance/bulk/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(len(ctx.captured_queries), 14)
+        self.assertEqual(AttendanceRecord.objects.filter(date=self.day, status='present').count(), 40)
+        self.assertEqual(SystemLog.objects.count(), 1)
+
+        response = self.client.post('/api/attendance/bulk/', self.payload('absent'), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AttendanceRecord.objects.filter(date=self.day).count(), 40)
+        self.assertEqual(AttendanceRecord.objects.filter(date=self.day, status='absent').count(), 40)
+
+    def test_rejects_holiday(self):
+        TrainingDay.objects.create(date=self.day, day_type='official_holiday')
+        response = self.client.post('/api/attendance/bulk/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_rejects_student_from_other_company(self):
+        other = Company.objects.create(name='Other')
+        stranger = Student.objects.create(name='X', national_id='99999999999999', company=other)
+        payload = self.payload()
+        payload['records'].append({'student': stranger.id, 'status': 'present'})
+        response = self.client.post('/api/attendance/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AttendanceSummaryTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Summary Co')
+        self.student = Student.objects.create(name='Sum', national_id='12312312312312', company=self.company)
+
+    def record(self, day, status='absent', **extra):
+        return AttendanceRecord.objects.create(
+            student=self.student, company=self.company, date=date(2025, 3, day), status=status, **extra
+        )
+
+    def summary(self):
+        return StudentAttendanceSummary.objects.get(student=self.student)
+
+    def test_signals_keep_counts_and_streaks(self):
+        self.record(1, 'present')
+        self.record(2)
+        self.record(3, is_excused=True)
+        last = self.record(4)
+        summary = self.summary()
+        self.assertEqual((summary.present_count, summary.absent_count), (1, 3))
+        self.assertEqual((summary.excused_count, summary.unexcused_count), (1, 2))
+        self.assertEqual((summary.absence_streak, summary.unexcused_streak), (3, 1))
+        self.assertEqual(summary.last_seen, date(2025, 3, 1))
+
+        last.delete()
+        self.record(5, 'present')
+        summary = self.summary()
+        self.assertEqual((summary.absence_streak, summary.unexcused_streak), (0, 0))
+        self.assertEqual(summary.last_seen, date(2025, 3, 5))
+
+    def test_rebuild_command_matches_incremental(self):
+        for day in range(1, 8):
+            self.record(day, 'present' if day % 3 == 0 else 'absent')
+        expected = StudentAttendanceSummary.objects.values().get(student=self.student)
+        StudentAttendanceSummary.objects.all().delete()
+        call_command('rebuild_attendance_summary', '--chunk-size', '1', stdout=StringIO())
+        rebuilt = StudentAttendanceSummary.objects.values().get(student=self.student)
+        expected.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(rebuilt, expected)
+
+    def test_bulk_attendance_and_student_list_use_summary(self):
+        user = User.objects.create(username='sum_admin', role='admin')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/attendance/bulk/', {
+            'company': self.company.id, 'date': '2025-03-02',
+            'records': [{'student': self.student.id, 'status': 'absent'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/api/students/{self.student.id}/')
+        # الطالب مع الملخص + أرقام نسخ الجداول (ETag)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(response.data['attendance_summary']['absence_streak'], 1)
+
+        stats = client.get('/api/dashboard/').data
+        self.assertEqual(stats['attendance_totals']['absent'], 1)
+
+
+@override_settings(ABSENCE_ALERT_UNEXCUSED=4, ATTENDANCE_STREAK_ALERT=3)
+class AbsenceAlertTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Alert Co')
+        self.student = Student.objects.create(name='Alert', national_id='45645645645645', company=self.company)
+        self.supervisor = User.objects.create(username='alert_sup', role='supervisor')
+        req = EvaluationRequest.objects.create(title='Alerts')
+        AssignedEvaluation.objects.create(evaluation_request=req, supervisor=self.supervisor,
+                                          company=self.company, student=self.student)
+
+    def record(self, day, status='absent'):
+        AttendanceRecord.objects.create(student=self.student, company=self.company,
+                                        date=date(2025, 3, day), status=status)
+
+    def alerts(self):
+        return Notification.objects.filter(user=self.supervisor, title='تنبيه غياب')
+
+    def test_each_threshold_fires_once(self):
+        for day in (1, 2):
+            self.record(day)
+        self.assertFalse(self.alerts().exists())
+
+        self.record(3)
+        self.assertEqual(self.alerts().count(), 1)
+        self.record(4)  # نفس السلسلة: لا تكرار، لكن حد الإجمالي (4) يُطلق
+        self.assertEqual(self.alerts().count(), 2)
+        self.assertEqual(set(AbsenceAlert.objects.values_list('rule', flat=True)), {'consecutive', 'unexcused_total'})
+
+        # حضور ثم سلسلة جديدة = تنبيه جديد
+        self.record(5, 'present')
+        for day in (6, 7, 8):
+            self.record(day)
+        self.assertEqual(self.alerts().count(), 3)
+
+    @override_settings(ABSENCE_ALERTS_INCREMENTAL=False)
+    def test_concurrent_evaluation_notifies_once(self):
+        for day in (1, 2, 3):
+            self.record(day)
+        evaluate_absence_alerts([self.student.id])
+        self.assertEqual(self.alerts().count(), 1)
+        # تقييم آخر قرأ جدول التنبيهات قبل أن يُدخل الأول صفه
+        with mock.patch.object(AbsenceAlert.objects, 'filter', return_value=AbsenceAlert.objects.none()):
+            self.assertEqual(evaluate_absence_alerts([self.student.id]), 0)
+        self.assertEqual(self.alerts().count(), 1)
+
+    @override_settings(ABSENCE_ALERTS_INCREMENTAL=False)
+    def test_nightly_command_checks_changed_students(self):
+        for day in (1, 2, 3):
+            self.record(day)
+        self.assertFalse(self.alerts().exists())
+        call_command('check_absence_alerts', stdout=StringIO())
+        call_command('check_absence_alerts', stdout=StringIO())
+        self.assertEqual(self.alerts().count(), 1)
+
+
+class TrainingCalendarTests(TestCase):
+    def setUp(self):
+        calendar.invalidate()
+        # 2025-03-02 .. 2025-03-06 تدريب، 2025-03-04 إجازة
+        for day in (2, 3, 4, 5, 6):
+            TrainingDay.objects.create(date=date(2025, 3, day),
+                                       day_type='official_holiday' if day == 4 else 'training')
+        TrainingDay.objects.create(date=date(2025, 9, 7), day_type='training')
+
+    def test_counts_without_loading_again(self):
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 3, 31)), 4)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(calendar.count(date(2025, 3, 3), date(2025, 3, 5)), 2)
+            self.assertTrue(calendar.is_training_day(date(2025, 3, 6)))
+        # رقم النسخة فقط، بدون قراءة أيام التدريب مرة أخرى
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertFalse(any('users_trainingday' in q['sql'] for q in ctx.captured_queries))
+        # عبر عامين دراسيين
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 9, 30)), 5)
+        self.assertEqual(calendar.add_training_days(date(2025, 3, 2), 3), date(2025, 3, 6))
+        self.assertEqual(calendar.add_training_days(date(2025, 3, 2), 4), date(2025, 9, 7))
+
+    def test_other_worker_sees_writes(self):
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 3, 31)), 4)
+        # كتابة من worker آخر: لا signal هنا، فقط رقم النسخة المشترك في قاعدة البيانات
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            TrainingDay.objects.filter(date=date(2025, 3, 4)).update(day_type='training')
+            touch(TrainingDay)
+        cache.clear()
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 3, 31)), 5)
+
+    def test_write_invalidates(self):
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 3, 31)), 4)
+        TrainingDay.objects.filter(date=date(2025, 3, 4)).first().delete()
+        TrainingDay.objects.create(date=date(2025, 3, 4), day_type='training')
+        self.assertEqual(calendar.count(date(2025, 3, 1), date(2025, 3, 31)), 5)
+
+    def test_report_uses_expected_days(self):
+        company = Company.objects.create(name='Cal Co')
+        student = Student.objects.create(name='Cal', national_id='78978978978978', company=company)
+        for day in (2, 3):
+            AttendanceRecord.objects.create(student=student, company=company, date=date(2025, 3, day))
+        user = User.objects.create(username='cal_admin', role='admin')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        report = client.get('/api/attendance-report/', {'type': 'monthly', 'month': '2025-03'}).data
+        self.assertEqual(report['rate_basis'], 'expected_days')
+        self.assertEqual(report['expected_days'], 4)
+        self.assertEqual(report['attendance_rate'], 50.0)
+        self.assertEqual(report['missing_days'], [date(2025, 3, 5), date(2025, 3, 6)])
+        self.assertEqual(report['by_student'][0]['missing'], 2)
+
+        # طالب نشط بدون أي سجل هو الحالة الناقصة نفسها؛ غير النشط لا يُحسب
+        other = Company.objects.create(name='Cal Co 2')
+        Student.objects.create(name='Silent', national_id='78978978978979', company=other)
+        Student.objects.create(name='Left', national_id='78978978978980', company=other, status='graduated')
+        report = client.get('/api/attendance-report/', {'type': 'monthly', 'month': '2025-03'}).data
+        self.assertEqual(report['attendance_rate'], 25.0)
+        self.assertEqual(report['missing_records'], 2 + 4)
+        self.assertEqual(report['students_with_missing'], 2)
+        by_company = {row['company__name']: row for row in report['by_company']}
+        self.assertEqual((by_company['Cal Co']['expected'], by_company['Cal Co']['missing']), (4, 2))
+        self.assertEqual((by_company['Cal Co 2']['expected'], by_company['Cal Co 2']['missing']), (4, 4))
+
+        response = client.get('/api/training-days/calendar/', {'from': '2025-03-01', 'add': 2})
+        self.assertEqual(response.data['date'], date(2025, 3, 3))
+
+
+class AttendanceGapTests(TestCase):
+    def setUp(self):
+        calendar.invalidate()
+        for day in (2, 3, 4):
+            TrainingDay.objects.create(date=date(2025, 3, day), day_type='training')
+        TrainingDay.objects.create(date=date(2025, 3, 5), day_type='official_holiday')
+        self.companies = Company.objects.bulk_create(Company(name=f'Gap {i}') for i in range(2))
+        self.students = Student.objects.bulk_create(
+            Student(name=f'G{i}', national_id=f'{i:014d}', company=self.companies[i % 2]) for i in range(6)
+        )
+        Student.objects.create(name='Left', national_id='55555555555555', company=self.companies[0], status='inactive')
+        # الطالب 0 كامل، الطالب 1 ناقص يوم، الباقي بدون سجلات
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student=self.students[i], company=self.students[i].company, date=date(2025, 3, d))
+            for i, days in ((0, (2, 3, 4)), (1, (2, 4))) for d in days
+        )
+        self.supervisor = User.objects.create(username='gap_sup', role='supervisor')
+        Visit.objects.create(company=self.companies[1], student=self.students[1],
+                             supervisor=self.supervisor, visit_date=date(2025, 3, 10))
+        self.manager = User.objects.create(username='gap_manager', role='manager')
+
+    def test_gap_report_is_set_based(self):
+        with CaptureQueriesContext(connection) as ctx:
+            report = find_attendance_gaps(date(2025, 3, 1), date(2025, 3, 7))
+        # نسخة التقويم + أيام التدريب + الطلاب الناقصين + الأيام المسجلة
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(report['training_days'], 3)
+        self.assertEqual(report['students_with_gaps'], 5)
+        self.assertEqual(report['missing_records'], 1 + 4 * 3)
+        student_1 = next(s for c in report['by_company'] for s in c['students'] if s['id'] == self.students[1].id)
+        self.assertEqual(student_1['missing_days'], [date(2025, 3, 3)])
+
+    def test_gap_view_validates_company(self):
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        url = '/api/attendance/gaps/?from=2025-03-01&to=2025-03-07'
+        self.assertEqual(client.get(url + '&company=abc').status_code, 400)
+        response = client.get(f'{url}&company={self.companies[1].id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['company'] for c in response.data['by_company']], [self.companies[1].id])
+
+    def test_notify_supervisor_and_managers(self):
+        call_command('detect_missing_attendance', stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
+
+        sent = notify_gaps(find_attendance_gaps(date(2025, 3, 1), date(2025, 3, 7)))
+        self.assertEqual(sent, 2)
+        self.assertIn('Gap 1', Notification.objects.get(user=self.supervisor).message)
+        self.assertIn('Gap 0', Notification.objects.get(user=self.manager).message)
+
+
+class StudentImportTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='import_manager', role='manager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.company = Company.objects.create(name='Import Co')
+        Student.objects.create(name='Old', national_id='10000000000000', company=self.company)
+
+    def upload(self, rows, name='students.csv', **extra):
+        lines = ['الاسم,الرقم القومي,الهاتف,المؤسسة,الحالة'] + rows
+        content = '\ufeff' + '\n'.join(lines)
+        file = SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+        return self.client.post('/api/students/import/', {'file': file, **extra}, format='multipart')
+
+    def test_bulk_import_with_row_errors(self):
+        rows = [f'طالب {i},{20000000000000 + i},,import co,نشط' for i in range(5000)]
+        rows += [
+            'مكرر,10000000000000,,Import Co,',
+            'مكرر في الملف,20000000000000,,Import Co,',
+            'رقم خطأ,123,,Import Co,',
+            'بدون مؤسسة,30000000000000,,Unknown,',
+        ]
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.upload(rows)
+        self.assertLess(time.perf_counter() - started, 10)
+        self.assertEqual(response.status_code, 201)
+        # لا استعلام لكل صف (SQLite يقسم كل bulk_create حسب حد المتغيرات)
+        self.assertLess(len(ctx.captured_queries), 100)
+        self.assertEqual(response.data['created'], 5000)
+        self.assertEqual([e['row'] for e in response.data['errors']], [5002, 5003, 5004, 5005])
+        self.assertEqual(Student.objects.filter(company=self.company).count(), 5001)
+        self.assertEqual(SystemLog.objects.count(), 1)
+
+    def test_dry_run_and_create_companies(self):
+        response = self.upload(['جديد,40000000000000,,New Co,'], dry_run='true', create_companies='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertFalse(Company.objects.filter(name='New Co').exists())
+
+        response = self.upload(['جديد,40000000000000,,New Co,'], create_companies='true')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Student.objects.filter(national_id='40000000000000', company__name='New Co').exists())
+
+    def test_too_long_values_are_row_errors(self):
+        phone = '01012345678 / 01198765432'
+        response = self.upload([
+            f'طويل,60000000000001,{phone},Import Co,',
+            f'{"س" * 256},60000000000002,,Import Co,',
+            'سليم,60000000000003,01012345678,Import Co,',
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([(e['row'], list(e['errors'])) for e in response.data['errors']], [(2, ['phone']), (3, ['name'])])
+
+    def test_malformed_csv(self):
+        file = SimpleUploadedFile('bad.csv', 'الاسم,الرقم القومي,المؤسسة\n"{}",1,x\n'.format('x' * 200000).encode())
+        response = self.client.post('/api/students/import/', {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('CSV', response.data['error'])
+
+    def test_xlsx_and_missing_columns(self):
+        if load_workbook is None:
+            self.skipTest("openpyxl not installed")
+        from openpyxl import Workbook
+        wb = Workbook()
+        wb.active.append(['name', 'national_id', 'company'])
+        wb.active.append(['XLSX', 50000000000000, 'Import Co'])
+        buffer = BytesIO()
+        wb.save(buffer)
+        file = SimpleUploadedFile('students.xlsx', buffer.getvalue())
+        response = self.client.post('/api/students/import/', {'file': file}, format='multipart')
+        self.assertEqual(response.data['created'], 1)
+
+        response = self.upload([], name='bad.csv')
+        self.assertEqual(response.status_code, 201)
+        file = SimpleUploadedFile('bad.csv', b'name\nX\n')
+        response = self.client.post('/api/students/import/', {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='export_manager', role='manager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.company = Company.objects.create(name='Export Co')
+        self.student = Student.objects.create(name='طالب', national_id='60000000000000', company=self.company)
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(student=self.student, company=self.company, date=date(2025, 3, 2), status='present'),
+            AttendanceRecord(student=self.student, company=self.company, date=date(2025, 3, 3), status='absent',
+                             reason='مرض', is_excused=True),
+            AttendanceRecord(student=self.student, company=self.company, date=date(2025, 4, 1), status='present'),
+        ])
+
+    def csv_rows(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        # BOM عشان Excel يقرأ العربي صح
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(StringIO(content[1:])))
+
+    def test_csv_header_and_rows(self):
+        rows = self.csv_rows('/api/export/attendance/')
+        self.assertEqual(rows[0], ['الطالب', 'الرقم القومي', 'المؤسسة', 'التاريخ', 'الحالة', 'سبب الغياب', 'بعذر'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2], ['طالب', '60000000000000', 'Export Co', '2025-03-03', 'غايب', 'مرض', 'نعم'])
+
+    def test_filters_narrow_rows(self):
+        rows = self.csv_rows('/api/export/attendance/?type=monthly&month=2025-03')
+        self.assertEqual([row[3] for row in rows[1:]], ['2025-03-02', '2025-03-03'])
+        rows = self.csv_rows('/api/export/attendance/?type=daily&date=2025-04-01')
+        self.assertEqual([row[3] for row in rows[1:]], ['2025-04-01'])
+
+        response = self.client.get('/api/export/attendance/?type=monthly&month=2025-03')
+        self.assertIn('attendance_2025-03-01_2025-03-31.csv', response['Content-Disposition'])
+
+    def test_bad_range_and_file_type(self):
+        for query in ('type=yearly', 'type=daily', 'type=daily&date=2025-13-40', 'type=weekly&week=bad'):
+            response = self.client.get(f'/api/export/attendance/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+        response = self.client.get('/api/export/attendance/?file_type=pdf')
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch('users.views.Workbook', None):
+            response = self.client.get('/api/export/students/?file_type=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+    def test_xlsx_opens_with_openpyxl(self):
+        if load_workbook is None:
+            self.skipTest("openpyxl not installed")
+        response = self.client.get('/api/export/attendance/?file_type=xlsx&type=monthly&month=2025-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attendance_2025-03-01_2025-03-31.xlsx', response['Content-Disposition'])
+        wb = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(wb.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'الطالب')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][:2], ('طالب', '60000000000000'))
+
+    async def test_asgi_streams_with_async_iterator(self):
+        # تحت ASGI: async iterator بدلاً من sync_to_async(list) للملف كله
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.manager)}'}
+        response = await self.async_client.get('/api/export/attendance/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([part async for part in response.streaming_content]).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        self.assertEqual(len(list(csv.reader(StringIO(content[1:])))), 4)
+
+        if load_workbook is None:
+            return
+        response = await self.async_client.get('/api/export/attendance/?file_type=xlsx', headers=headers)
+        self.assertTrue(response.is_async)
+        self.assertIn('attendance.xlsx', response['Content-Disposition'])
+        content = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(len(content), int(response['Content-Length']))
+        rows = list(load_workbook(BytesIO(content), read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 4)
+
+
+class StudentPhotoTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.manager = User.objects.create(username='photo_manager', role='manager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.company = Company.objects.create(name='Photo Co')
+
+    def image_upload(self, size=(2400, 1200), name='face.png'):
+        image = Image.new('RGBA', size, (200, 10, 10, 255))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # الكاميرا كانت مقلوبة 90 درجة
+        exif[0x010F] = 'Phone Maker'
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def create_student(self):
+        response = self.client.post('/api/students/', {
+            'name': 'Photo', 'national_id': '70000000000000', 'company': self.company.id,
+            'personal_photo': self.image_upload(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Student.objects.get(pk=response.data['id']), response.data
+
+    def test_upload_is_normalized(self):
+        student, data = self.create_student()
+        self.assertTrue(student.personal_photo.name.endswith('.jpg'))
+        with Image.open(student.personal_photo.path) as stored:
+            # 2400x1200 مع اتجاه 6 -> 1200x2400 ثم تصغير لحد 1600
+            self.assertEqual(stored.size, (800, 1600))
+            self.assertFalse(stored.getexif())
+        self.assertIn(f'/api/students/{student.pk}/photo/thumb/?v=', data['photo_thumbnail'])
+        self.assertEqual(set(data['photo_variants']), {'thumb', 'small', 'medium'})
+
+    def test_variants_are_lazy_and_cached(self):
+        student, data = self.create_student()
+        variant_path = os.path.splitext(student.personal_photo.path)[0] + '_small.jpg'
+        self.assertFalse(os.path.exists(variant_path))
+
+        # <img> لا يرسل headers: التوكن في ?token=
+        token = str(AccessToken.for_user(self.manager))
+        response = APIClient().get(f'/api/students/{student.pk}/photo/small/?token={token}')
+        self.assertEqual(response.status_code, 200)
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumb:
+            self.assertEqual(thumb.size, (160, 160))
+        mtime = os.path.getmtime(variant_path)
+        jwt_client = APIClient()
+        jwt_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(jwt_client.get(f'/api/students/{student.pk}/photo/small/').status_code, 200)
+        self.assertEqual(os.path.getmtime(variant_path), mtime)
+        self.assertEqual(jwt_client.get(f'/api/students/{student.pk}/photo/huge/').status_code, 404)
+
+        # صورة جديدة: النسخ القديمة تُحذف
+        response = self.client.put(
+            f'/api/students/{student.pk}/', {'personal_photo': self.image_upload(size=(300, 300), name='new.jpg')},
+            format='multipart',
+        )
+        self.assertFalse(os.path.exists(variant_path))
+        # والرابط يتغير فلا يعرض المتصفح النسخة المخزنة القديمة
+        self.assertNotEqual(response.data['photo_thumbnail'], data['photo_thumbnail'])
+
+    def test_cache_only_for_current_version(self):
+        student, data = self.create_student()
+        jwt_client = APIClient()
+        jwt_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.manager)}')
+        response = jwt_client.get(data['photo_thumbnail'])
+        self.assertEqual(response['Cache-Control'], 'private, max-age=86400')
+        for url in (f'/api/students/{student.pk}/photo/thumb/', f'/api/students/{student.pk}/photo/thumb/?v=old'):
+            self.assertEqual(jwt_client.get(url)['Cache-Control'], 'private, no-cache')
+
+    def test_variants_require_authentication(self):
+        student, _ = self.create_student()
+        url = f'/api/students/{student.pk}/photo/thumb/'
+        self.assertEqual(APIClient().get(url).status_code, 401)
+        self.assertEqual(APIClient().get(url + '?token=invalid').status_code, 401)
+        institution = User.objects.create(username='photo_institution', role='institution')
+        self.assertEqual(APIClient().get(f'{url}?token={AccessToken.for_user(institution)}').status_code, 403)
+
+    def test_rejects_non_image(self):
+        response = self.client.post('/api/students/', {
+            'name': 'Bad', 'national_id': '70000000000001', 'company': self.company.id,
+            'personal_photo': SimpleUploadedFile('x.jpg', b'not an image'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class ContentAddressedMediaTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.company = Company.objects.create(name='Media Co')
+        self.student = Student.objects.create(name='Media', national_id='80000000000000', company=self.company)
+        self.user = User.objects.create(username='media_user', role='supervisor')
+        self.token = str(AccessToken.for_user(self.user))
+        self.content = bytes(range(256)) * 40
+
+    def record(self, day, content=None):
+        return AttendanceRecord.objects.create(
+            student=self.student, company=self.company, date=date(2025, 3, day), status='absent',
+            proof_file=SimpleUploadedFile('proof.pdf', content or self.content),
+        )
+
+    def get(self, name, **headers):
+        return self.client.get(f'/api/media/{name}', {'token': self.token}, **headers)
+
+    def test_identical_uploads_are_deduplicated(self):
+        first, second = self.record(1), self.record(2)
+        self.assertEqual(first.proof_file.name, second.proof_file.name)
+        self.assertTrue(first.proof_file.name.startswith('attendance_proofs/'))
+        self.assertEqual(StoredBlob.objects.get(name=first.proof_file.name).refcount, 2)
+        self.assertTrue(first.proof_file.url.startswith('/api/media/attendance_proofs/'))
+
+        path = first.proof_file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.proof_file = SimpleUploadedFile('other.pdf', b'other')
+            second.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.filter(name=first.proof_file.name).exists())
+
+    def test_release_waits_for_commit(self):
+        record = self.record(1)
+        name, path = record.proof_file.name, record.proof_file.path
+        # المعاملة فشلت بعد حذف السجل: الملف والعداد كما هما
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                record.delete()
+                raise RuntimeError
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 1)
+
+        # آخر مرجع حُرر، ثم حفظ نفس المحتوى قبل تنفيذ الحذف المؤجل: الملف يبقى
+        storage = content_addressed_storage()
+        with self.captureOnCommitCallbacks() as callbacks:
+            storage.delete(name)
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 0)
+        self.record(2)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 1)
+
+    def test_concurrent_save_of_same_content(self):
+        name = self.record(1).proof_file.name
+        storage = content_addressed_storage()
+        # الطلب الثاني فحص exists() قبل أن يكتب الأول الملف
+        with mock.patch.object(storage, 'exists', return_value=False):
+            self.assertEqual(self.record(2).proof_file.name, name)
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 2)
+        with open(storage.path(name), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(name))), [os.path.basename(name)])
+
+    def test_etag_304_and_range(self):
+        name = self.record(1).proof_file.name
+        self.assertEqual(self.client.get(f'/api/media/{name}').status_code, 401)
+
+        response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        etag = response['ETag']
+        self.assertIn('immutable', response['Cache-Control'])
+
+        self.assertEqual(self.get(name, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.get(name, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        response = self.get(name, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+        self.assertEqual(self.get(name, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+        self.assertEqual(self.get('attendance_proofs/../../x').status_code, 404)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, CHUNKED_UPLOAD_MAX_CHUNK=1024))
+        self.user = User.objects.create(username='upload_sup', role='supervisor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        company = Company.objects.create(name='Upload Co')
+        student = Student.objects.create(name='Up', national_id='90000000000000', company=company)
+        self.records = AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student=student, company=company, date=date(2025, 3, d), status='absent')
+            for d in (1, 2, 3)
+        )
+        self.content = os.urandom(2500)
+
+    def start(self):
+        response = self.client.post('/api/attendance/uploads/', {'filename': '../proof.PDF', 'size': len(self.content)},
+                                    format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"/api/attendance/uploads/{response.data['id']}/"
+
+    def put(self, url, offset, data):
+        return self.client.put(f'{url}?offset={offset}', data, content_type='application/octet-stream')
+
+    def test_resumable_upload_and_attach(self):
+        url = self.start()
+        self.assertEqual(self.put(url, 0, self.content[:1024]).data['offset'], 1024)
+        # إعادة إرسال جزء قديم بعد انقطاع: 409 مع الـ offset الصحيح
+        response = self.put(url, 0, self.content[:1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1024)
+        self.assertEqual(self.put(url, 1024, self.content[1024:2500]).status_code, 400)  # أكبر من الحد
+
+        self.assertEqual(self.client.get(url).data['offset'], 1024)
+        self.put(url, 1024, self.content[1024:2048])
+        self.assertEqual(self.client.post(url + 'complete/', {'sha256': 'bad'}).status_code, 400)  # غير مكتمل
+        self.put(url, 2048, self.content[2048:])
+        self.assertEqual(self.client.post(url + 'complete/', {'sha256': '0' * 64}).status_code, 400)
+
+        response = self.client.post(url + 'complete/', {'sha256': hashlib.sha256(self.content).hexdigest()})
+        self.assertEqual(response.data['status'], 'complete')
+        upload = ChunkedUpload.objects.get()
+        self.assertTrue(upload.file.startswith('attendance_proofs/') and upload.file.endswith('.pdf'))
+
+        response = self.client.post(url + 'attach/', {'records': [r.id for r in self.records]}, format='json')
+        self.assertEqual(response.data['attached'], 3)
+        self.assertEqual(AttendanceRecord.objects.filter(proof_file=upload.file).count(), 3)
+        self.assertEqual(StoredBlob.objects.get(name=upload.file).refcount, 4)
+
+        with open(content_addressed_storage().path(upload.file), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        # حذف الرفع يحرر مرجعه فقط، والسجلات تحتفظ بالملف
+        call_command('purge_uploads', '--hours', '0', stdout=StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(StoredBlob.objects.get(name=upload.file).refcount, 3)
+
+    def test_complete_twice_takes_one_reference(self):
+        url = self.start()
+        for offset in range(0, len(self.content), 1024):
+            self.put(url, offset, self.content[offset:offset + 1024])
+        sha = hashlib.sha256(self.content).hexdigest()
+        # الطلب الثاني حمّل الرفع قبل أن يكتمل
+        stale = ChunkedUpload.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url + 'complete/', {'sha256': sha}).status_code, 200)
+        self.assertEqual(finalize_upload(stale, sha).status, 'complete')
+        self.assertEqual(self.client.post(url + 'complete/', {'sha256': sha}).status_code, 200)
+        self.assertEqual(StoredBlob.objects.get(name=ChunkedUpload.objects.get().file).refcount, 1)
+        self.assertFalse(os.path.exists(part_path(stale)))
+
+    def test_chunk_is_read_before_locking(self):
+        self.start()
+        upload = ChunkedUpload.objects.get()
+        test = self
+
+        class SlowStream:
+            # جزء آخر لنفس الرفع اكتمل أثناء قراءة الشبكة
+            def read(self, n):
+                test.assertFalse(ChunkedUpload.objects.filter(offset__gt=0).exists())
+                ChunkedUpload.objects.filter(pk=upload.pk).update(offset=1024)
+                return test.content[:n]
+
+        with self.assertRaises(OffsetMismatch):
+            write_chunk(upload, 0, SlowStream(), 1024)
+        directory = os.path.dirname(part_path(upload))
+        self.assertEqual([f for f in os.listdir(directory) if f.endswith('.chunk')], [])
+
+    def test_rejects_bad_uploads(self):
+        response = self.client.post('/api/attendance/uploads/', {'filename': 'x.exe', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+        url = self.start()
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='other_sup', role='supervisor'))
+        self.assertEqual(other.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url + 'attach/', {'records': [1]}, format='json').status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag من أرقام نسخ الجداول: 304 بدون استعلامات، ويتغير بعد أي كتابة (حتى bulk)"""
+
+    def setUp(self):
+        cache.clear()
+        self.supervisor = User.objects.create(username='etag_sup', role='supervisor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.supervisor)
+        self.company = Company.objects.create(name='ETag Co')
+        self.student = Student.objects.create(name='E', national_id='77777777777777', company=self.company)
+
+    def etag(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        return response['ETag']
+
+    def test_not_modified_without_queries(self):
+        etag = self.etag('/api/students/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/students/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # استعلام النسخ فقط
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotEqual(self.etag('/api/students/?search=E'), etag)
+
+    def test_etag_changes_after_writes(self):
+        etag = self.etag('/api/students/')
+        # معاملة منفصلة: touch يجمع الجداول في callback واحد لكل معاملة (الـ setUp له callback آخر)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Student.objects.create(name='F', national_id='77777777777778', company=self.company)
+        self.assertNotEqual(self.etag('/api/students/'), etag)
+
+        # bulk_create لا يطلق signals: المسار الجماعي يغير النسخة يدوياً
+        etag = self.etag('/api/attendance/')
+        payload = {
+            'company': self.company.id,
+            'date': '2025-03-02',
+            'records': [{'student': self.student.id, 'status': 'present'}],
+        }
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.assertEqual(self.client.post('/api/attendance/bulk/', payload, format='json').status_code, 201)
+        self.assertNotEqual(self.etag('/api/attendance/'), etag)
+
+    def test_versions_are_shared_between_workers(self):
+        # worker آخر له كاش محلي منفصل: النسخة يجب أن تأتي من قاعدة البيانات
+        etag = self.etag('/api/students/')
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Student.objects.filter(pk=self.student.pk).update(name='Renamed')
+            touch(Student)
+        cache.clear()
+        self.assertNotEqual(self.etag('/api/students/'), etag)
+
+    def test_dashboard_cache_follows_versions(self):
+        manager = User.objects.create(username='etag_dash', role='manager')
+        client = APIClient()
+        client.force_authenticate(manager)
+        self.assertEqual(client.get('/api/dashboard/').data['companies']['total'], 1)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Company.objects.create(name='ETag Co 2')
+        response = client.get('/api/dashboard/')
+        self.assertEqual(response.data['companies']['total'], 2)
+
+        # كتابة في worker آخر: الكاش المحلي لم يُمسح لكن النسخة تغيرت
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Company.objects.bulk_create([Company(name='ETag Co 3')])
+            touch(Company)
+        response = client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['companies']['total'], 3)
+        self.assertFalse(response.data['cached'])
+        self.assertTrue(client.get('/api/dashboard/').data['cached'])
+
+    def test_one_version_upsert_per_transaction(self):
+        SystemLog.objects.bulk_create(SystemLog(action='ADD', details=f'touch {i}') for i in range(500))
+        etag = self.etag('/api/students/')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+            SystemLog.objects.all().delete()
+            Student.objects.filter(pk=self.student.pk).delete()
+        self.assertEqual(len(callbacks), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            callbacks[0]()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotEqual(self.etag('/api/students/'), etag)
+
+    def test_m2m_change_and_per_user(self):
+        manager = User.objects.create(username='etag_manager', role='manager')
+        other = APIClient()
+        other.force_authenticate(manager)
+        req = EvaluationRequest.objects.create(title='ETag', issued_by=manager)
+        self.assertNotEqual(self.etag('/api/students/', other), self.etag('/api/students/'))
+        etag = self.etag('/api/evaluation-requests/', other)
+        with self.captureOnCommitCallbacks(execute=True):
+            req.companies.add(self.company)
+        self.assertNotEqual(self.etag('/api/evaluation-requests/', other), etag)
+
+
+class ExpandEvaluationRequestTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='exp_manager', role='manager')
+        self.supervisors = [User.objects.create(username=f'exp_sup_{i}', role='supervisor') for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.companies = Company.objects.bulk_create(Company(name=f'Exp {i}') for i in range(10))
+        Student.objects.bulk_create(
+            Student(name=f'S{i}', national_id=f'{i:014d}', company=self.companies[i % 10])
+            for i in range(60)
+        )
+        self.req = EvaluationRequest.objects.create(title='Expand', issued_by=self.manager)
+        self.req.companies.set(self.companies)
+
+    def expand(self):
+        return self.client.post(f'/api/evaluation-requests/{self.req.id}/expand/', {}, format='json')
+
+    def test_expand_creates_balanced_assignments(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.expand()
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(ctx.captured_queries), 15)
+        self.assertEqual(response.data['created'], 60)
+        per_supervisor = response.data['per_supervisor'].values()
+        self.assertEqual(sorted(v['students'] for v in per_supervisor), [18, 18, 24])
+        # طلاب كل مؤسسة عند مشرف واحد
+        companies = [c for v in per_supervisor for c in v['companies']]
+        self.assertEqual(len(companies), len(set(companies)))
+        self.assertEqual(SupervisorWorkload.objects.get(supervisor=self.supervisors[0]).load, 24)
+
+    def test_expand_is_idempotent_and_respects_existing_load(self):
+        busy = self.supervisors[0]
+        other = EvaluationRequest.objects.create(title='Other')
+        AssignedEvaluation.objects.bulk_create(
+            AssignedEvaluation(evaluation_request=other, supervisor=busy) for _ in range(30)
+        )
+        call_command('rebuild_workload', stdout=StringIO())
+        response = self.client.post(
+            f'/api/evaluation-requests/{self.req.id}/expand/', {'dry_run': 'true'}, format='json'
+        )
+        self.assertEqual(response.data['created'], 0)
+        self.assertFalse(AssignedEvaluation.objects.filter(evaluation_request=self.req).exists())
+
+        response = self.expand()
+        self.assertNotIn(busy.id, response.data['per_supervisor'])
+
+        response = self.expand()
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['already_assigned'], 60)
+
+    def test_duplicate_assignment_is_rejected(self):
+        student = Student.objects.filter(company=self.companies[0]).first()
+        AssignedEvaluation.objects.create(evaluation_request=self.req, student=student, company=self.companies[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AssignedEvaluation.objects.create(evaluation_request=self.req, student=student)
+
+        # توزيع يدوي وصل بعد أن قرأ expand التوزيعات: الطالب في الخطة لكنه لا يُكرر
+        real_propose = propose_assignments
+        with mock.patch('users.assignments.propose_assignments',
+                        side_effect=lambda pending, loads: real_propose(pending + [(student.id, student.company_id)], loads)):
+            response = self.expand()
+        self.assertEqual(response.data['created'], 59)
+        self.assertEqual(AssignedEvaluation.objects.filter(evaluation_request=self.req, student=student).count(), 1)
+
+
+class WorkloadIndexTests(TestCase):
+    def setUp(self):
+        self.sup_a = User.objects.create(username='wl_a', role='supervisor')
+        self.sup_b = User.objects.create(username='wl_b', role='supervisor')
+        self.company = Company.objects.create(name='WL Co')
+        self.student = Student.objects.create(name='S', national_id='22222222222222', company=self.company)
+
+    def workload(self, user):
+        return SupervisorWorkload.objects.get(supervisor=user)
+
+    def test_index_updates_incrementally(self):
+        visit = Visit.objects.create(company=self.company, student=self.student,
+                                     supervisor=self.sup_a, visit_date=date(2025, 1, 1))
+        self.assertEqual(self.workload(self.sup_a).pending_visits, 1)
+        self.assertEqual(self.workload(self.sup_a).companies_covered, 1)
+
+        # نقل الزيارة لمشرف آخر يحدث الاثنين
+        visit.supervisor = self.sup_b
+        visit.save()
+        self.assertEqual(self.workload(self.sup_a).pending_visits, 0)
+        self.assertEqual(self.workload(self.sup_b).pending_visits, 1)
+
+        visit.status = 'completed'
+        visit.save()
+        self.assertEqual(self.workload(self.sup_b).load, 0)
+
+    def test_propose_groups_by_company(self):
+        rows = [(i, i % 3) for i in range(9)] + [(100, 3)]
+        plan = propose_assignments(rows, {1: 0, 2: 5})
+        by_company = {}
+        for student_id, company_id, sup_id in plan:
+            by_company.setdefault(company_id, set()).add(sup_id)
+        self.assertTrue(all(len(sups) == 1 for sups in by_company.values()))
+        self.assertEqual(len(plan), 10)
+
+
+class VisitPlanTests(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create(username='plan_sup', role='supervisor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.supervisor)
+        req = EvaluationRequest.objects.create(title='Plan')
+        self.companies = Company.objects.bulk_create(Company(name=f'Plan {i}') for i in range(6))
+        for i in range(30):
+            student = Student.objects.create(name=f'S{i}', national_id=f'{i:014d}', company=self.companies[i % 6])
+            AssignedEvaluation.objects.create(evaluation_request=req, supervisor=self.supervisor,
+                                              company=student.company, student=student)
+        TrainingDay.objects.bulk_create([
+            TrainingDay(date=date(2025, 4, 6), day_type='training'),
+            TrainingDay(date=date(2025, 4, 7), day_type='official_holiday'),
+            TrainingDay(date=date(2025, 4, 8), day_type='training'),
+        ])
+        calendar.invalidate()  # bulk_create لا يطلق signals
+
+    def plan(self, **extra):
+        payload = {'start': '2025-04-06', 'end': '2025-04-08', 'max_companies_per_day': 3, **extra}
+        return self.client.post('/api/visits/plan/', payload, format='json')
+
+    def test_plan_groups_companies_on_training_days(self):
+        response = self.plan()
+        self.assertEqual(response.status_code, 200)
+        days = [str(day['date']) for day in response.data['itinerary']]
+        self.assertEqual(days, ['2025-04-06', '2025-04-08'])
+        self.assertEqual(response.data['visits'], 30)
+        self.assertFalse(Visit.objects.exists())
+
+    def test_apply_creates_visits_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.plan(apply=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(ctx.captured_queries), 16)
+        self.assertEqual(Visit.objects.count(), 30)
+        self.assertEqual(SupervisorWorkload.objects.get(supervisor=self.supervisor).pending_visits, 30)
+
+        # الطلاب الذين تمت جدولتهم لا يظهرون مرة أخرى
+        self.assertEqual(self.plan().data['visits'], 0)
+
+
+# ==============================
+# 📝 AUDIT LOG WRITER TESTS
+# ==============================
+@override_settings(AUDIT_LOG_ASYNC=True)
+class AuditLogWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='audit_user', role='admin')
+
+    def test_enqueued_only_on_commit(self):
+        with mock.patch.object(audit_writer, 'enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                write_log(self.user, 'ADD', 'committed')
+            enqueue.assert_called_once_with(self.user.pk, 'ADD', 'committed')
+
+    def test_not_enqueued_on_rollback(self):
+        with mock.patch.object(audit_writer, 'enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        write_log(self.user, 'DELETE', 'rolled back')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            enqueue.assert_not_called()
+
+    def test_flush_writes_batches(self):
+        writer = AuditLogWriter(max_size=10, batch_size=4)
+        for i in range(10):
+            writer.queue.put((self.user.pk, 'ADD', f'entry {i}'))
+        with self.assertNumQueries(3):
+            writer.flush()
+        self.assertEqual(SystemLog.objects.count(), 10)
+
+    def test_thread_refreshes_connection_and_retries(self):
+        writer = AuditLogWriter(batch_size=4)
+        writer.queue.put((self.user.pk, 'ADD', 'second'))
+        real_bulk_create = SystemLog.objects.bulk_create
+        calls = []
+
+        def flaky(objs, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('server closed the connection unexpectedly')
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch('users.audit.close_old_connections') as close_old, \
+                mock.patch.object(SystemLog.objects, 'bulk_create', side_effect=flaky):
+            writer._write_next((self.user.pk, 'ADD', 'first'))
+        close_old.assert_called_once()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(SystemLog.objects.count(), 2)
+
+    def test_full_queue_writes_inline(self):
+        writer = AuditLogWriter(max_size=1, batch_size=4, put_timeout=0)
+        writer.start = lambda: None  # بدون thread في الاختبار
+        writer.enqueue(self.user.pk, 'ADD', 'first')
+        writer.enqueue(self.user.pk, 'ADD', 'second')
+        self.assertEqual(SystemLog.objects.count(), 2)
+
+
+# ==============================
+# 🗄️ SYSTEM LOG ARCHIVE TESTS
+# ==============================
+class LogArchiveTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(SYSTEM_LOG_ARCHIVE_DIR=self.tmp.name, SYSTEM_LOG_RETENTION_DAYS=100)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create(username='archive_admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        now = timezone.now()
+        for i in range(30):
+            log = SystemLog.objects.create(user=self.admin, action='ADD', details=f'entry {i}')
+            SystemLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(days=10 * i))
+
+    def test_command_moves_old_logs_to_archive(self):
+        call_command('archive_logs', '--batch-size', '7', stdout=StringIO())
+        self.assertEqual(SystemLog.objects.count(), 10)
+        self.assertTrue(any(name.endswith('.jsonl.gz') for name in os.listdir(self.tmp.name)))
+
+    def test_search_spans_db_and_archive(self):
+        call_command('archive_logs', stdout=StringIO())
+        response = self.client.get('/api/logs/?archive=true&limit=25')
+        details = [row['details'] for row in response.data['results']]
+        self.assertEqual(details, [f'entry {i}' for i in range(25)])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get('/api/logs/?q=entry 2&limit=50')
+        details = {row['details'] for row in response.data['results']}
+        self.assertEqual(details, {'entry 2'} | {f'entry {i}' for i in range(20, 30)})
+
+    def test_interrupted_archive_is_not_duplicated(self):
+        # توقف بعد كتابة الدفعة الأولى وقبل حذفها، ثم تشغيل جديد يلحقها مرة أخرى
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command('archive_logs', '--batch-size', '7', stdout=StringIO())
+        self.assertEqual(SystemLog.objects.count(), 30)
+        response = self.client.get('/api/logs/?archive=true&limit=100')
+        self.assertEqual(len(response.data['results']), 30)
+
+        call_command('archive_logs', '--batch-size', '7', stdout=StringIO())
+        response = self.client.get('/api/logs/?archive=true&limit=100')
+        details = [row['details'] for row in response.data['results']]
+        self.assertEqual(details, [f'entry {i}' for i in range(30)])
+        response = self.client.get('/api/logs/?archive=true&limit=5&offset=25')
+        self.assertEqual([row['details'] for row in response.data['results']], [f'entry {i}' for i in range(25, 30)])
+
+    def test_limit_is_clamped(self):
+        for limit in (-5, 0):
+            response = self.client.get(f'/api/logs/?archive=true&limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), 1)
+            self.assertIn('offset=1', response.data['next'])
+
+
+# ==============================
+# 📡 NOTIFICATION STREAM (SSE) TESTS
+# ==============================
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='sse_user', role='supervisor')
+        self.token = str(AccessToken.for_user(self.user))
+
+    async def read_event(self, response):
+        return (await asyncio.wait_for(response.streaming_content.__anext__(), timeout=2)).decode()
+
+    async def ticket(self):
+        response = await self.async_client.post(
+            '/api/notifications/stream/ticket/', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['ticket']
+
+    async def test_requires_ticket(self):
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+        # الـ access token لا يُقبل في الرابط (يظهر في سجلات الوصول)
+        response = await self.async_client.get('/api/notifications/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': 'forged'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_expired_ticket(self):
+        ticket = await self.ticket()
+        with mock.patch('users.notification_stream.STREAM_TICKET_SECONDS', -1):
+            response = await self.async_client.get('/api/notifications/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_falls_back_to_polling(self):
+        # تحت WSGI البث لا ينتهي أبداً: 204 يوقف EventSource والعميل يعتمد على التحديث الدوري
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(client.post('/api/notifications/stream/ticket/').status_code, 204)
+        response = self.client.get('/api/notifications/stream/', {'ticket': 'any'})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_resumes_from_last_event_id(self):
+        first = await Notification.objects.acreate(user=self.user, title='T1', message='m')
+        second = await Notification.objects.acreate(user=self.user, title='T2', message='m')
+        response = await self.async_client.get(
+            '/api/notifications/stream/', {'ticket': await self.ticket(), 'last_id': first.id}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('retry', await self.read_event(response))
+        event = await self.read_event(response)
+        self.assertIn(f'id: {second.id}', event)
+        await response.streaming_content.aclose()
+
+    async def test_pushes_published_notification(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': await self.ticket()})
+        await self.read_event(response)  # retry
+        pending = asyncio.ensure_future(self.read_event(response))
+        await asyncio.sleep(0.05)
+        await sync_to_async(get_notification_bus().publish)(
+            self.user.id, {'id': 99, 'title': 'Live', 'message': 'm', 'is_read': False, 'created_at': None}
+        )
+        event = await pending
+        self.assertIn('"title": "Live"', event)
+        await response.streaming_content.aclose()
+
+
+class NotificationSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='sync_user', role='supervisor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifs = [send_notification(self.user, f'T{i}', 'm') for i in range(5)]
+
+    def test_since_returns_only_new(self):
+        response = self.client.get(f'/api/notifications/?since={self.notifs[2].id}')
+        ids = {row['id'] for row in response.data['results']}
+        self.assertEqual(ids, {self.notifs[3].id, self.notifs[4].id})
+
+    def test_unread_counter_tracks_send_and_read(self):
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 5)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/notifications/unread-count/')
+        # أرقام النسخ (ETag) + COUNT على الفهرس الجزئي
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notifications/{self.notifs[0].id}/read/')
+            self.client.post(f'/api/notifications/{self.notifs[0].id}/read/')
+            send_notification(self.user, 'T5', 'm')
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 5)
+
+    def test_unread_count_does_not_depend_on_local_cache(self):
+        # قراءة الكل من worker آخر: لا يوجد عداد محلي قديم
+        Notification.objects.filter(user=self.user).update(is_read=True)
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 0)
+
+    def test_mark_all_read_single_update(self):
+        # UPDATE واحد + تغيير نسخة جدول الإشعارات بعد المعاملة (+ SAVEPOINT / RELEASE للمعاملة)
+        with self.assertNumQueries(4):
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                response = self.client.post('/api/notifications/read-all/')
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 0)
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+
+class NotificationFanoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create(username='fan_manager', role='manager')
+        self.supervisors = User.objects.bulk_create(
+            User(username=f'fan_sup_{i}', role='supervisor') for i in range(25)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_evaluation_request_notifies_supervisors_in_chunks(self):
+        with self.settings(NOTIFICATION_FANOUT_CHUNK_SIZE=10):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/evaluation-requests/', {'title': 'Term 1'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Notification.objects.filter(title='طلب تقييم جديد').count(), 25)
+
+        stats = self.client.get(f"/api/notifications/broadcast/{response.data['notification_job']}/").data
+        self.assertEqual(stats['status'], 'done')
+        self.assertEqual(stats['recipients'], 25)
+        self.assertEqual(stats['chunks'], 3)
+
+    def test_job_state_survives_restart(self):
+        old = timezone.now() - timedelta(hours=1)
+        lost = FanoutJob.objects.create(title='Lost', message='m', audience={'role': 'supervisor'})
+        stuck = FanoutJob.objects.create(title='Stuck', message='m', status='running')
+        FanoutJob.objects.update(created_at=old, updated_at=old)
+        call_command('resume_fanout_jobs', stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(title='Lost').count(), 25)
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, 'failed')
+
+        # الحالة من قاعدة البيانات وليست من كاش الـ worker الذي أرسل
+        cache.clear()
+        stats = self.client.get(f'/api/notifications/broadcast/{lost.id}/').data
+        self.assertEqual((stats['status'], stats['recipients']), ('done', 25))
+        call_command('resume_fanout_jobs', stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(title='Lost').count(), 25)
+
+    def test_fan_out_query_count_is_constant(self):
+        ids = [u.id for u in self.supervisors]
+        with self.assertNumQueries(3):
+            fan_out(ids, 'T', 'm', chunk_size=10)
+
+    def test_audience_by_company(self):
+        company = Company.objects.create(name='Fan Co')
+        student = Student.objects.create(name='S', national_id='11111111111111', company=company)
+        Visit.objects.create(company=company, student=student, supervisor=self.supervisors[0], visit_date=date(2025, 1, 1))
+        self.assertEqual(resolve_audience(company_id=company.id), [self.supervisors[0].id])
+
+    def test_broadcast_requires_audience(self):
+        response = self.client.post('/api/notifications/broadcast/', {'title': 'T', 'message': 'm'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ==============================
+# 🗂️ INDEX USAGE (EXPLAIN) TESTS
+# ==============================
+class IndexUsageTests(TestCase):
+    """التأكد أن مخطط الاستعلامات يستخدم الفهارس المركبة على بيانات مزروعة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = User.objects.create(username='idx_sup', role='supervisor')
+        companies = Company.objects.bulk_create(Company(name=f'C{i}') for i in range(20))
+        students = Student.objects.bulk_create(
+            Student(name=f'S{i}', national_id=f'{i:014d}', company=companies[i % 20],
+                    status='active' if i % 5 else 'graduated')
+            for i in range(300)
+        )
+        days = [date(2025, 2, 1) + timedelta(days=d) for d in range(30)]
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student=s, company_id=s.company_id, date=day,
+                             status='absent' if (s.id + d) % 6 == 0 else 'present')
+            for d, day in enumerate(days) for s in students
+        )
+        Visit.objects.bulk_create(
+            Visit(company_id=s.company_id, student=s, supervisor=cls.supervisor, visit_date=days[s.id % 30])
+            for s in students
+        )
+        Notification.objects.bulk_create(
+            Notification(user=cls.supervisor, title=f'N{i}', message='-', is_read=i % 10 != 0)
+            for i in range(500)
+        )
+        SystemLog.objects.bulk_create(SystemLog(user=cls.supervisor, action='ADD') for _ in range(500))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, qs, index_name):
+        plan = qs.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_attendance_date_status(self):
+        qs = AttendanceRecord.objects.filter(date=date(2025, 2, 3), status='present')
+        self.assertUsesIndex(qs, 'attendance_date_status_idx')
+
+    def test_attendance_report_range(self):
+        qs = AttendanceRecord.objects.filter(date__range=[date(2025, 2, 1), date(2025, 2, 7)]).values('date')
+        self.assertUsesIndex(qs, 'attendance_date_status_idx')
+
+    def test_visits_by_supervisor(self):
+        qs = Visit.objects.filter(supervisor=self.supervisor).order_by('-visit_date', '-id')[:50]
+        self.assertUsesIndex(qs, 'visit_supervisor_date_idx')
+
+    def test_evaluations_by_supervisor(self):
+        qs = Evaluation.objects.filter(supervisor=self.supervisor).order_by('-date', '-id')[:50]
+        self.assertUsesIndex(qs, 'evaluation_supervisor_date_idx')
+
+    def test_notifications_list(self):
+        qs = Notification.objects.filter(user=self.supervisor).order_by('-created_at', '-id')[:50]
+        self.assertUsesIndex(qs, 'notif_user_created_idx')
+
+    def test_unread_notifications_partial_index(self):
+        qs = Notification.objects.filter(user=self.supervisor, is_read=False).order_by('-created_at')
+        self.assertUsesIndex(qs, 'notif_unread_idx')
+
+    def test_system_logs_by_timestamp(self):
+        qs = SystemLog.objects.order_by('-timestamp', '-id')[:50]
+        self.assertUsesIndex(qs, 'systemlog_timestamp_idx')
+
+    def test_students_by_status(self):
+        qs = Student.objects.filter(status='graduated')
+        self.assertUsesIndex(qs, 'student_status_idx')
+
+
+# ==============================
+# ⏱️ BENCHMARK / BUDGET TESTS
+# ==============================
+# ميزانية كل endpoint: أقصى عدد استعلامات، أقصى زمن (ms)، أقصى حجم للاستجابة (KB).
+# أي N+1 أو تحميل جدول كامل يكسر الميزانية ويُفشل الاختبار.
+# مسارات الكتابة فقط (POST) مستثناة في BENCHMARK_SKIP.
+# عدد الاستعلامات يشمل قراءة أرقام نسخ الجداول (ETag) في مسارات GET.
+BENCHMARK_BUDGETS = {
+    'dashboard/': {'queries': 6, 'ms': 500, 'kb': 2},
+    'logs/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'users/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'users/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'companies/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'companies/<int:pk>/': {'queries': 3, 'ms': 200, 'kb': 2},
+    'students/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'students/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'visits/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'visits/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'evaluation-requests/': {'queries': 4, 'ms': 500, 'kb': 64},
+    'evaluation-requests/<int:pk>/': {'queries': 4, 'ms': 200, 'kb': 8},
+    'assigned-evaluations/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'assigned-evaluations/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'evaluations/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'evaluations/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'training-days/': {'queries': 2, 'ms': 500, 'kb': 16},
+    'training-days/<int:pk>/': {'queries': 2, 'ms': 200, 'kb': 2},
+    'training-days/calendar/': {'queries': 3, 'ms': 200, 'kb': 4},
+    'attendance/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'attendance/<int:pk>/': {'queries': 4, 'ms': 200, 'kb': 2},
+    'attendance/gaps/': {'queries': 3, 'ms': 1000, 'kb': 64},
+    # + عدد الطلاب النشطين لكل مؤسسة (أساس الأيام المتوقعة)
+    'attendance-report/': {'queries': 7, 'ms': 2000, 'kb': 512},
+    'notifications/': {'queries': 2, 'ms': 500, 'kb': 32},
+    'notifications/unread-count/': {'queries': 2, 'ms': 200, 'kb': 1},
+    'export/attendance/': {'queries': 2, 'ms': 5000, 'kb': 8192},
+    'export/evaluations/': {'queries': 2, 'ms': 500, 'kb': 64},
+    'export/students/': {'queries': 2, 'ms': 1000, 'kb': 256},
+    'workload/': {'queries': 2, 'ms': 200, 'kb': 8},
+}
+
+BENCHMARK_SKIP = {
+    'notifications/stream/',  # SSE مفتوح بلا نهاية
+    'notifications/stream/ticket/',  # POST فقط
+    'attendance/bulk/',  # POST فقط
+    'evaluation-requests/<int:pk>/expand/',  # POST فقط
+    'visits/plan/',  # POST فقط
+    'students/import/',  # POST فقط
+    'students/<int:pk>/photo/<str:variant>/',  # بيانات القياس بدون صور
+    'media/<path:name>',  # بيانات القياس بدون ملفات
+    'attendance/uploads/',  # POST فقط
+    'attendance/uploads/<uuid:upload_id>/',  # رفع مؤقت لكل مستخدم
+    'attendance/uploads/<uuid:upload_id>/complete/',  # POST فقط
+    'attendance/uploads/<uuid:upload_id>/attach/',  # POST فقط
+    'notifications/<int:pk>/read/',  # POST فقط
+    'notifications/read-all/',  # POST فقط
+    'notifications/broadcast/',  # POST فقط
+    'notifications/broadcast/<uuid:job_id>/',  # مهمة إرسال لكل طلب
+    'change-password/',  # POST فقط
+}
+
+# حجم البيانات الافتراضي (ترم كامل): يمكن تصغيره محلياً بـ BENCH_SCALE=0.1
+BENCH_SCALE = float(os.getenv('BENCH_SCALE', '1'))
+BENCH_COMPANIES = max(int(200 * BENCH_SCALE), 5)
+BENCH_STUDENTS = max(int(2000 * BENCH_SCALE), 20)
+BENCH_DAYS = max(int(90 * BENCH_SCALE), 10)
+BENCH_START = date(2025, 2, 1)
+# الزمن يختلف من جهاز لآخر: ميزانية ms تُفحص فقط مع BENCH_TIMING=1
+BENCH_TIMING = os.getenv('BENCH_TIMING') == '1'
+# معامل لتخفيف ميزانية الزمن على الأجهزة البطيئة (CI)
+BENCH_TIME_FACTOR = float(os.getenv('BENCH_TIME_FACTOR', '1'))
+
+
+@tag('benchmark')
+class EndpointBudgetTests(TestCase):
+    """
+    يزرع بيانات واقعية (آلاف الطلاب، مئات المؤسسات، ترم من الحضور اليومي)
+    ويقيس كل endpoint في users/urls.py: عدد الاستعلامات، الزمن، وحجم الاستجابة.
+    تشغيل منفصل: python manage.py test --tag=benchmark (أو --exclude-tag=benchmark لتخطيه)
+    ميزانية الزمن: BENCH_TIMING=1 python manage.py test --tag=benchmark
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='bench_admin', role='admin')
+        cls.supervisor = User.objects.create(username='bench_supervisor', role='supervisor')
+
+        companies = Company.objects.bulk_create(
+            Company(name=f'Company {i}', address=f'Address {i}') for i in range(BENCH_COMPANIES)
+        )
+        students = Student.objects.bulk_create(
+            Student(name=f'Student {i}', national_id=f'{i:014d}', company=companies[i % len(companies)])
+            for i in range(BENCH_STUDENTS)
+        )
+        days = [BENCH_START + timedelta(days=d) for d in range(BENCH_DAYS)]
+        TrainingDay.objects.bulk_create(TrainingDay(date=day, day_type='training') for day in days)
+        calendar.invalidate()
+
+        AttendanceRecord.objects.bulk_create(
+            (
+                AttendanceRecord(
+                    student=student, company_id=student.company_id, date=day,
+                    status='absent' if (student.id + d) % 7 == 0 else 'present',
+                    is_excused=(student.id + d) % 14 == 0,
+                    recorded_by=cls.supervisor,
+                )
+                for d, day in enumerate(days) for student in students
+            ),
+            batch_size=5000,
+        )
+
+        Visit.objects.bulk_create(
+            Visit(company_id=s.company_id, student=s, supervisor=cls.supervisor, visit_date=days[0])
+            for s in students[:500]
+        )
+        req = EvaluationRequest.objects.create(title='Bench request', issued_by=cls.admin)
+        req.companies.set(companies[:50])
+        req.students.set(students[:200])
+        assignments = AssignedEvaluation.objects.bulk_create(
+            AssignedEvaluation(evaluation_request=req, supervisor=cls.supervisor,
+                               company_id=s.company_id, student=s)
+            for s in students[:200]
+        )
+        Evaluation.objects.bulk_create(
+            Evaluation(assigned_evaluation=a, student_id=a.student_id, company_id=a.company_id,
+                       supervisor=cls.supervisor, result='competent')
+            for a in assignments
+        )
+        SystemLog.objects.bulk_create(
+            SystemLog(user=cls.admin, action='ADD', details=f'bench {i}') for i in range(5000)
+        )
+        Notification.objects.bulk_create(
+            Notification(user=cls.admin, title=f'N {i}', message='bench') for i in range(500)
+        )
+
+        call_command('rebuild_workload', stdout=StringIO())
+        call_command('rebuild_attendance_summary', stdout=StringIO())
+
+        cls.pks = {
+            'users': cls.admin.pk,
+            'companies': companies[0].pk,
+            'students': students[0].pk,
+            'visits': Visit.objects.first().pk,
+            'evaluation-requests': req.pk,
+            'assigned-evaluations': assignments[0].pk,
+            'evaluations': Evaluation.objects.first().pk,
+            'training-days': TrainingDay.objects.first().pk,
+            'attendance': AttendanceRecord.objects.first().pk,
+        }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        # جدول النتائج على logger (يظهر عند تفعيل مستوى INFO لـ users.tests)
+        lines = ["{:<45} {:>8} {:>10} {:>10}".format('endpoint', 'queries', 'ms', 'KB')]
+        lines += [f"{url:<45} {queries:>8} {ms:>10.1f} {kb:>10.1f}" for url, queries, ms, kb in cls.results]
+        logger.info("\n".join(lines))
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def routes(self):
+        return [str(p.pattern) for p in user_urls.urlpatterns]
+
+    def build_url(self, route):
+        if '<int:pk>' in route:
+            route = route.replace('<int:pk>', str(self.pks[route.split('/')[0]]))
+        return f'/api/{route}'
+
+    def query_string(self, route):
+        if route in ('attendance-report/', 'export/attendance/'):
+            return f'?type=monthly&month={BENCH_START:%Y-%m}'
+        if route in ('training-days/calendar/', 'attendance/gaps/'):
+            return f'?from={BENCH_START}&to={BENCH_START + timedelta(days=BENCH_DAYS)}'
+        return ''
+
+    def measure(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            if response.streaming:
+                # البث يحدث أثناء قراءة المحتوى، فيدخل في القياس
+                response._consumed = b''.join(response.streaming_content)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        self.assertEqual(response.status_code, 200, url)
+        content = response._consumed if response.streaming else response.content
+        size_kb = len(content) / 1024
+        type(self).results.append((url, len(ctx.captured_queries), elapsed_ms, size_kb))
+        return len(ctx.captured_queries), elapsed_ms, size_kb
+
+    def test_every_route_has_budget(self):
+        missing = [r for r in self.routes() if r not in BENCHMARK_BUDGETS and r not in BENCHMARK_SKIP]
+        self.assertEqual(missing, [], "أضف ميزانية لكل endpoint جديد في BENCHMARK_BUDGETS")
+
+    def test_endpoint_budgets(self):
+        for route, budget in BENCHMARK_BUDGETS.items():
+            with self.subTest(route=route):
+                url = self.build_url(route) + self.query_string(route)
+                queries, ms, kb = self.measure(url)
+                self.assertLessEqual(queries, budget['queries'], f"{url}: {queries} queries")
+                if BENCH_TIMING:
+                    self.assertLessEqual(ms, budget['ms'] * BENCH_TIME_FACTOR, f"{url}: {ms:.1f} ms")
+                self.assertLessEqual(kb, budget['kb'], f"{url}: {kb:.1f} KB")
@@ -0,0 +1,114 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from .conditional import table_versions
+from .models import TrainingDay
+
+
+# ==============================
+# 📅 TRAINING CALENDAR (تقويم أيام التدريب في الذاكرة)
+# ==============================
+
+
+def academic_year(day):
+    """العام الدراسي يبدأ في سبتمبر: 2025-03-01 ينتمي لعام 2024"""
+    return day.year if day.month >= 9 else day.year - 1
+
+
+def academic_year_bounds(year):
+    return date(year, 9, 1), date(year + 1, 8, 31)
+
+
+class TrainingCalendar:
+    """
+    أيام التدريب (day_type='training') كمصفوفة مرتبة من ordinals لكل عام دراسي.
+    - تُحمّل كل سنة مرة واحدة (استعلام واحد) عند أول سؤال عنها.
+    - أي كتابة على TrainingDay تغير رقم نسخة الجدول في قاعدة البيانات (TableVersion)،
+      وكل worker يقارنه (استعلام واحد بالمفتاح) قبل كل استخدام فيمسح نسخته المحلية لو تغير.
+    - العد بين تاريخين = bisect على المصفوفة: O(log n).
+    """
+
+    def __init__(self):
+        self._years = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        version, = table_versions([TrainingDay])
+        if version != self._version:
+            with self._lock:
+                self._years = {}
+                self._version = version
+
+    def _year(self, year):
+        days = self._years.get(year)
+        if days is None:
+            start, end = academic_year_bounds(year)
+            days = [
+                d.toordinal() for d in
+                TrainingDay.objects.filter(date__range=[start, end], day_type='training')
+                .order_by('date').values_list('date', flat=True)
+            ]
+            with self._lock:
+                self._years[year] = days
+        return days
+
+    def _spans(self, start, end):
+        """(مصفوفة السنة، بداية، نهاية) لكل عام دراسي يغطي الفترة"""
+        self._check_version()
+        for year in range(academic_year(start), academic_year(end) + 1):
+            year_start, year_end = academic_year_bounds(year)
+            yield self._year(year), max(start, year_start).toordinal(), min(end, year_end).toordinal()
+
+    def count(self, start, end):
+        """عدد أيام التدريب المتوقعة بين تاريخين (شاملة الطرفين)"""
+        if end < start:
+            return 0
+        return sum(bisect_right(days, hi) - bisect_left(days, lo) for days, lo, hi in self._spans(start, end))
+
+    def days(self, start, end):
+        """أيام التدريب في الفترة (مرتبة)"""
+        if end < start:
+            return []
+        return [
+            date.fromordinal(o)
+            for days, lo, hi in self._spans(start, end)
+            for o in days[bisect_left(days, lo):bisect_right(days, hi)]
+        ]
+
+    def is_training_day(self, day):
+        return self.count(day, day) == 1
+
+    def add_training_days(self, start, n):
+        """
+        يوم التدريب رقم n بعد start (n > 0) - مثلاً موعد التقييم بعد 10 أيام تدريب.
+        يرجع None لو التقويم لا يغطي هذا العدد.
+        """
+        self._check_version()
+        year = academic_year(start)
+        target = start.toordinal()
+        remaining = n
+        # لا نبحث أبعد من عامين بعد البداية
+        for y in range(year, year + 3):
+            days = self._year(y)
+            i = bisect_right(days, target)
+            available = len(days) - i
+            if remaining <= available:
+                return date.fromordinal(days[i + remaining - 1])
+            remaining -= available
+        return None
+
+    def invalidate(self):
+        """مسح النسخة المحلية فوراً (رقم النسخة لباقي الـ workers يتغير من signal الحفظ / الحذف)"""
+        with self._lock:
+            self._years = {}
+            self._version = None
+
+
+calendar = TrainingCalendar()
+
+
+def invalidate_calendar(**kwargs):
+    """signal: أي حفظ / حذف على TrainingDay"""
+    calendar.invalidate()
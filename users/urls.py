@@ -1,5 +1,7 @@
 from django.urls import path
 from . import views
+from .notification_stream import notifications_stream
+from .media import serve_media
 
 urlpatterns = [
     # Dashboard & Logs (تأكد أن هذا السطر موجود)
@@ -16,15 +18,22 @@ urlpatterns = [
 
     # Students
     path('students/', views.students_list),
+    path('students/import/', views.students_import),
     path('students/<int:pk>/', views.student_detail),
+    path('students/<int:pk>/photo/<str:variant>/', views.student_photo_variant, name='student-photo-variant'),
 
     # Visits
     path('visits/', views.visits_list),
     path('visits/<int:pk>/', views.visit_detail),
+    path('visits/plan/', views.visits_plan),
 
     # Evaluation Requests
     path('evaluation-requests/', views.evaluation_requests_list),
     path('evaluation-requests/<int:pk>/', views.evaluation_request_detail),
+    path('evaluation-requests/<int:pk>/expand/', views.evaluation_request_expand),
+
+    # Supervisor workload
+    path('workload/', views.workload_list),
 
     # Assigned Evaluations
     path('assigned-evaluations/', views.assigned_evaluations_list),
@@ -36,17 +45,38 @@ urlpatterns = [
 
     # Training Days
     path('training-days/', views.training_days_list),
+    path('training-days/calendar/', views.training_calendar),
     path('training-days/<int:pk>/', views.training_day_detail),
 
     # Attendance
     path('attendance/', views.attendance_list),
+    path('attendance/bulk/', views.attendance_bulk),
+    path('attendance/gaps/', views.attendance_gaps),
+    path('attendance/uploads/', views.attendance_uploads),
+    path('attendance/uploads/<uuid:upload_id>/', views.attendance_upload_detail),
+    path('attendance/uploads/<uuid:upload_id>/complete/', views.attendance_upload_complete),
+    path('attendance/uploads/<uuid:upload_id>/attach/', views.attendance_upload_attach),
     path('attendance/<int:pk>/', views.attendance_detail),
     path('attendance-report/', views.attendance_report),
+
+    # Exports (CSV / XLSX)
+    path('export/attendance/', views.export_attendance),
+    path('export/evaluations/', views.export_evaluations),
+    path('export/students/', views.export_students),
     
     # Notifications
     path('notifications/', views.notifications_list),
+    path('notifications/stream/', notifications_stream),
+    path('notifications/stream/ticket/', views.notifications_stream_ticket),
+    path('notifications/unread-count/', views.notifications_unread_count),
+    path('notifications/read-all/', views.mark_all_notifications_read),
+    path('notifications/broadcast/', views.broadcast_notification),
+    path('notifications/broadcast/<uuid:job_id>/', views.broadcast_status),
     path('notifications/<int:pk>/read/', views.mark_notification_read),
 
     # Security
     path('change-password/', views.change_password),
+
+    # Media (ETag / 304 / Range - نفس روابط personal_photo و proof_file)
+    path('media/<path:name>', serve_media, name='media'),
 ]
\ No newline at end of file
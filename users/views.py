@@ -4,16 +4,20 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db.models import Count
-from datetime import datetime, timedelta
-from django.utils.dateparse import parse_date
+from django.db import transaction
+from datetime import date, datetime, time
+from django.utils import timezone
+from rest_framework.utils.urls import replace_query_param
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import FileResponse
+from django.core.files.storage import default_storage
 from .models import Notification # أضف Notification للقائمة
 from .serializers import NotificationSerializer, ChangePasswordSerializer # أضفهم للقائمة
 
 from .models import (
     Company, Student, Visit, EvaluationRequest, 
     AssignedEvaluation, Evaluation, TrainingDay, 
-    AttendanceRecord, SystemLog
+    AttendanceRecord, SystemLog, SupervisorWorkload, ChunkedUpload, StudentAttendanceSummary
 )
 from .serializers import (
     UserSerializer,
@@ -25,11 +29,39 @@ from .serializers import (
     EvaluationSerializer,
     TrainingDaySerializer,
     AttendanceRecordSerializer,
+    BulkAttendanceSerializer,
+    BroadcastNotificationSerializer,
+    SupervisorWorkloadSerializer,
+    ChunkedUploadSerializer,
+    VisitPlanSerializer,
     SystemLogSerializer
 )
 
 # استيراد ملف الصلاحيات الجديد
-from .permissions import IsAdmin, IsManager, IsSupervisor, IsInstitution
+from .permissions import IsAdmin, IsManager, IsSupervisor
+from .authentication import authenticate_token
+from .pagination import paginate
+from .audit import write_log
+from .log_archive import search_logs_page
+from .notifications import get_unread_count
+from .notification_stream import STREAM_TICKET_SECONDS, is_asgi, issue_stream_ticket
+from .fanout import dispatch_fanout, get_fanout_stats
+from .assignments import expand_evaluation_request
+from .visit_planner import plan_visits, apply_plan
+from .attendance_summary import refresh_attendance_summaries
+from .training_calendar import calendar
+from .attendance_gaps import find_attendance_gaps
+from .student_import import import_students, file_type_of
+from .images import get_variant, photo_version
+from .chunked_upload import OffsetMismatch, write_chunk, finalize_upload, attach_upload
+from .conditional import conditional_get, touch
+from .absence_alerts import check_alerts
+from .dashboard import get_dashboard_stats, invalidate_dashboard_stats
+from .reports import parse_report_range, build_attendance_report
+from .exports import (
+    Workbook, csv_response, xlsx_response,
+    attendance_export_spec, evaluation_export_spec, student_export_spec
+)
 
 User = get_user_model()
 
@@ -38,7 +70,7 @@ User = get_user_model()
 # ==============================
 def log_action(user, action, details):
     if user and user.is_authenticated:
-        SystemLog.objects.create(user=user, action=action, details=details)
+        write_log(user, action, details)
 
 
 # ==============================
@@ -46,34 +78,54 @@ def log_action(user, action, details):
 # ==============================
 @api_view(['GET'])
 @permission_classes([IsManager])  # المديرين والأدمن فقط
+@conditional_get(
+    Student, StudentAttendanceSummary, AttendanceRecord, Company, Evaluation, Visit,
+    vary=lambda request: date.today(),  # أرقام "اليوم" تتغير مع التاريخ
+)
 def dashboard_stats(request):
-    total_students = Student.objects.count()
-    active_students = Student.objects.filter(status='active').count()
-    total_companies = Company.objects.count()
-    completed_evaluations = Evaluation.objects.count()
-    pending_visits = Visit.objects.filter(status='pending').count()
-    
-    today = datetime.now().date()
-    attendance_today = AttendanceRecord.objects.filter(date=today)
-    
-    return Response({
-        "students": {"total": total_students, "active": active_students},
-        "companies": {"total": total_companies},
-        "evaluations": {"total_completed": completed_evaluations},
-        "visits": {"pending": pending_visits},
-        "attendance_today": {
-            "present": attendance_today.filter(status='present').count(),
-            "absent": attendance_today.filter(status='absent').count()
-        }
-    })
+    stats, cached = get_dashboard_stats(request.table_versions)
+    return Response({**stats, "cached": cached})
 
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])  # الأدمن فقط يرى السجلات الحساسة
+@conditional_get(SystemLog, User)
 def system_logs_list(request):
-    logs = SystemLog.objects.all().order_by('-timestamp')[:100]
-    serializer = SystemLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    """
+    بدون فلاتر: السجلات الحية مرقّمة بالمؤشر.
+    مع فلاتر (from, to, user, action, q) أو ?archive=true: بحث في الجدول + الأرشيف الشهري (limit/offset).
+    """
+    params = request.query_params
+    search_keys = ['from', 'to', 'user', 'action', 'q']
+    if params.get('archive') != 'true' and not any(params.get(k) for k in search_keys):
+        logs = SystemLog.objects.all()
+        return paginate(request, logs, SystemLogSerializer, ordering=('-timestamp', '-id'))
+
+    try:
+        limit = max(1, min(int(params.get('limit', 50)), 500))
+        offset = max(int(params.get('offset', 0)), 0)
+        start = parse_date(params['from']) if params.get('from') else None
+        end = parse_date(params['to']) if params.get('to') else None
+        user_id = int(params['user']) if params.get('user') else None
+    except ValueError:
+        return Response({"error": "Invalid filters"}, status=400)
+
+    tz = timezone.get_current_timezone()
+    results, has_more = search_logs_page(
+        offset, limit,
+        start=datetime.combine(start, time.min, tzinfo=tz) if start else None,
+        end=datetime.combine(end, time.max, tzinfo=tz) if end else None,
+        user_id=user_id,
+        action=params.get('action'),
+        text=params.get('q'),
+    )
+
+    url = request.build_absolute_uri()
+    return Response({
+        "next": replace_query_param(url, 'offset', offset + limit) if has_more else None,
+        "previous": replace_query_param(url, 'offset', max(offset - limit, 0)) if offset else None,
+        "results": results,
+    })
 
 
 # ==============================
@@ -81,11 +133,11 @@ def system_logs_list(request):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdmin])  # لا أحد يضيف مستخدمين غير الأدمن
+@conditional_get(User)
 def users_list(request):
     if request.method == 'GET':
         users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        return paginate(request, users, UserSerializer, ordering=('id',))
 
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid():
@@ -94,13 +146,9 @@ def users_list(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-def send_notification(user, title, message):
-    """دالة مساعدة لإرسال إشعار لمستخدم معين"""
-    if user:
-        Notification.objects.create(user=user, title=title, message=message)
-
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAdmin])
+@conditional_get(User)
 def user_detail(request, pk):
     user = get_object_or_404(User, pk=pk)
 
@@ -125,11 +173,11 @@ def user_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsManager])
+@conditional_get(Company, Student)
 def companies_list(request):
     if request.method == 'GET':
         companies = Company.objects.all()
-        serializer = CompanySerializer(companies, many=True)
-        return Response(serializer.data)
+        return paginate(request, companies, CompanySerializer, ordering=('id',))
 
     serializer = CompanySerializer(data=request.data)
     if serializer.is_valid():
@@ -141,6 +189,7 @@ def companies_list(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsManager])
+@conditional_get(Company, Student)
 def company_detail(request, pk):
     company = get_object_or_404(Company, pk=pk)
     if request.method == 'GET':
@@ -162,17 +211,17 @@ def company_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsSupervisor]) # المشرف يمكنه رؤية الطلاب
+@conditional_get(Student, StudentAttendanceSummary)
 def students_list(request):
     if request.method == 'GET':
         students = Student.objects.all()
-        serializer = StudentSerializer(students, many=True)
-        return Response(serializer.data)
+        return paginate(request, students, StudentSerializer, ordering=('id',))
 
     # فقط المدير أو الأدمن يضيف طالب (فحص يدوي للصلاحية هنا)
     if request.user.role not in ['admin', 'manager']:
         return Response({"error": "ليس لديك صلاحية لإضافة طالب"}, status=403)
 
-    serializer = StudentSerializer(data=request.data)
+    serializer = StudentSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         obj = serializer.save()
         log_action(request.user, 'ADD', f"إضافة طالب: {obj.name}")
@@ -180,20 +229,84 @@ def students_list(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsManager])
+def students_import(request):
+    """
+    استيراد دفعة طلاب من ملف CSV / XLSX (الحقل file) - نفس أعمدة ملف التصدير.
+    الصفوف الخاطئة ترجع في errors ولا توقف باقي الملف.
+    dry_run=true للفحص فقط، create_companies=true لإنشاء المؤسسات غير الموجودة.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({"file": ["مطلوب"]}, status=400)
+
+    try:
+        result = import_students(
+            upload.file,
+            file_type=file_type_of(upload.name),
+            dry_run=request.data.get('dry_run') in ('true', True),
+            create_companies=request.data.get('create_companies') in ('true', True),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    if result['created'] and not result['dry_run']:
+        log_action(request.user, 'ADD', f"استيراد طلاب من {upload.name}: {result['created']} طالب")
+        # bulk_create لا يطلق post_save
+        invalidate_dashboard_stats()
+    return Response(result, status=status.HTTP_200_OK if result['dry_run'] else status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def student_photo_variant(request, pk, variant):
+    """
+    نسخة مصغرة من صورة الطالب (تُنشأ أول مرة ثم تُقرأ من القرص).
+    الرابط من StudentSerializer يحمل ?v= (بصمة الصورة) فيُخزن في كاش المتصفح حتى تتغير الصورة.
+    تُطلب من وسم <img> فالتوكن يأتي في ?token= (مثل /api/media/)، ونفس صلاحية بيانات الطلاب.
+    """
+    user = authenticate_token(request)
+    if user is None:
+        return Response({"error": "غير مصرح"}, status=401)
+    request.user = user
+    if not IsSupervisor().has_permission(request, None):
+        return Response({"error": "ليس لديك صلاحية"}, status=403)
+
+    photo = get_object_or_404(Student.objects.only('personal_photo'), pk=pk).personal_photo
+    if not photo:
+        return Response({"error": "لا توجد صورة"}, status=404)
+    try:
+        name = get_variant(photo.name, variant)
+    except (OSError, ValueError):
+        return Response({"error": "تعذر قراءة الصورة"}, status=404)
+    if name is None:
+        return Response({"error": "Invalid variant"}, status=404)
+
+    response = FileResponse(default_storage.open(name, 'rb'), content_type='image/jpeg')
+    # رابط بلا ?v= أو بنسخة قديمة لا يُخزن (نفس الرابط قد يعرض صورة أخرى بعد التعديل)
+    if request.GET.get('v') == photo_version(photo.name):
+        response['Cache-Control'] = 'private, max-age=86400'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsSupervisor])
+@conditional_get(Student, StudentAttendanceSummary)
 def student_detail(request, pk):
-    student = get_object_or_404(Student, pk=pk)
+    student = get_object_or_404(Student.objects.select_related('attendance_summary'), pk=pk)
     
     if request.method == 'GET':
-        return Response(StudentSerializer(student).data)
+        return Response(StudentSerializer(student, context={'request': request}).data)
 
     # تعديل وحذف: للمدير فقط
     if request.user.role not in ['admin', 'manager']:
         return Response({"error": "ليس لديك صلاحية للتعديل أو الحذف"}, status=403)
 
     if request.method == 'PUT':
-        serializer = StudentSerializer(student, data=request.data, partial=True)
+        serializer = StudentSerializer(student, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             log_action(request.user, 'UPDATE', f"تحديث طالب: {student.name}")
@@ -210,15 +323,15 @@ def student_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsSupervisor])
+@conditional_get(Visit)
 def visits_list(request):
     if request.method == 'GET':
-        visits = Visit.objects.all().order_by('-visit_date')
+        visits = Visit.objects.all()
         if request.user.role == 'supervisor':
             # المشرف يرى زياراته فقط
             visits = visits.filter(supervisor=request.user)
-        
-        serializer = VisitSerializer(visits, many=True)
-        return Response(serializer.data)
+
+        return paginate(request, visits, VisitSerializer, ordering=('-visit_date', '-id'))
 
     serializer = VisitSerializer(data=request.data)
     if serializer.is_valid():
@@ -228,8 +341,40 @@ def visits_list(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsSupervisor])
+def visits_plan(request):
+    """
+    خطة زيارات لمشرف في فترة: طلاب نفس المؤسسة في زيارة واحدة + جدول يومي.
+    apply=true ينشئ الزيارات كلها في معاملة واحدة.
+    """
+    serializer = VisitPlanSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    # المشرف يخطط لنفسه فقط
+    if request.user.role == 'supervisor':
+        supervisor = request.user
+    else:
+        supervisor = data.get('supervisor')
+        if supervisor is None:
+            return Response({"supervisor": ["مطلوب"]}, status=400)
+
+    plan = plan_visits(supervisor, data['start'], data['end'], data['max_companies_per_day'])
+    if not data['apply']:
+        return Response(plan)
+
+    created = apply_plan(supervisor, plan, on_created=lambda count: log_action(
+        request.user, 'ADD',
+        f"تخطيط زيارات {supervisor.username}: {count} زيارة في {len(plan['itinerary'])} يوم"
+    ))
+    return Response({**plan, "created": created}, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsSupervisor])
+@conditional_get(Visit)
 def visit_detail(request, pk):
     visit = get_object_or_404(Visit, pk=pk)
     
@@ -263,22 +408,25 @@ def visit_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsManager])
+@conditional_get(EvaluationRequest)
 def evaluation_requests_list(request):
     if request.method == 'GET':
-        qs = EvaluationRequest.objects.all().order_by('-created_at')
-        serializer = EvaluationRequestSerializer(qs, many=True)
-        return Response(serializer.data)
+        qs = EvaluationRequest.objects.all()
+        return paginate(request, qs, EvaluationRequestSerializer, ordering=('-created_at', '-id'))
 
     serializer = EvaluationRequestSerializer(data=request.data)
     if serializer.is_valid():
         obj = serializer.save(issued_by=request.user)
         log_action(request.user, 'ADD', f"إنشاء طلب تقييم: {obj.title}")
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # إبلاغ كل المشرفين في الخلفية (لا ينتظر الطلب انتهاء الإرسال)
+        job_id = dispatch_fanout("طلب تقييم جديد", obj.title, role=User.Role.SUPERVISOR)
+        return Response({**serializer.data, "notification_job": job_id}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsManager])
+@conditional_get(EvaluationRequest)
 def evaluation_request_detail(request, pk):
     req = get_object_or_404(EvaluationRequest, pk=pk)
     if request.method == 'GET':
@@ -295,16 +443,49 @@ def evaluation_request_detail(request, pk):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['POST'])
+@permission_classes([IsManager])
+def evaluation_request_expand(request, pk):
+    """
+    توليد كل توزيعات الطلب دفعة واحدة.
+    اختياري: supervisors=[ids] لتحديد المشرفين، dry_run=true لعرض التوزيع المقترح بدون حفظ.
+    """
+    req = get_object_or_404(EvaluationRequest, pk=pk)
+    supervisor_ids = request.data.get('supervisors') or None
+    dry_run = str(request.data.get('dry_run', '')).lower() == 'true'
+    try:
+        result = expand_evaluation_request(req, supervisor_ids=supervisor_ids, dry_run=dry_run)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    if dry_run:
+        return Response(result)
+    log_action(request.user, 'ADD', f"توزيع طلب تقييم: {req.title} ({result['created']} توزيع)")
+    return Response(result, status=status.HTTP_201_CREATED)
+
+
+# ==============================
+# ⚖️ SUPERVISOR WORKLOAD
+# ==============================
+@api_view(['GET'])
+@permission_classes([IsManager])
+@conditional_get(SupervisorWorkload, User)
+def workload_list(request):
+    """حمل كل مشرف من الفهرس المحسوب مسبقاً (الأقل حملاً أولاً)"""
+    qs = SupervisorWorkload.objects.all()
+    return paginate(request, qs, SupervisorWorkloadSerializer, ordering=('open_assignments', 'supervisor_id'))
+
+
 # ==============================
 # 🤝 ASSIGNED EVALUATIONS
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsManager])
+@conditional_get(AssignedEvaluation)
 def assigned_evaluations_list(request):
-    qs = AssignedEvaluation.objects.all().order_by('-assigned_at')
     if request.method == 'GET':
-        serializer = AssignedEvaluationSerializer(qs, many=True)
-        return Response(serializer.data)
+        qs = AssignedEvaluation.objects.all()
+        return paginate(request, qs, AssignedEvaluationSerializer, ordering=('-assigned_at', '-id'))
 
     serializer = AssignedEvaluationSerializer(data=request.data)
     if serializer.is_valid():
@@ -315,6 +496,7 @@ def assigned_evaluations_list(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsManager])
+@conditional_get(AssignedEvaluation)
 def assigned_evaluation_detail(request, pk):
     assign = get_object_or_404(AssignedEvaluation, pk=pk)
     if request.method == 'GET':
@@ -334,14 +516,14 @@ def assigned_evaluation_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsSupervisor])
+@conditional_get(Evaluation)
 def evaluations_list(request):
     if request.method == 'GET':
-        qs = Evaluation.objects.all().order_by('-date')
+        qs = Evaluation.objects.all()
         if request.user.role == 'supervisor':
             qs = qs.filter(supervisor=request.user)
-            
-        serializer = EvaluationSerializer(qs, many=True)
-        return Response(serializer.data)
+
+        return paginate(request, qs, EvaluationSerializer, ordering=('-date', '-id'))
 
     serializer = EvaluationSerializer(data=request.data)
     if serializer.is_valid():
@@ -356,6 +538,7 @@ def evaluations_list(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsSupervisor])
+@conditional_get(Evaluation)
 def evaluation_detail(request, pk):
     obj = get_object_or_404(Evaluation, pk=pk)
 
@@ -386,11 +569,11 @@ def evaluation_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsManager])
+@conditional_get(TrainingDay)
 def training_days_list(request):
     if request.method == 'GET':
-        days = TrainingDay.objects.all().order_by('-date')
-        serializer = TrainingDaySerializer(days, many=True)
-        return Response(serializer.data)
+        days = TrainingDay.objects.all()
+        return paginate(request, days, TrainingDaySerializer, ordering=('-date',))
 
     if request.method == 'POST':
         serializer = TrainingDaySerializer(data=request.data)
@@ -400,8 +583,34 @@ def training_days_list(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_get(TrainingDay)
+def training_calendar(request):
+    """
+    حساب أيام التدريب من التقويم (بعد أول تحميل: رقم النسخة فقط):
+    ?from=&to= عدد أيام التدريب المتوقعة وقائمتها - ?from=&add=N يوم التدريب رقم N بعد from
+    """
+    start = parse_date(request.query_params.get('from') or '')
+    if not start:
+        return Response({"error": "from required"}, status=400)
+
+    add = request.query_params.get('add')
+    if add is not None:
+        if not add.isdigit() or int(add) < 1:
+            return Response({"error": "Invalid add"}, status=400)
+        return Response({"from": start, "add": int(add), "date": calendar.add_training_days(start, int(add))})
+
+    end = parse_date(request.query_params.get('to') or '')
+    if not end or end < start:
+        return Response({"error": "Invalid to"}, status=400)
+    days = calendar.days(start, end)
+    return Response({"from": start, "to": end, "expected_days": len(days), "days": days})
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsManager])
+@conditional_get(TrainingDay)
 def training_day_detail(request, pk):
     day = get_object_or_404(TrainingDay, pk=pk)
     if request.method == 'GET':
@@ -421,19 +630,19 @@ def training_day_detail(request, pk):
 # ==============================
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated]) # سنفحص الدور في الداخل
+@conditional_get(AttendanceRecord, Student, Company)
 def attendance_list(request):
     # السماح للمشرفين، المديرين، والمؤسسات
     if request.user.role not in ['admin', 'manager', 'supervisor', 'institution']:
         return Response({"error": "غير مصرح"}, status=403)
 
     if request.method == 'GET':
-        qs = AttendanceRecord.objects.all().order_by('-date')
-        
+        qs = AttendanceRecord.objects.all()
+
         # المؤسسة ترى طلابها فقط (سنحتاج ربط المستخدم بالمؤسسة لاحقاً بشكل أفضل)
         # حالياً، سنفترض أن المؤسسة ترسل الـ ID الخاص بها للفلترة، أو نعتمد على الأدمن
-        
-        serializer = AttendanceRecordSerializer(qs, many=True)
-        return Response(serializer.data)
+
+        return paginate(request, qs, AttendanceRecordSerializer, ordering=('-date', '-id'))
 
     if request.method == 'POST':
         serializer = AttendanceRecordSerializer(data=request.data)
@@ -444,8 +653,143 @@ def attendance_list(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def attendance_bulk(request):
+    """تسجيل حضور كل طلاب مؤسسة في يوم واحد (إضافة أو تحديث) في معاملة واحدة"""
+    if request.user.role not in ['admin', 'manager', 'supervisor', 'institution']:
+        return Response({"error": "غير مصرح"}, status=403)
+
+    serializer = BulkAttendanceSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    company = serializer.validated_data['company']
+    day = serializer.validated_data['date']
+    records = [
+        AttendanceRecord(
+            student_id=item['student'],
+            company=company,
+            date=day,
+            status=item['status'],
+            reason=item.get('reason'),
+            is_excused=item.get('is_excused', False),
+            recorded_by=request.user,
+        )
+        for item in serializer.validated_data['records']
+    ]
+
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['company', 'status', 'reason', 'is_excused', 'recorded_by'],
+        )
+        present = sum(1 for r in records if r.status == 'present')
+        log_action(
+            request.user, 'ADD',
+            f"تسجيل حضور جماعي: {company.name} - {day} ({present} حاضر / {len(records) - present} غائب)"
+        )
+        # bulk_create لا يطلق post_save: تحديث ملخص الطلاب يدوياً
+        touch(AttendanceRecord)
+        refresh_attendance_summaries([r.student_id for r in records])
+        check_alerts([r.student_id for r in records])
+
+    invalidate_dashboard_stats()
+
+    return Response({
+        "company": company.id,
+        "date": day,
+        "saved": len(records),
+        "present": present,
+        "absent": len(records) - present,
+    }, status=status.HTTP_201_CREATED)
+
+
+# ------------------------------
+# 📎 رفع ملفات الإثبات على أجزاء
+# ------------------------------
+ATTENDANCE_ROLES = ['admin', 'manager', 'supervisor', 'institution']
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def attendance_uploads(request):
+    """بدء رفع: {filename, size} -> id + offset=0"""
+    if request.user.role not in ATTENDANCE_ROLES:
+        return Response({"error": "غير مصرح"}, status=403)
+    serializer = ChunkedUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    serializer.save(user=request.user)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
+def attendance_upload_detail(request, upload_id):
+    """
+    GET: الحالة و offset الحالي (للاستكمال بعد انقطاع الاتصال)
+    PUT ?offset=N: جسم الطلب = bytes الجزء (application/octet-stream)
+    DELETE: إلغاء الرفع
+    """
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    if request.method == 'GET':
+        return Response(ChunkedUploadSerializer(upload).data)
+    if request.method == 'DELETE':
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    try:
+        offset = int(request.query_params.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response({"error": "offset required"}, status=400)
+    try:
+        upload = write_chunk(upload, offset, request.stream, length)
+    except OffsetMismatch as e:
+        return Response({"error": "offset غير صحيح", "offset": e.args[0]}, status=status.HTTP_409_CONFLICT)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(ChunkedUploadSerializer(upload).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def attendance_upload_complete(request, upload_id):
+    """إنهاء الرفع: {sha256} للتحقق من سلامة الملف"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        upload = finalize_upload(upload, request.data.get('sha256'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(ChunkedUploadSerializer(upload).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def attendance_upload_attach(request, upload_id):
+    """ربط الملف بسجل أو أكثر: {records: [ids]} - نفس الملف بدون نسخ"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    if upload.status != 'complete':
+        return Response({"error": "الرفع غير مكتمل"}, status=400)
+    record_ids = request.data.get('records')
+    if not isinstance(record_ids, list) or not record_ids or not all(isinstance(i, int) for i in record_ids):
+        return Response({"records": ["قائمة أرقام السجلات مطلوبة"]}, status=400)
+
+    found = AttendanceRecord.objects.filter(id__in=record_ids).count()
+    if found != len(set(record_ids)):
+        return Response({"records": ["بعض السجلات غير موجودة"]}, status=400)
+
+    attached = attach_upload(upload, record_ids)
+    log_action(request.user, 'UPDATE', f"إرفاق ملف إثبات ({upload.filename}) بـ {len(set(record_ids))} سجل حضور")
+    return Response({"file_url": ChunkedUploadSerializer(upload).data['file_url'], "attached": attached})
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@conditional_get(AttendanceRecord, Student, Company)
 def attendance_detail(request, pk):
     record = get_object_or_404(AttendanceRecord, pk=pk)
     if request.method == 'GET':
@@ -469,72 +813,136 @@ def attendance_detail(request, pk):
 # ==============================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(AttendanceRecord, TrainingDay, Student, Company)
 def attendance_report(request):
-    report_type = request.query_params.get('type')
-    if report_type not in ['daily', 'weekly', 'monthly']:
-        return Response({"error": "Invalid type"}, status=400)
-
-    qs = AttendanceRecord.objects.all()
-    date_range = ""
-
-    if report_type == 'daily':
-        date = request.query_params.get('date')
-        if not date: return Response({"error": "date required"}, status=400)
-        target_date = parse_date(date)
-        qs = qs.filter(date=target_date)
-        date_range = f"اليوم: {target_date}"
-
-    elif report_type == 'weekly':
-        week_code = request.query_params.get('week')
-        if not week_code: return Response({"error": "week required"}, status=400)
-        year, week_num = week_code.split("-W")
-        first_day = datetime.strptime(f'{year}-W{week_num}-1', "%Y-W%W-%w").date()
-        last_day = first_day + timedelta(days=6)
-        qs = qs.filter(date__range=[first_day, last_day])
-        date_range = f"الأسبوع: {first_day} → {last_day}"
-
-    elif report_type == 'monthly':
-        month = request.query_params.get('month')
-        if not month: return Response({"error": "month required"}, status=400)
-        year, month_num = month.split("-")
-        year, month_num = int(year), int(month_num)
-        first_day = datetime(year, month_num, 1).date()
-        if month_num == 12:
-            last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            last_day = datetime(year, month_num + 1, 1).date() - timedelta(days=1)
-        qs = qs.filter(date__range=[first_day, last_day])
-        date_range = f"الشهر: {first_day} → {last_day}"
+    try:
+        first_day, last_day, date_range = parse_report_range(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-    total_records = qs.count()
-    present_count = qs.filter(status="present").count()
-    
-    attendance_rate = 0
-    if total_records > 0:
-        attendance_rate = round((present_count / total_records) * 100, 2)
+    qs = AttendanceRecord.objects.filter(date__range=[first_day, last_day])
+    report = build_attendance_report(qs, first_day, last_day)
+    report["date_range"] = date_range
+
+    # السجلات التفصيلية اختيارية (?include_records=true) ومرقّمة
+    if request.query_params.get('include_records') == 'true':
+        report["records"] = paginate(request, qs, AttendanceRecordSerializer, ordering=('-date', '-id')).data
+
+    return Response(report)
+
+
+@api_view(['GET'])
+@permission_classes([IsSupervisor])
+@conditional_get(AttendanceRecord, TrainingDay, Student, Company)
+def attendance_gaps(request):
+    """الطلاب النشطون بدون سجل حضور في أيام التدريب بين from و to (?company= اختياري)"""
+    start = parse_date(request.query_params.get('from') or '')
+    end = parse_date(request.query_params.get('to') or '')
+    if not start or not end or end < start:
+        return Response({"error": "from/to required"}, status=400)
+    if (end - start).days > 92:
+        return Response({"error": "الفترة أطول من 3 شهور"}, status=400)
+    try:
+        company_id = int(request.query_params['company']) if request.query_params.get('company') else None
+    except ValueError:
+        return Response({"error": "Invalid company"}, status=400)
+    return Response(find_attendance_gaps(start, end, company_id=company_id))
+
+# ==============================
+# 📤 EXPORTS (CSV / XLSX)
+# ==============================
+def export_queryset(request, qs, spec, name):
+    """
+    فلترة بنفس فلاتر attendance_report (type + date/week/month) إن وُجدت،
+    ثم بث الملف: ?file_type=csv (افتراضي) أو xlsx - بـ async iterator تحت ASGI
+    """
+    if request.query_params.get('type'):
+        try:
+            first_day, last_day, _ = parse_report_range(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        qs = qs.filter(**{f"{spec['date_field']}__range": [first_day, last_day]})
+        name = f"{name}_{first_day}_{last_day}"
+
+    file_type = request.query_params.get('file_type', 'csv')
+    asynchronous = is_asgi(request._request)
+    if file_type == 'csv':
+        return csv_response(qs, spec, name, asynchronous)
+    if file_type == 'xlsx':
+        if Workbook is None:
+            return Response({"error": "تصدير XLSX يتطلب تثبيت openpyxl"}, status=400)
+        return xlsx_response(qs, spec, name, asynchronous)
+    return Response({"error": "Invalid file_type"}, status=400)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_get(AttendanceRecord, Student, Company)
+def export_attendance(request):
+    if request.user.role not in ['admin', 'manager', 'supervisor', 'institution']:
+        return Response({"error": "غير مصرح"}, status=403)
+    return export_queryset(request, AttendanceRecord.objects.all(), attendance_export_spec(), 'attendance')
+
+
+@api_view(['GET'])
+@permission_classes([IsSupervisor])
+@conditional_get(Evaluation, Student, Company, User)
+def export_evaluations(request):
+    qs = Evaluation.objects.all()
+    if request.user.role == 'supervisor':
+        qs = qs.filter(supervisor=request.user)
+    return export_queryset(request, qs, evaluation_export_spec(), 'evaluations')
+
+
+@api_view(['GET'])
+@permission_classes([IsSupervisor])
+@conditional_get(Student, Company)
+def export_students(request):
+    return export_queryset(request, Student.objects.all(), student_export_spec(), 'students')
 
-    return Response({
-        "total_records": total_records,
-        "present": present_count,
-        "attendance_rate": attendance_rate,
-        "date_range": date_range,
-        "records": AttendanceRecordSerializer(qs, many=True).data
-    })
 
 # ==============================
 # 🔔 NOTIFICATIONS API
 # ==============================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(Notification)
 def notifications_list(request):
-    """جلب إشعارات المستخدم الحالي"""
-    qs = Notification.objects.filter(user=request.user).order_by('-created_at')
+    """جلب إشعارات المستخدم الحالي (?since=<id أو تاريخ> لجلب الجديد فقط)"""
+    qs = Notification.objects.filter(user=request.user)
     # يمكن إضافة فلتر لجلب غير المقروءة فقط
     if request.query_params.get('unread') == 'true':
         qs = qs.filter(is_read=False)
-        
-    serializer = NotificationSerializer(qs, many=True)
-    return Response(serializer.data)
+
+    since = request.query_params.get('since')
+    if since:
+        if since.isdigit():
+            qs = qs.filter(id__gt=int(since))
+        else:
+            since_dt = parse_datetime(since)
+            if since_dt is None:
+                return Response({"error": "Invalid since"}, status=400)
+            qs = qs.filter(created_at__gt=since_dt)
+
+    return paginate(request, qs, NotificationSerializer, ordering=('-created_at', '-id'))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_get(Notification)
+def notifications_unread_count(request):
+    """عدد الإشعارات غير المقروءة (من الفهرس الجزئي)"""
+    return Response({"unread": get_unread_count(request.user.id)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def notifications_stream_ticket(request):
+    """تذكرة لفتح notifications/stream/ - بدون ASGI يرجع 204 والعميل يعتمد على التحديث الدوري"""
+    if not is_asgi(request._request):
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({"ticket": issue_stream_ticket(request.user), "expires_in": STREAM_TICKET_SECONDS})
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -543,12 +951,52 @@ def mark_notification_read(request, pk):
     notif = get_object_or_404(Notification, pk=pk)
     if notif.user != request.user:
         return Response({"error": "ليس لديك صلاحية"}, status=403)
-    
-    notif.is_read = True
-    notif.save()
+
+    updated = Notification.objects.filter(pk=pk, is_read=False).update(is_read=True)
+    if updated:
+        touch(Notification)
     return Response({"status": "success"})
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_all_notifications_read(request):
+    """تحديد كل الإشعارات كمقروءة (UPDATE واحد)"""
+    updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    if updated:
+        touch(Notification)
+    return Response({"status": "success", "updated": updated})
+
+
+@api_view(['POST'])
+@permission_classes([IsManager])
+def broadcast_notification(request):
+    """إشعار جماعي حسب الدور / المؤسسة / طلب التقييم - يرجع job_id لمتابعة الإرسال"""
+    serializer = BroadcastNotificationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    job_id = dispatch_fanout(
+        data['title'], data['message'],
+        role=data.get('role'),
+        company_id=data.get('company'),
+        evaluation_request_id=data.get('evaluation_request'),
+    )
+    log_action(request.user, 'ADD', f"إشعار جماعي: {data['title']}")
+    return Response({"job_id": job_id, "status": "queued"}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsManager])
+def broadcast_status(request, job_id):
+    """إحصائيات الإرسال (عدد المستلمين، الدفعات، الزمن)"""
+    stats = get_fanout_stats(job_id)
+    if stats is None:
+        return Response({"error": "Not found"}, status=404)
+    return Response(stats)
+
+
 # ==============================
 # 🔐 AUTH & PASSWORD
 # ==============================
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import Student, Visit, TrainingDay
+from .workload import OPEN_ASSIGNMENT_STATUSES, refresh_supervisor_loads
+from .dashboard import invalidate_dashboard_stats
+from .training_calendar import calendar
+from .conditional import touch
+
+
+# ==============================
+# 🗺️ VISIT PLANNER (تجميع زيارات نفس المؤسسة في رحلة واحدة)
+# ==============================
+def due_students(supervisor, start, end):
+    """
+    الطلاب المستحقون للزيارة: لهم تقييم مفتوح مع المشرف وليس لهم زيارة (غير ملغاة) منه في الفترة.
+    يرجع {company_id: {"name": ..., "students": [(id, name), ...]}} باستعلام واحد.
+    """
+    visited = Visit.objects.filter(
+        supervisor=supervisor, visit_date__range=[start, end]
+    ).exclude(status='canceled').values('student_id')
+
+    rows = (
+        Student.objects.filter(
+            status='active',
+            assigned_evaluations__supervisor=supervisor,
+            assigned_evaluations__status__in=OPEN_ASSIGNMENT_STATUSES,
+        )
+        .exclude(id__in=visited)
+        .distinct()
+        .order_by('company_id', 'id')
+        .values_list('id', 'name', 'company_id', 'company__name')
+    )
+    companies = {}
+    for student_id, name, company_id, company_name in rows:
+        group = companies.setdefault(company_id, {"name": company_name, "students": []})
+        group["students"].append((student_id, name))
+    return companies
+
+
+def visit_days(start, end):
+    """أيام التدريب في الفترة من TrainingDay، ولو التقويم غير مسجل نستخدم كل الأيام"""
+    days = calendar.days(start, end)
+    if days or TrainingDay.objects.filter(date__range=[start, end]).exists():
+        return days
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def plan_visits(supervisor, start, end, max_companies_per_day=4):
+    """
+    خطة يومية: المؤسسات الأكثر طلاباً أولاً، بحد أقصى max_companies_per_day مؤسسة في اليوم.
+    المؤسسات التي لا تتسع لها الفترة ترجع في unscheduled.
+    """
+    companies = due_students(supervisor, start, end)
+    days = visit_days(start, end)
+    ordered = sorted(companies.items(), key=lambda c: (-len(c[1]["students"]), c[0]))
+
+    itinerary = defaultdict(list)
+    unscheduled = []
+    for index, (company_id, group) in enumerate(ordered):
+        day_index = index // max_companies_per_day
+        entry = {
+            "company": company_id,
+            "company_name": group["name"],
+            "students": [{"id": sid, "name": name} for sid, name in group["students"]],
+        }
+        if day_index < len(days):
+            itinerary[days[day_index]].append(entry)
+        else:
+            unscheduled.append(entry)
+
+    return {
+        "supervisor": supervisor.id,
+        "start": start,
+        "end": end,
+        "itinerary": [{"date": day, "companies": itinerary[day]} for day in days if itinerary[day]],
+        "unscheduled": unscheduled,
+        "visits": sum(len(c["students"]) for day in itinerary.values() for c in day),
+    }
+
+
+def apply_plan(supervisor, plan, on_created=None):
+    """إنشاء كل زيارات الخطة في معاملة واحدة (bulk_create) - on_created لتسجيل العملية داخل نفس المعاملة"""
+    visits = [
+        Visit(company_id=c["company"], student_id=s["id"], supervisor=supervisor, visit_date=day["date"])
+        for day in plan["itinerary"]
+        for c in day["companies"]
+        for s in c["students"]
+    ]
+    with transaction.atomic():
+        Visit.objects.bulk_create(visits)
+        # bulk_create لا يطلق signals
+        touch(Visit)
+        refresh_supervisor_loads([supervisor.id])
+        if on_created:
+            on_created(len(visits))
+    invalidate_dashboard_stats()
+    return len(visits)
@@ -0,0 +1,132 @@
+import heapq
+from collections import defaultdict
+
+from django.db.models import Count
+
+from .conditional import touch
+from .models import User, Visit, AssignedEvaluation, SupervisorWorkload
+
+
+# ==============================
+# ⚖️ SUPERVISOR WORKLOAD (فهرس الحمل + التوزيع المتوازن)
+# ==============================
+OPEN_ASSIGNMENT_STATUSES = ('pending', 'printed', 'in_progress')
+
+
+def refresh_supervisor_loads(supervisor_ids):
+    """
+    إعادة حساب صفوف الفهرس للمشرفين المتأثرين فقط (تحديث تدريجي بعد أي حفظ/حذف).
+    ثلاثة استعلامات مجمعة + upsert واحد مهما كان عدد المشرفين.
+    """
+    ids = {sid for sid in supervisor_ids if sid}
+    if not ids:
+        return
+
+    open_assignments = AssignedEvaluation.objects.filter(
+        supervisor_id__in=ids, status__in=OPEN_ASSIGNMENT_STATUSES
+    )
+    pending_visits = Visit.objects.filter(supervisor_id__in=ids, status='pending')
+
+    assignment_counts = dict(
+        open_assignments.values('supervisor_id').annotate(n=Count('id')).values_list('supervisor_id', 'n')
+    )
+    visit_counts = dict(
+        pending_visits.values('supervisor_id').annotate(n=Count('id')).values_list('supervisor_id', 'n')
+    )
+    companies = defaultdict(set)
+    pairs = open_assignments.values_list('supervisor_id', 'company_id').union(
+        pending_visits.values_list('supervisor_id', 'company_id')
+    )
+    for sup_id, company_id in pairs:
+        if company_id:
+            companies[sup_id].add(company_id)
+
+    # المستخدمون الذين لم يعودوا مشرفين لا يظهرون في الفهرس
+    supervisors = User.objects.filter(id__in=ids, role=User.Role.SUPERVISOR).values_list('id', flat=True)
+    SupervisorWorkload.objects.filter(supervisor_id__in=ids).exclude(supervisor_id__in=supervisors).delete()
+    SupervisorWorkload.objects.bulk_create(
+        [
+            SupervisorWorkload(
+                supervisor_id=sid,
+                open_assignments=assignment_counts.get(sid, 0),
+                pending_visits=visit_counts.get(sid, 0),
+                companies_covered=len(companies[sid]),
+            )
+            for sid in supervisors
+        ],
+        update_conflicts=True,
+        unique_fields=['supervisor'],
+        update_fields=['open_assignments', 'pending_visits', 'companies_covered', 'updated_at'],
+    )
+    touch(SupervisorWorkload)
+
+
+def rebuild_workload_index():
+    """إعادة بناء الفهرس بالكامل (مرة واحدة عند التشغيل أو بعد استيراد بيانات)"""
+    ids = list(User.objects.filter(role=User.Role.SUPERVISOR).values_list('id', flat=True))
+    SupervisorWorkload.objects.exclude(supervisor_id__in=ids).delete()
+    refresh_supervisor_loads(ids)
+    return len(ids)
+
+
+def get_loads(supervisor_ids=None):
+    """
+    الحمل الحالي {supervisor_id: load} من الفهرس (استعلام واحد، بدون تجميع للجداول الكبيرة).
+    المشرف الذي ليس له صف بعد حمله صفر.
+    """
+    supervisors = User.objects.filter(role=User.Role.SUPERVISOR, is_active=True)
+    if supervisor_ids:
+        supervisors = supervisors.filter(id__in=supervisor_ids)
+    rows = supervisors.values_list('id', 'workload__open_assignments', 'workload__pending_visits')
+    return {sid: (assignments or 0) + (visits or 0) for sid, assignments, visits in rows}
+
+
+def propose_assignments(student_rows, loads):
+    """
+    student_rows: [(student_id, company_id)] - loads: {supervisor_id: load}
+    طلاب نفس المؤسسة يذهبون لمشرف واحد (زيارة واحدة بدل عدة رحلات).
+    المجموعات الأكبر أولاً، وكل مجموعة للمشرف الأقل حملاً (heap) - توزيع LPT الجشع.
+    يرجع [(student_id, company_id, supervisor_id)].
+    """
+    if not loads:
+        return []
+
+    groups = defaultdict(list)
+    for student_id, company_id in student_rows:
+        groups[company_id].append(student_id)
+
+    heap = [(load, sup_id) for sup_id, load in loads.items()]
+    heapq.heapify(heap)
+    plan = []
+    for company_id, students in sorted(groups.items(), key=lambda g: (-len(g[1]), g[0] or 0)):
+        load, sup_id = heapq.heappop(heap)
+        plan.extend((student_id, company_id, sup_id) for student_id in students)
+        heapq.heappush(heap, (load + len(students), sup_id))
+    return plan
+
+
+def summarize_plan(plan):
+    per_supervisor = defaultdict(lambda: {"students": 0, "companies": set()})
+    for _, company_id, sup_id in plan:
+        per_supervisor[sup_id]["students"] += 1
+        per_supervisor[sup_id]["companies"].add(company_id)
+    return {
+        sup_id: {"students": v["students"], "companies": sorted(c for c in v["companies"] if c)}
+        for sup_id, v in per_supervisor.items()
+    }
+
+
+# ------------------------------
+# SIGNAL HANDLERS (تحديث الفهرس عند الحفظ / الحذف)
+# ------------------------------
+def remember_previous_supervisor(sender, instance, **kwargs):
+    """عند نقل المهمة لمشرف آخر نحتاج تحديث حمل المشرف القديم أيضاً"""
+    instance._previous_supervisor_id = None
+    if instance.pk:
+        instance._previous_supervisor_id = (
+            sender.objects.filter(pk=instance.pk).values_list('supervisor_id', flat=True).first()
+        )
+
+
+def update_workload_on_change(sender, instance, **kwargs):
+    refresh_supervisor_loads([instance.supervisor_id, getattr(instance, '_previous_supervisor_id', None)])